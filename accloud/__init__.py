@@ -1,6 +1,7 @@
 __all__ = [
     'client',
     'api',
+    'async_api',
     'models',
     'session_store',
     'utils',
@@ -1,11 +1,19 @@
-from typing import List, Optional, Any, Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Hashable, Iterator, List, Optional, Any, Dict, TypeVar
+import contextvars
 import json
 
 import httpx
 
-from endpoints import FILES, QUOTA, INFO, UPLOAD, PRINTERS, PROJECTS, PRINT
+from endpoints import FILES, QUOTA, INFO, PRINTERS, PROJECTS, PRINT
 from .client import CloudClient
 from .models import FileItem, Quota
+from .utils import env_int
+
+T = TypeVar("T")
+
+DELETE_BATCH_SIZE = 50
+DELETE_WORKERS = 4
 
 
 def _json_or_raise(resp: httpx.Response) -> Dict[str, Any]:
@@ -22,17 +30,12 @@ def _json_or_raise(resp: httpx.Response) -> Dict[str, Any]:
     return payload
 
 
-def get_quota(client: CloudClient) -> Quota:
-    resp = client.request(QUOTA["get_user_store"]["method"], QUOTA["get_user_store"]["path"])
-    payload = _json_or_raise(resp)
+def _quota_from_payload(payload: Dict[str, Any]) -> Quota:
     data = payload.get("data") or {}
     return Quota(total_bytes=int(data.get("total_bytes", 0)), used_bytes=int(data.get("used_bytes", 0)))
 
 
-def list_files(client: CloudClient, page: int = 1, limit: int = 10) -> List[FileItem]:
-    payload = {"page": page, "limit": limit}
-    resp = client.request(FILES["list"]["method"], FILES["list"]["path"], json=payload)
-    payload = _json_or_raise(resp)
+def _file_items_from_payload(payload: Dict[str, Any]) -> List[FileItem]:
     items = []
     for row in payload.get("data") or []:
         items.append(FileItem(
@@ -49,6 +52,137 @@ def list_files(client: CloudClient, page: int = 1, limit: int = 10) -> List[File
     return items
 
 
+def _items_from_data(data: Any) -> List[Dict[str, Any]]:
+    if isinstance(data, list):
+        return data
+    if not isinstance(data, dict):
+        return []
+    return data.get("list") or data.get("rows") or data.get("data") or []
+
+
+def _row_key(row: Dict[str, Any]) -> Hashable:
+    return str(row.get("id") or row.get("printer_id") or row.get("taskid") or row.get("task_id") or id(row))
+
+
+def _iter_pages(
+    fetch_page: Callable[[int], List[T]],
+    key: Callable[[T], Hashable],
+    limit: int,
+    start_page: int = 1,
+    prefetch: int = 0,
+) -> Iterator[T]:
+    # Stops on a short page, or on a page with nothing new (endpoints that ignore paging).
+    seen = set()
+
+    def fresh(items: List[T]) -> List[T]:
+        out = []
+        for item in items:
+            k = key(item)
+            if k not in seen:
+                seen.add(k)
+                out.append(item)
+        return out
+
+    # The first page comes alone: a short one (small account) ends the
+    # listing without prefetching pages past the end.
+    items = fetch_page(start_page)
+    new_items = fresh(items)
+    yield from new_items
+    if len(items) < limit or not new_items:
+        return
+
+    if prefetch <= 0:
+        page = start_page + 1
+        while True:
+            items = fetch_page(page)
+            new_items = fresh(items)
+            yield from new_items
+            if len(items) < limit or not new_items:
+                return
+            page += 1
+
+    pool = ThreadPoolExecutor(max_workers=prefetch + 1, thread_name_prefix="accloud-page")
+
+    def submit(page: int) -> "Future[List[T]]":
+        # Carry the caller's context (e.g. its priority lane) into the worker.
+        return pool.submit(contextvars.copy_context().run, fetch_page, page)
+
+    try:
+        window = []
+        next_page = start_page + 1
+        for _ in range(prefetch + 1):
+            window.append(submit(next_page))
+            next_page += 1
+        while window:
+            items = window.pop(0).result()
+            new_items = fresh(items)
+            yield from new_items
+            if len(items) < limit or not new_items:
+                return
+            window.append(submit(next_page))
+            next_page += 1
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _print_order_form(
+    file_id: str,
+    printer_id: str,
+    project_id: str,
+    order_id: str,
+    is_delete_file: str,
+    data_payload: Dict[str, Any],
+) -> Dict[str, Any]:
+    form: Dict[str, Any] = {
+        "printer_id": str(printer_id),
+        "project_id": str(project_id),
+        "order_id": str(order_id),
+        "is_delete_file": str(is_delete_file),
+        "data": json.dumps(data_payload, separators=(",", ":"), ensure_ascii=True),
+    }
+    if str(file_id) != str(data_payload.get("file_id", "")):
+        data_payload = dict(data_payload)
+        data_payload["file_id"] = str(file_id)
+        form["data"] = json.dumps(data_payload, separators=(",", ":"), ensure_ascii=True)
+    return form
+
+
+def get_quota(client: CloudClient) -> Quota:
+    resp = client.request(QUOTA["get_user_store"]["method"], QUOTA["get_user_store"]["path"])
+    return _quota_from_payload(_json_or_raise(resp))
+
+
+def _list_files_payload(client: CloudClient, page: int, limit: int) -> Dict[str, Any]:
+    payload = {"page": page, "limit": limit}
+    resp = client.request(FILES["list"]["method"], FILES["list"]["path"], json=payload)
+    return _json_or_raise(resp)
+
+
+def list_files(client: CloudClient, page: int = 1, limit: int = 10) -> List[FileItem]:
+    return _file_items_from_payload(_list_files_payload(client, page, limit))
+
+
+def iter_files(client: CloudClient, limit: int = 50, prefetch: int = 0, start_page: int = 1) -> Iterator[FileItem]:
+    return _iter_pages(
+        lambda page: list_files(client, page=page, limit=limit),
+        key=lambda item: item.id,
+        limit=limit,
+        start_page=start_page,
+        prefetch=prefetch,
+    )
+
+
+def iter_file_rows(client: CloudClient, limit: int = 50, prefetch: int = 0, start_page: int = 1) -> Iterator[Dict[str, Any]]:
+    # Raw listing rows, for callers that keep a few fields of many files.
+    return _iter_pages(
+        lambda page: list(_list_files_payload(client, page, limit).get("data") or []),
+        key=lambda row: str(row.get("id")),
+        limit=limit,
+        start_page=start_page,
+        prefetch=prefetch,
+    )
+
+
 def get_download_url(client: CloudClient, file_id: str) -> str:
     payload = {"id": int(file_id)}
     resp = client.request(FILES["download_url"]["method"], FILES["download_url"]["path"], json=payload)
@@ -57,9 +191,60 @@ def get_download_url(client: CloudClient, file_id: str) -> str:
 
 
 def delete_files(client: CloudClient, file_ids: List[str]) -> None:
+    from .dedup import get_md5_index
+
     payload = {"idArr": [int(i) for i in file_ids]}
     resp = client.request(FILES["delete"]["method"], FILES["delete"]["path"], json=payload)
     _json_or_raise(resp)
+    # A deleted file must not be offered as an upload duplicate any more.
+    get_md5_index(client).discard(file_ids)
+
+
+def _delete_batches(file_ids: List[str], batch_size: Optional[int]) -> List[List[str]]:
+    size = max(1, int(batch_size or env_int("ACCLOUD_DELETE_BATCH", DELETE_BATCH_SIZE)))
+    ids = list(dict.fromkeys(str(i) for i in file_ids))
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+def _delete_error(deleted: int, total: int, errors: List[Exception]) -> RuntimeError:
+    return RuntimeError(f"Deleted {deleted} of {total} file(s); {len(errors)} batch(es) failed: {errors[0]}")
+
+
+def delete_files_batched(
+    client: CloudClient,
+    file_ids: List[str],
+    batch_size: Optional[int] = None,
+    workers: int = DELETE_WORKERS,
+    on_batch: Optional[Callable[[List[str], Optional[Exception]], None]] = None,
+) -> List[str]:
+    # Splits the ids into idArr batches sent concurrently. on_batch(ids, error)
+    # runs in a worker thread as each batch completes so callers can drop rows
+    # as they go; returns the ids deleted and raises if any batch failed.
+    batches = _delete_batches(file_ids, batch_size)
+    deleted: List[str] = []
+    errors: List[Exception] = []
+    if not batches:
+        return deleted
+
+    def run(batch: List[str]) -> None:
+        try:
+            delete_files(client, batch)
+        except Exception as exc:
+            errors.append(exc)
+            if on_batch is not None:
+                on_batch(batch, exc)
+            return
+        deleted.extend(batch)
+        if on_batch is not None:
+            on_batch(batch, None)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches))), thread_name_prefix="accloud-delete") as pool:
+        # Carry the caller's context (e.g. its priority lane) into the workers.
+        for future in [pool.submit(contextvars.copy_context().run, run, batch) for batch in batches]:
+            future.result()
+    if errors:
+        raise _delete_error(len(deleted), sum(len(b) for b in batches), errors)
+    return deleted
 
 
 def get_gcode_info(client: CloudClient, gcode_id: str) -> dict:
@@ -75,6 +260,20 @@ def list_printers(client: CloudClient, params: Optional[Dict[str, Any]] = None)
     return payload.get("data", payload)
 
 
+def iter_printers(
+    client: CloudClient,
+    limit: int = 50,
+    prefetch: int = 0,
+    params: Optional[Dict[str, Any]] = None,
+) -> Iterator[Dict[str, Any]]:
+    def fetch(page: int) -> List[Dict[str, Any]]:
+        page_params = dict(params or {})
+        page_params.update({"page": page, "limit": limit})
+        return _items_from_data(list_printers(client, params=page_params))
+
+    return _iter_pages(fetch, key=_row_key, limit=limit, prefetch=prefetch)
+
+
 def get_printer_info(client: CloudClient, printer_id: str) -> dict:
     payload = {"id": int(printer_id)}
     resp = client.request(PRINTERS["info"]["method"], PRINTERS["info"]["path"], json=payload)
@@ -101,35 +300,36 @@ def get_projects(client: CloudClient, printer_id: str, print_status: int = 1, pa
     return payload.get("data", payload)
 
 
-def upload_file(client: CloudClient, path: str, name: Optional[str] = None) -> str:
-    filename = name or str(path).split('/')[-1]
-    size = __import__('os').path.getsize(path)
-
-    # 1) lock storage
-    lock_payload = {"name": filename, "size": size, "is_temp_file": 0}
-    lock_resp = client.request(UPLOAD["lock_storage_space"]["method"], UPLOAD["lock_storage_space"]["path"], json=lock_payload)
-    lock_data = _json_or_raise(lock_resp).get("data", {})
-    lock_id = lock_data.get('id')
-    pre_sign = lock_data.get('preSignUrl')
-    if not pre_sign:
-        raise RuntimeError('Missing preSignUrl from lockStorageSpace')
-
-    # 2) PUT to S3
-    with open(path, 'rb') as f:
-        put_resp = httpx.put(pre_sign, content=f)
-        put_resp.raise_for_status()
-
-    # 3) register upload
-    new_payload = {"user_lock_space_id": lock_id}
-    new_resp = client.request(UPLOAD["new_upload_file"]["method"], UPLOAD["new_upload_file"]["path"], json=new_payload)
-    file_id = _json_or_raise(new_resp).get("data", {}).get("id")
-
-    # 4) unlock storage
-    unlock_payload = {"id": lock_id, "is_delete_cos": 0}
-    unlock_resp = client.request(UPLOAD["unlock_storage_space"]["method"], UPLOAD["unlock_storage_space"]["path"], json=unlock_payload)
-    _json_or_raise(unlock_resp)
+def iter_projects(
+    client: CloudClient,
+    printer_id: str,
+    print_status: int = 1,
+    limit: int = 50,
+    prefetch: int = 0,
+) -> Iterator[Dict[str, Any]]:
+    return _iter_pages(
+        lambda page: _items_from_data(get_projects(client, printer_id, print_status=print_status, page=page, limit=limit)),
+        key=_row_key,
+        limit=limit,
+        prefetch=prefetch,
+    )
+
+
+def upload_file(
+    client: CloudClient,
+    path: str,
+    name: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    dedup: Optional[bool] = None,
+) -> str:
+    # lockStorageSpace -> PUT to S3 -> newUploadFile -> unlockStorageSpace (see accloud.upload).
+    # With dedup, a file whose md5 already exists in the cloud is not sent again.
+    from .upload import Uploader
 
-    return str(file_id)
+    uploader = Uploader(client, chunk_size=chunk_size, workers=workers, dedup=dedup)
+    return uploader.upload(path, name=name, progress=progress)
 
 
 def send_print_order(
@@ -141,17 +341,7 @@ def send_print_order(
     is_delete_file: str,
     data_payload: Dict[str, Any],
 ) -> dict:
-    form: Dict[str, Any] = {
-        "printer_id": str(printer_id),
-        "project_id": str(project_id),
-        "order_id": str(order_id),
-        "is_delete_file": str(is_delete_file),
-        "data": json.dumps(data_payload, separators=(",", ":"), ensure_ascii=True),
-    }
-    if str(file_id) != str(data_payload.get("file_id", "")):
-        data_payload = dict(data_payload)
-        data_payload["file_id"] = str(file_id)
-        form["data"] = json.dumps(data_payload, separators=(",", ":"), ensure_ascii=True)
+    form = _print_order_form(file_id, printer_id, project_id, order_id, is_delete_file, data_payload)
     resp = client.request(PRINT["send_order"]["method"], PRINT["send_order"]["path"], data=form)
     return _json_or_raise(resp)
 
@@ -0,0 +1,287 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+import asyncio
+import weakref
+
+import httpx
+
+from endpoints import FILES, QUOTA, INFO, PRINTERS, PROJECTS, PRINT
+from .api import (
+    DELETE_WORKERS,
+    _delete_batches,
+    _delete_error,
+    _file_items_from_payload,
+    _items_from_data,
+    _json_or_raise,
+    _print_order_form,
+    _quota_from_payload,
+    _row_key,
+)
+from .client import AsyncCloudClient
+from .dedup import get_md5_index
+from .models import FileItem, Quota
+from .upload import Uploader
+
+T = TypeVar("T")
+
+
+async def _iter_pages(
+    fetch_page: Callable[[int], Awaitable[List[T]]],
+    key: Callable[[T], Hashable],
+    limit: int,
+    start_page: int = 1,
+    prefetch: int = 0,
+) -> AsyncIterator[T]:
+    seen = set()
+
+    def fresh(items: List[T]) -> List[T]:
+        out = []
+        for item in items:
+            k = key(item)
+            if k not in seen:
+                seen.add(k)
+                out.append(item)
+        return out
+
+    # First page alone, so a short one never triggers a prefetch window.
+    items = await fetch_page(start_page)
+    new_items = fresh(items)
+    for item in new_items:
+        yield item
+    if len(items) < limit or not new_items:
+        return
+
+    window = []
+    next_page = start_page + 1
+    try:
+        for _ in range(max(prefetch, 0) + 1):
+            window.append(asyncio.ensure_future(fetch_page(next_page)))
+            next_page += 1
+        while window:
+            items = await window.pop(0)
+            new_items = fresh(items)
+            for item in new_items:
+                yield item
+            if len(items) < limit or not new_items:
+                return
+            window.append(asyncio.ensure_future(fetch_page(next_page)))
+            next_page += 1
+    finally:
+        for task in window:
+            task.cancel()
+
+
+async def get_quota(client: AsyncCloudClient) -> Quota:
+    resp = await client.request(QUOTA["get_user_store"]["method"], QUOTA["get_user_store"]["path"])
+    return _quota_from_payload(_json_or_raise(resp))
+
+
+async def list_files(client: AsyncCloudClient, page: int = 1, limit: int = 10) -> List[FileItem]:
+    payload = {"page": page, "limit": limit}
+    resp = await client.request(FILES["list"]["method"], FILES["list"]["path"], json=payload)
+    return _file_items_from_payload(_json_or_raise(resp))
+
+
+def iter_files(
+    client: AsyncCloudClient,
+    limit: int = 50,
+    prefetch: int = 0,
+    start_page: int = 1,
+) -> AsyncIterator[FileItem]:
+    return _iter_pages(
+        lambda page: list_files(client, page=page, limit=limit),
+        key=lambda item: item.id,
+        limit=limit,
+        start_page=start_page,
+        prefetch=prefetch,
+    )
+
+
+async def get_download_url(client: AsyncCloudClient, file_id: str) -> str:
+    payload = {"id": int(file_id)}
+    resp = await client.request(FILES["download_url"]["method"], FILES["download_url"]["path"], json=payload)
+    payload = _json_or_raise(resp)
+    return payload.get("data", "")
+
+
+async def delete_files(client: AsyncCloudClient, file_ids: List[str]) -> None:
+    payload = {"idArr": [int(i) for i in file_ids]}
+    resp = await client.request(FILES["delete"]["method"], FILES["delete"]["path"], json=payload)
+    _json_or_raise(resp)
+    # A deleted file must not be offered as an upload duplicate any more.
+    get_md5_index(_blocking_client(client)).discard(file_ids)
+
+
+async def delete_files_batched(
+    client: AsyncCloudClient,
+    file_ids: List[str],
+    batch_size: Optional[int] = None,
+    workers: int = DELETE_WORKERS,
+    on_batch: Optional[Callable[[List[str], Optional[Exception]], None]] = None,
+) -> List[str]:
+    batches = _delete_batches(file_ids, batch_size)
+    deleted: List[str] = []
+    errors: List[Exception] = []
+    limit = asyncio.Semaphore(max(1, workers))
+
+    async def run(batch: List[str]) -> None:
+        async with limit:
+            try:
+                await delete_files(client, batch)
+            except Exception as exc:
+                errors.append(exc)
+                if on_batch is not None:
+                    on_batch(batch, exc)
+                return
+        deleted.extend(batch)
+        if on_batch is not None:
+            on_batch(batch, None)
+
+    await asyncio.gather(*(run(batch) for batch in batches))
+    if errors:
+        raise _delete_error(len(deleted), sum(len(b) for b in batches), errors)
+    return deleted
+
+
+async def get_gcode_info(client: AsyncCloudClient, gcode_id: str) -> dict:
+    params = {"id": int(gcode_id)}
+    resp = await client.request(INFO["gcode_info"]["method"], INFO["gcode_info"]["path"], params=params)
+    payload = _json_or_raise(resp)
+    return payload.get("data", {})
+
+
+async def list_printers(client: AsyncCloudClient, params: Optional[Dict[str, Any]] = None) -> dict:
+    resp = await client.request(PRINTERS["list"]["method"], PRINTERS["list"]["path"], params=params or {})
+    payload = _json_or_raise(resp)
+    return payload.get("data", payload)
+
+
+def iter_printers(
+    client: AsyncCloudClient,
+    limit: int = 50,
+    prefetch: int = 0,
+    params: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    async def fetch(page: int) -> List[Dict[str, Any]]:
+        page_params = dict(params or {})
+        page_params.update({"page": page, "limit": limit})
+        return _items_from_data(await list_printers(client, params=page_params))
+
+    return _iter_pages(fetch, key=_row_key, limit=limit, prefetch=prefetch)
+
+
+async def get_printer_info(client: AsyncCloudClient, printer_id: str) -> dict:
+    payload = {"id": int(printer_id)}
+    resp = await client.request(PRINTERS["info"]["method"], PRINTERS["info"]["path"], json=payload)
+    payload = _json_or_raise(resp)
+    return payload.get("data", payload)
+
+
+async def get_printer_info_v2(client: AsyncCloudClient, printer_id: str) -> dict:
+    params = {"id": int(printer_id)}
+    resp = await client.request(PRINTERS["info_v2"]["method"], PRINTERS["info_v2"]["path"], params=params)
+    payload = _json_or_raise(resp)
+    return payload.get("data", payload)
+
+
+async def get_projects(
+    client: AsyncCloudClient,
+    printer_id: str,
+    print_status: int = 1,
+    page: int = 1,
+    limit: int = 10,
+) -> dict:
+    params = {
+        "limit": int(limit),
+        "page": int(page),
+        "print_status": int(print_status),
+        "printer_id": int(printer_id),
+    }
+    resp = await client.request(PROJECTS["list"]["method"], PROJECTS["list"]["path"], params=params)
+    payload = _json_or_raise(resp)
+    return payload.get("data", payload)
+
+
+def iter_projects(
+    client: AsyncCloudClient,
+    printer_id: str,
+    print_status: int = 1,
+    limit: int = 50,
+    prefetch: int = 0,
+) -> AsyncIterator[Dict[str, Any]]:
+    async def fetch(page: int) -> List[Dict[str, Any]]:
+        data = await get_projects(client, printer_id, print_status=print_status, page=page, limit=limit)
+        return _items_from_data(data)
+
+    return _iter_pages(fetch, key=_row_key, limit=limit, prefetch=prefetch)
+
+
+class _BlockingClient:
+    # Blocking view of an AsyncCloudClient for code that runs in a worker
+    # thread: each request is scheduled on the client's event loop and waited for.
+    # The client is held weakly so _BLOCKING does not keep its own key alive.
+    def __init__(self, client: AsyncCloudClient, loop: asyncio.AbstractEventLoop) -> None:
+        self._client = weakref.ref(client)
+        self.loop = loop
+
+    @property
+    def client(self) -> AsyncCloudClient:
+        client = self._client()
+        if client is None:
+            raise RuntimeError("The async client was closed")
+        return client
+
+    def request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        return asyncio.run_coroutine_threadsafe(self.client.request(method, path, **kwargs), self.loop).result()
+
+
+_BLOCKING: "weakref.WeakKeyDictionary[AsyncCloudClient, _BlockingClient]" = weakref.WeakKeyDictionary()
+
+
+def _blocking_client(client: AsyncCloudClient) -> _BlockingClient:
+    # One per client, so the upload dedup index is shared across calls.
+    loop = asyncio.get_running_loop()
+    blocking = _BLOCKING.get(client)
+    if blocking is None:
+        blocking = _BLOCKING[client] = _BlockingClient(client, loop)
+    blocking.loop = loop
+    return blocking
+
+
+async def upload_file(
+    client: AsyncCloudClient,
+    path: str,
+    name: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    dedup: Optional[bool] = None,
+) -> str:
+    # Same engine as api.upload_file (chunked/multipart transfer, journal,
+    # dedup, lock released on failure), run in a worker thread. progress is
+    # called from that thread.
+    uploader = Uploader(_blocking_client(client), chunk_size=chunk_size, workers=workers, dedup=dedup)
+    return await asyncio.to_thread(uploader.upload, path, name, progress)
+
+
+async def send_print_order(
+    client: AsyncCloudClient,
+    file_id: str,
+    printer_id: str,
+    project_id: str,
+    order_id: str,
+    is_delete_file: str,
+    data_payload: Dict[str, Any],
+) -> dict:
+    form = _print_order_form(file_id, printer_id, project_id, order_id, is_delete_file, data_payload)
+    resp = await client.request(PRINT["send_order"]["method"], PRINT["send_order"]["path"], data=form)
+    return _json_or_raise(resp)
+
+
+async def send_video_order(client: AsyncCloudClient, printer_id: str, order_id: int = 1001) -> dict:
+    # 0x3E9 (1001) correspond à l’événement vidéo MQTT observé dans l’APK.
+    form: Dict[str, Any] = {
+        "printer_id": int(printer_id),
+        "order_id": int(order_id),
+    }
+    resp = await client.request(PRINT["send_order"]["method"], PRINT["send_order"]["path"], data=form)
+    return _json_or_raise(resp)
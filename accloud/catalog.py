@@ -0,0 +1,81 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .models import FileItem
+
+
+@dataclass(slots=True)
+class CatalogDiff:
+    added: List[FileItem] = field(default_factory=list)
+    updated: List[Tuple[FileItem, FileItem]] = field(default_factory=list)
+    removed: List[FileItem] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+    def summary(self) -> str:
+        return f"+{len(self.added)} ~{len(self.updated)} -{len(self.removed)}"
+
+
+class FileCatalog:
+    # Last known listing, in listing order. Views feed each fresh listing to
+    # apply() and patch only the rows in the returned diff.
+    def __init__(self) -> None:
+        self._items: Dict[str, FileItem] = {}
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def apply(self, items: Iterable[FileItem]) -> CatalogDiff:
+        fresh: Dict[str, FileItem] = {}
+        for item in items:
+            fresh.setdefault(item.id, item)
+        diff = CatalogDiff()
+        with self._lock:
+            for file_id, item in fresh.items():
+                old = self._items.get(file_id)
+                if old is None:
+                    diff.added.append(item)
+                elif old != item:
+                    diff.updated.append((old, item))
+            diff.removed = [item for file_id, item in self._items.items() if file_id not in fresh]
+            self._items = fresh
+            self._positions = {file_id: index for index, file_id in enumerate(fresh)}
+        return diff
+
+    def remove(self, file_ids: Iterable[str]) -> List[FileItem]:
+        # Local deletes, so the next apply() does not report them again.
+        removed = []
+        with self._lock:
+            for file_id in file_ids:
+                item = self._items.pop(str(file_id), None)
+                if item is not None:
+                    removed.append(item)
+            if removed:
+                self._positions = {file_id: index for index, file_id in enumerate(self._items)}
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items = {}
+            self._positions = {}
+
+    def get(self, file_id: str) -> Optional[FileItem]:
+        with self._lock:
+            return self._items.get(file_id)
+
+    def position(self, file_id: str) -> int:
+        with self._lock:
+            return self._positions.get(file_id, len(self._items))
+
+    def items(self) -> List[FileItem]:
+        with self._lock:
+            return list(self._items.values())
+
+    def as_dict(self) -> Dict[str, FileItem]:
+        with self._lock:
+            return dict(self._items)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
@@ -1,9 +1,23 @@
 import argparse
+import fnmatch
 import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict
 from pathlib import Path
+from typing import Dict, List, Optional
+
 
 from .client import CloudClient
-from .api import get_quota, list_files, get_download_url, delete_files
+from .columnar import ColumnarCatalog
+from .http_trace import read_trace, trace_summary
+from .api import get_quota, list_files, iter_files, get_download_url, delete_files_batched, upload_file
+from .download import download_file
+from .models import FileItem
 from .session_store import (
     DEFAULT_SESSION_PATH,
     load_cookies_from_json,
@@ -12,11 +26,32 @@ from .session_store import (
     load_session_from_har,
     save_session,
 )
+from .metrics import format_stats_table
+from .sync import CONFLICT, KEEP, TRANSFERS, SyncEngine
+from .upload import release_orphaned_uploads, restarts_transfer
 from .utils import format_bytes
 
+DEFAULT_JOBS = 4
+_AGE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+def _parse_age(text: str) -> float:
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhdw]?)', text.strip().lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f'invalid age {text!r} (e.g. 30d, 12h)')
+    return float(match.group(1)) * _AGE_UNITS[match.group(2) or 'd']
+
+
+def _add_selection(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--all', action='store_true')
+    parser.add_argument('--older-than', type=_parse_age, metavar='AGE')
+    parser.add_argument('--match', metavar='GLOB')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS)
+
 
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(prog='accloud')
+    p.add_argument('--stats', action='store_true')
     sub = p.add_subparsers(dest='cmd', required=True)
 
     auth = sub.add_parser('auth')
@@ -35,16 +70,46 @@ def build_parser() -> argparse.ArgumentParser:
     ls.add_argument('--page', type=int, default=1)
     ls.add_argument('--limit', type=int, default=10)
     ls.add_argument('--json', action='store_true')
+    ls.add_argument('--summary', action='store_true')
+    _add_selection(ls)
     ls.add_argument('--session', default=DEFAULT_SESSION_PATH)
 
     pull = sub.add_parser('pull')
-    pull.add_argument('file_id')
+    pull.add_argument('file_ids', nargs='*', metavar='file_id')
+    pull.add_argument('--out')
+    pull.add_argument('--dest')
+    pull.add_argument('--segments', type=int)
+    pull.add_argument('--resume', action='store_true')
+    _add_selection(pull)
     pull.add_argument('--session', default=DEFAULT_SESSION_PATH)
 
+    push = sub.add_parser('push')
+    push.add_argument('path')
+    push.add_argument('--name')
+    push.add_argument('--chunk-mb', type=int)
+    push.add_argument('--workers', type=int)
+    push.add_argument('--no-dedup', action='store_true')
+    push.add_argument('--session', default=DEFAULT_SESSION_PATH)
+
     rm = sub.add_parser('rm')
-    rm.add_argument('file_id')
+    rm.add_argument('file_ids', nargs='*', metavar='file_id')
+    rm.add_argument('--dry-run', action='store_true')
+    rm.add_argument('-y', '--yes', action='store_true')
+    _add_selection(rm)
     rm.add_argument('--session', default=DEFAULT_SESSION_PATH)
 
+    sync = sub.add_parser('sync')
+    sync.add_argument('directory')
+    sync.add_argument('-j', '--jobs', type=int)
+    sync.add_argument('--delete', action='store_true')
+    sync.add_argument('--dry-run', action='store_true')
+    sync.add_argument('--session', default=DEFAULT_SESSION_PATH)
+
+    trace = sub.add_parser('trace')
+    trace.add_argument('endpoint', nargs='?')
+    trace.add_argument('--days', type=int, default=7)
+    trace.add_argument('--dir', default='.')
+
     return p
 
 
@@ -68,6 +133,15 @@ def main() -> int:
         print(f'OK: session saved to {args.out}')
         return 0
 
+    if args.cmd == 'trace':
+        if not args.endpoint:
+            for endpoint, count in sorted(trace_summary(args.dir, days=args.days).items()):
+                print(f"{count}\t{endpoint}")
+            return 0
+        for record in read_trace(args.endpoint, args.dir, days=args.days):
+            print(json.dumps(record, ensure_ascii=True))
+        return 0
+
     cookies = None
     session_path = getattr(args, 'session', DEFAULT_SESSION_PATH)
     tokens = {}
@@ -77,7 +151,22 @@ def main() -> int:
         tokens = session.get('tokens', {})
 
     client = CloudClient(cookies=cookies, tokens=tokens)
+    try:
+        if args.cmd in ('push', 'sync'):
+            # Only commands that upload sweep the journal (it unlocks over the network).
+            for entry in release_orphaned_uploads(client):
+                if args.cmd != 'push' or Path(entry['source']) != Path(args.path).resolve():
+                    action = 'send it again' if restarts_transfer(entry) else 'resume'
+                    print(f"Interrupted upload pending: {entry['source']} (run push again to {action})", file=sys.stderr)
+        return _run(args, client)
+    finally:
+        if args.stats:
+            for line in format_stats_table(client.stats()["endpoints"]):
+                print(line, file=sys.stderr)
+        client.close()
+
 
+def _run(args: argparse.Namespace, client: CloudClient) -> int:
     if args.cmd == 'quota':
         q = get_quota(client)
         if args.json:
@@ -87,26 +176,321 @@ def main() -> int:
         return 0
 
     if args.cmd == 'ls':
-        items = list_files(client, page=args.page, limit=args.limit)
+        if args.summary:
+            return _summary(client, args)
+        if _is_bulk(args):
+            items = _select_files(client, args)
+        else:
+            items = list_files(client, page=args.page, limit=args.limit)
         if args.json:
-            print(json.dumps([item.__dict__ for item in items], indent=2))
+            print(json.dumps([asdict(item) for item in items], indent=2))
         else:
             for item in items:
                 print(f"{item.id}	{item.size_bytes}	{item.name}")
         return 0
 
     if args.cmd == 'pull':
-        url = get_download_url(client, args.file_id)
-        print(url)
+        if _is_bulk(args) or args.dest:
+            return _pull_many(client, args)
+        if len(args.file_ids) != 1:
+            raise SystemExit('pull needs one file_id (or --dest DIR with several ids, --all, --older-than, --match)')
+        file_id = args.file_ids[0]
+        if not args.out:
+            url = get_download_url(client, file_id)
+            print(url)
+            return 0
+
+        def progress(done: int, total: int) -> None:
+            pct = done * 100 / total if total else 100.0
+            print(f"\r{format_bytes(done)} / {format_bytes(total)} ({pct:.0f}%)", end='', file=sys.stderr)
+
+        # The listing carries the md5 to check the download against.
+        item = _find_file(client, file_id)
+        if item is None or not item.md5:
+            print(f'No md5 listed for {file_id}: content not verified', file=sys.stderr)
+        saved = download_file(
+            client,
+            file_id,
+            args.out,
+            md5=item.md5 if item else None,
+            segments=args.segments,
+            progress=progress,
+            resume=args.resume,
+        )
+        print(file=sys.stderr)
+        print(saved)
+        return 0
+
+    if args.cmd == 'push':
+        def progress(sent: int, total: int) -> None:
+            pct = sent * 100 / total if total else 100.0
+            print(f"\r{format_bytes(sent)} / {format_bytes(total)} ({pct:.0f}%)", end='', file=sys.stderr)
+
+        chunk_size = args.chunk_mb * 1024 * 1024 if args.chunk_mb else None
+        file_id = upload_file(
+            client,
+            args.path,
+            name=args.name,
+            chunk_size=chunk_size,
+            workers=args.workers,
+            progress=progress,
+            dedup=False if args.no_dedup else None,
+        )
+        print(file=sys.stderr)
+        print(file_id)
         return 0
 
     if args.cmd == 'rm':
-        delete_files(client, [args.file_id])
+        if _is_bulk(args):
+            return _rm_many(client, args)
+        if not args.file_ids:
+            raise SystemExit('rm needs a file_id (or --all, --older-than, --match)')
+        delete_files_batched(client, args.file_ids)
         print('OK')
         return 0
 
+    if args.cmd == 'sync':
+        return _sync(client, args)
+
     return 1
 
 
+def _is_bulk(args: argparse.Namespace) -> bool:
+    return bool(args.all or args.older_than is not None or args.match or len(getattr(args, 'file_ids', ())) > 1)
+
+
+def _created_seconds(item: FileItem) -> float:
+    # The listing reports seconds, some rows milliseconds.
+    return item.created_at / 1000.0 if item.created_at > 10_000_000_000 else float(item.created_at)
+
+
+def _find_file(client: CloudClient, file_id: str) -> Optional[FileItem]:
+    for item in iter_files(client, limit=50, prefetch=1):
+        if item.id == str(file_id):
+            return item
+    return None
+
+
+def _select_files(client: CloudClient, args: argparse.Namespace) -> List[FileItem]:
+    ids = set(getattr(args, 'file_ids', None) or ())
+    cutoff = time.time() - args.older_than if args.older_than is not None else None
+    selected = []
+    # One pass over the whole listing, pages fetched ahead on the shared client.
+    for item in iter_files(client, limit=50, prefetch=max(1, min(args.jobs, 4))):
+        if ids and item.id not in ids:
+            continue
+        if cutoff is not None and (not item.created_at or _created_seconds(item) > cutoff):
+            continue
+        if args.match and not fnmatch.fnmatch(item.name.lower(), args.match.lower()):
+            continue
+        selected.append(item)
+    missing = ids - {item.id for item in selected} if ids and cutoff is None and not args.match else set()
+    for file_id in sorted(missing):
+        print(f'Not found: {file_id}', file=sys.stderr)
+    return selected
+
+
+class _BulkProgress:
+    def __init__(self, label: str, count: int, total: int) -> None:
+        self.label = label
+        self.count = count
+        self.total = total
+        self.finished = 0
+        self.failed = 0
+        self._done: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._last = 0.0
+
+    def update(self, key: str, done: int) -> None:
+        with self._lock:
+            self._done[key] = done
+        self._render()
+
+    def callback(self, key: str):
+        return lambda done, _total: self.update(key, done)
+
+    def finish(self, key: str, size: int, ok: bool = True) -> None:
+        with self._lock:
+            self._done[key] = size if ok else self._done.get(key, 0)
+            self.finished += 1
+            if not ok:
+                self.failed += 1
+        self._render(force=True)
+
+    def _render(self, force: bool = False) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last < 0.2:
+                return
+            self._last = now
+            done = sum(self._done.values())
+            pct = done * 100 / self.total if self.total else 100.0
+            failed = f', {self.failed} failed' if self.failed else ''
+            line = f'\r{self.label} {self.finished}/{self.count}{failed} - {format_bytes(done)} / {format_bytes(self.total)} ({pct:.0f}%)'
+        print(line, end='', file=sys.stderr)
+
+
+def _local_names(items: List[FileItem]) -> Dict[str, str]:
+    # Cloud names are not unique; later duplicates get their id appended.
+    names: Dict[str, str] = {}
+    taken = set()
+    for item in items:
+        name = os.path.basename(item.name.replace('\\', '/')) or item.id
+        if name.lower() in taken:
+            stem, ext = os.path.splitext(name)
+            name = f'{stem}-{item.id}{ext}'
+        taken.add(name.lower())
+        names[item.id] = name
+    return names
+
+
+def _pull_many(client: CloudClient, args: argparse.Namespace) -> int:
+    if args.out:
+        raise SystemExit('use --dest DIR for several files')
+    dest_dir = Path(args.dest or '.')
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    items = _select_files(client, args)
+    names = _local_names(items)
+    todo = []
+    for item in items:
+        target = dest_dir / names[item.id]
+        if target.exists() and target.stat().st_size == item.size_bytes:
+            continue
+        todo.append((item, target))
+    skipped = len(items) - len(todo)
+    if skipped:
+        print(f'{skipped} file(s) already present', file=sys.stderr)
+    if not todo:
+        return 0
+
+    jobs = max(1, args.jobs)
+    tracker = _BulkProgress('pull', len(todo), sum(item.size_bytes for item, _ in todo))
+    errors: List[str] = []
+    # S3 transfers all go through the shared pool (accloud.http_pool).
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix='accloud-pull') as pool:
+        futures = {
+            pool.submit(
+                download_file,
+                client,
+                item.id,
+                str(target),
+                md5=item.md5,
+                segments=args.segments,
+                progress=tracker.callback(item.id),
+                resume=args.resume,
+            ): item
+            for item, target in todo
+        }
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                future.result()
+            except Exception as exc:
+                errors.append(f'{item.id}\t{item.name}\t{exc}')
+                tracker.finish(item.id, item.size_bytes, ok=False)
+            else:
+                tracker.finish(item.id, item.size_bytes)
+    print(file=sys.stderr)
+    for line in errors:
+        print(f'Failed: {line}', file=sys.stderr)
+    return 1 if errors else 0
+
+
+def _confirm_delete(items: List[FileItem], yes: bool) -> bool:
+    # Bulk deletes need --yes, or an explicit answer on a terminal.
+    if yes:
+        return True
+    summary = f'{len(items)} cloud file(s), {format_bytes(sum(item.size_bytes for item in items))}'
+    if not sys.stdin.isatty():
+        print(f'Refusing to delete {summary} without --yes (use --dry-run to preview)', file=sys.stderr)
+        return False
+    try:
+        answer = input(f'Delete {summary}? [y/N] ')
+    except EOFError:
+        return False
+    return answer.strip().lower() in ('y', 'yes')
+
+
+def _rm_many(client: CloudClient, args: argparse.Namespace) -> int:
+    items = _select_files(client, args)
+    if args.dry_run:
+        for item in items:
+            print(f"{item.id}\t{item.size_bytes}\t{item.name}")
+        print(f'{len(items)} file(s) would be deleted', file=sys.stderr)
+        return 0
+    if not items:
+        print('No file selected', file=sys.stderr)
+        return 0
+    if not _confirm_delete(items, args.yes):
+        print('Aborted: nothing deleted', file=sys.stderr)
+        return 1
+    tracker = _BulkProgress('rm', len(items), sum(item.size_bytes for item in items))
+    sizes = {item.id: item.size_bytes for item in items}
+
+    def on_batch(ids: List[str], error: Optional[Exception]) -> None:
+        for file_id in ids:
+            tracker.finish(file_id, sizes.get(file_id, 0), ok=error is None)
+
+    try:
+        deleted = delete_files_batched(client, list(sizes), workers=args.jobs, on_batch=on_batch)
+    except RuntimeError as exc:
+        print(file=sys.stderr)
+        print(exc, file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+    print(f'Deleted {len(deleted)} file(s)')
+    return 0
+
+
+def _summary(client: CloudClient, args: argparse.Namespace) -> int:
+    # Whole-account totals from the columnar catalog (needs numpy).
+    # Built from the raw listing rows; the selection is applied on the columns.
+    catalog = ColumnarCatalog.from_client(client, limit=50, prefetch=max(1, min(args.jobs, 4)))
+    if args.older_than is not None:
+        catalog = catalog.created_between(1, time.time() - args.older_than)
+    if args.match:
+        catalog = catalog.matching(args.match)
+    by_type = catalog.by_type()
+    if args.json:
+        print(json.dumps({
+            'files': len(catalog),
+            'total_bytes': catalog.total_size(),
+            'by_type': [{'file_type': t, 'files': count, 'bytes': size} for t, (count, size) in by_type.items()],
+            'oldest': [{'id': i, 'size': s, 'created_at': c, 'file_type': t, 'name': n} for i, s, c, t, n in catalog.oldest(5).rows()],
+        }, indent=2))
+        return 0
+    print(f"{len(catalog)} file(s), {format_bytes(catalog.total_size())}")
+    for file_type, (count, size) in sorted(by_type.items(), key=lambda kv: -kv[1][1]):
+        print(f"type {'-' if file_type is None else file_type}\t{count}\t{format_bytes(size)}")
+    return 0
+
+
+def _sync(client: CloudClient, args: argparse.Namespace) -> int:
+    engine = SyncEngine(client, args.directory, jobs=args.jobs, delete=args.delete)
+    actions = engine.plan()
+    counts: Dict[str, int] = {}
+    for action in actions:
+        counts[action.kind] = counts.get(action.kind, 0) + 1
+        if action.kind != KEEP or action.reason:
+            if args.dry_run or action.kind not in TRANSFERS:
+                print(f"{action.kind}\t{action.name}\t{action.reason}")
+    print(', '.join(f'{count} {kind}' for kind, count in sorted(counts.items())) or 'nothing to sync', file=sys.stderr)
+    if args.dry_run:
+        return 0
+
+    work = [action for action in actions if action.kind in TRANSFERS]
+    tracker = _BulkProgress('sync', len(work), sum(action.size for action in work))
+    failures = engine.run(
+        actions,
+        progress=lambda action, done, _total: tracker.update(action.name, done),
+        on_done=lambda action, error: tracker.finish(action.name, action.size, ok=error is None),
+    )
+    if work:
+        print(file=sys.stderr)
+    for action, error in failures:
+        print(f'Failed: {action.kind} {action.name}: {error}', file=sys.stderr)
+    return 1 if failures or counts.get(CONFLICT) else 0
+
+
 if __name__ == '__main__':
     raise SystemExit(main())
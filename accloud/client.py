@@ -1,9 +1,11 @@
-from typing import Any, Dict, Optional
+from typing import Any, ContextManager, Dict, Hashable, Optional, Tuple
 import hashlib
 import json
 import os
 import time
+import asyncio
 import uuid
+from urllib.parse import urlsplit
 
 try:
     import httpx
@@ -13,24 +15,59 @@ except ModuleNotFoundError as exc:  # pragma: no cover - user environment depend
     ) from exc
 
 from endpoints import BASE_URL
-from .utils import append_log_line, get_logger, redact_payload, redacted_headers, truncate_text
+from .endpoint_map import endpoint_group, endpoint_key, endpoint_spec
+from .governor import AsyncGovernor, Governor, current_lane, get_governor, priority
+from .http_trace import get_trace_writer
+from .metrics import RequestMetrics
+from .response_cache import ResponseCache
+from .retry import Retrier, get_retrier
+from .singleflight import AsyncSingleFlight, SingleFlight
+from .utils import env_bool, get_log_writer, get_logger, redact_payload, redacted_headers, truncate_text
 
 
-class CloudClient:
+def _payload_sizes(resp: Optional[httpx.Response]) -> Tuple[int, int]:
+    if resp is None:
+        return 0, 0
+    try:
+        req_bytes = len(resp.request.content)
+    except httpx.RequestNotRead:
+        req_bytes = int(resp.request.headers.get("content-length") or 0)
+    return req_bytes, len(resp.content)
+
+
+class _CloudClientBase:
     def __init__(
         self,
         base_url: str = BASE_URL,
         cookies: Optional[httpx.Cookies] = None,
         tokens: Optional[Dict[str, Any]] = None,
         timeout: float = 30.0,
+        coalesce: bool = True,
+        cache: bool = True,
+        trace_format: Optional[str] = None,
+        retry: bool = True,
+        retrier: Optional[Retrier] = None,
     ):
         self.base_url = base_url.rstrip('/')
         self.cookies = cookies or httpx.Cookies()
         self.tokens = tokens or {}
         self.timeout = timeout
+        self.coalesce = coalesce
+        self.response_cache: Optional[ResponseCache] = None
+        if cache and env_bool("ACCLOUD_RESPONSE_CACHE", True):
+            self.response_cache = ResponseCache()
         self.logger = get_logger('accloud')
-        self._client = httpx.Client(base_url=self.base_url, cookies=self.cookies, timeout=self.timeout)
+        self.metrics = RequestMetrics()
+        self.retrier: Optional[Retrier] = (retrier or get_retrier()) if retry else None
         self.http_log_path = os.path.join(os.getcwd(), "accloud_http.log")
+        # "text" (accloud_http.log), "jsonl" (indexed day files) or "both".
+        self.trace_format = (trace_format or os.getenv("ACCLOUD_HTTP_TRACE", "text")).lower()
+        self._http_log = None
+        self._http_trace = None
+        if self.trace_format in ("text", "both"):
+            self._http_log = get_log_writer(self.http_log_path, rotate_daily=True, keep_days=7, compress=True)
+        if self.trace_format in ("jsonl", "both"):
+            self._http_trace = get_trace_writer(os.getcwd())
 
         # Constants extracted from web app bundle (HAR)
         self._app_id = "f9b3528877c94d5c9c5af32245db46ef"
@@ -59,8 +96,52 @@ class CloudClient:
             headers["XX-Token"] = str(token)
         return headers
 
-    def request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
-        url = path if path.startswith('http') else f"{self.base_url}{path}"
+    def _resolve_url(self, path: str) -> str:
+        return path if path.startswith('http') else f"{self.base_url}{path}"
+
+    def _coalesce_key(self, method: str, url: str, kwargs: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+        # Only idempotent, body-less GETs are safe to share between callers.
+        if not self.coalesce or method.upper() != "GET":
+            return None
+        if any(k in kwargs for k in ("json", "data", "content", "files")):
+            return None
+        params = kwargs.get("params") or {}
+        try:
+            params_key = tuple(sorted((str(k), str(v)) for k, v in dict(params).items()))
+        except (TypeError, ValueError):
+            return None
+        headers_key = tuple(sorted((kwargs.get("headers") or {}).items()))
+        return ("GET", url, params_key, headers_key, str(self.tokens.get("token") or ""))
+
+    def _flush_logs(self) -> None:
+        for writer in (self._http_log, self._http_trace):
+            if writer is not None:
+                writer.flush()
+
+    def _cache_key(self, endpoint: Optional[str], method: str, kwargs: Dict[str, Any]) -> Optional[Hashable]:
+        if self.response_cache is None:
+            return None
+        return self.response_cache.key_for(endpoint, method, kwargs, str(self.tokens.get("token") or ""))
+
+    def _invalidate_after(self, endpoint: Optional[str]) -> None:
+        targets = endpoint_spec(endpoint).get("invalidates")
+        if targets and self.response_cache is not None:
+            self.response_cache.invalidate(targets)
+
+    def invalidate_cache(self, *endpoints: str) -> None:
+        if self.response_cache is None:
+            return
+        if endpoints:
+            self.response_cache.invalidate(endpoints)
+        else:
+            self.response_cache.clear()
+
+    def cache_stats(self) -> Dict[str, int]:
+        if self.response_cache is None:
+            return {}
+        return self.response_cache.stats()
+
+    def _prepare_request(self, method: str, url: str, kwargs: Dict[str, Any]) -> None:
         headers = dict(self._default_headers())
         headers.update(kwargs.get('headers', {}) or {})
         kwargs['headers'] = headers
@@ -71,38 +152,312 @@ class CloudClient:
         elif "data" in kwargs:
             payload = kwargs.get("data")
         self.logger.debug('HTTP %s %s headers=%s', method, url, redacted)
+        if self._http_log is None:
+            return
         if payload is not None:
-            append_log_line(
-                self.http_log_path,
-                f"{method} {url} headers={redacted} payload={payload}",
-                rotate_daily=True,
-                keep_days=7,
-                compress=True,
-            )
+            self._http_log.write(f"{method} {url} headers={redacted} payload={payload}")
         else:
-            append_log_line(
-                self.http_log_path,
-                f"{method} {url} headers={redacted}",
-                rotate_daily=True,
-                keep_days=7,
-                compress=True,
-            )
-        resp = self._client.request(method, url, **kwargs)
+            self._http_log.write(f"{method} {url} headers={redacted}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "since": self.metrics.started_at,
+            "inflight": self.metrics.inflight(),
+            "endpoints": self.metrics.snapshot(),
+            "cache": self.cache_stats(),
+            "coalesce": self.coalesce_stats(),
+            "retry": self.retrier.stats() if self.retrier is not None else {},
+            "governor": self.governor.stats(),
+        }
+
+    def priority(self, lane: str) -> ContextManager[None]:
+        # Requests issued inside the block (same thread or task) use this lane.
+        return priority(lane)
+
+    def _lane(self, endpoint: Optional[str]) -> str:
+        return endpoint_spec(endpoint).get("priority") or current_lane()
+
+    def coalesce_stats(self) -> Dict[str, int]:
+        return self._flights.stats()
+
+    def _retry_delay(
+        self,
+        method: str,
+        url: str,
+        kwargs: Dict[str, Any],
+        attempt: int,
+        resp: Optional[httpx.Response] = None,
+        error: Optional[BaseException] = None,
+    ) -> Optional[float]:
+        if self.retrier is None:
+            return None
+        delay = self.retrier.next_delay(endpoint_key(url), method, kwargs, attempt, resp, error)
+        if delay is not None:
+            reason = resp.status_code if resp is not None else repr(error)
+            self.logger.debug("HTTP %s %s retry %d in %.2fs (%s)", method, url, attempt, delay, reason)
+        return delay
+
+    def _metrics_key(self, url: str) -> str:
+        return endpoint_key(url) or urlsplit(url).path
+
+    def _begin(self, method: str, url: str, kwargs: Dict[str, Any]) -> float:
+        self._prepare_request(method, url, kwargs)
+        self.metrics.start(self._metrics_key(url), method, url)
+        return time.perf_counter()
+
+    def _finish(
+        self,
+        method: str,
+        url: str,
+        kwargs: Dict[str, Any],
+        resp: Optional[httpx.Response],
+        started: float,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        elapsed = time.perf_counter() - started
+        sizes = _payload_sizes(resp)
+        self.metrics.end(
+            self._metrics_key(url),
+            method,
+            url,
+            resp.status_code if resp is not None else None,
+            elapsed,
+            req_bytes=sizes[0],
+            resp_bytes=sizes[1],
+            error=error,
+        )
+        self._log_response(method, url, kwargs, resp, elapsed, sizes, error)
+
+    def _log_response(
+        self,
+        method: str,
+        url: str,
+        kwargs: Dict[str, Any],
+        resp: Optional[httpx.Response],
+        elapsed: float,
+        sizes: Tuple[int, int],
+        error: Optional[BaseException] = None,
+    ) -> None:
         response_body: Any = None
-        try:
-            response_body = resp.json()
-            response_body = redact_payload(response_body)
-        except Exception:
-            response_body = truncate_text(resp.text or "")
-        append_log_line(
-            self.http_log_path,
-            f"{method} {url} status={resp.status_code} response={json.dumps(response_body, ensure_ascii=True)}",
-            rotate_daily=True,
-            keep_days=7,
-            compress=True,
+        if resp is not None:
+            try:
+                response_body = resp.json()
+                response_body = redact_payload(response_body)
+            except Exception:
+                response_body = truncate_text(resp.text or "")
+        if self._http_log is not None and resp is not None:
+            self._http_log.write(
+                f"{method} {url} status={resp.status_code} response={json.dumps(response_body, ensure_ascii=True)}"
+            )
+        elif self._http_log is not None:
+            self._http_log.write(f"{method} {url} error={error!r}")
+        if self._http_trace is None:
+            return
+        body = None
+        if "json" in kwargs:
+            body = redact_payload(kwargs.get("json"))
+        elif "data" in kwargs:
+            body = redact_payload(kwargs.get("data"))
+        record: Dict[str, Any] = {
+            "ts": round(time.time(), 3),
+            "method": method,
+            "endpoint": self._metrics_key(url),
+            "url": url.split("?", 1)[0],
+            "params": kwargs.get("params") or None,
+            "status": resp.status_code if resp is not None else None,
+            "latency_ms": round(elapsed * 1000.0, 2),
+            "req_bytes": sizes[0],
+            "resp_bytes": sizes[1],
+            "body": body,
+            "response": response_body,
+        }
+        if error is not None:
+            record["error"] = repr(error)
+        self._http_trace.write(record)
+
+
+class CloudClient(_CloudClientBase):
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        cookies: Optional[httpx.Cookies] = None,
+        tokens: Optional[Dict[str, Any]] = None,
+        timeout: float = 30.0,
+        coalesce: bool = True,
+        cache: bool = True,
+        trace_format: Optional[str] = None,
+        retry: bool = True,
+        governor: Optional[Governor] = None,
+        retrier: Optional[Retrier] = None,
+    ):
+        super().__init__(
+            base_url=base_url,
+            cookies=cookies,
+            tokens=tokens,
+            timeout=timeout,
+            coalesce=coalesce,
+            cache=cache,
+            trace_format=trace_format,
+            retry=retry,
+            retrier=retrier,
         )
-        resp.raise_for_status()
+        self._client = httpx.Client(base_url=self.base_url, cookies=self.cookies, timeout=self.timeout)
+        self._flights = SingleFlight()
+        self.governor: Governor = governor or get_governor()
+
+    def request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        url = self._resolve_url(path)
+        endpoint = endpoint_key(url)
+        cache_key = self._cache_key(endpoint, method, kwargs)
+        generation = 0
+        if cache_key is not None:
+            cached = self.response_cache.get(endpoint, cache_key)
+            if cached is not None:
+                return cached
+            generation = self.response_cache.generation(endpoint)
+        try:
+            key = self._coalesce_key(method, url, kwargs)
+            if key is None:
+                resp = self._send(method, url, kwargs)
+            else:
+                resp = self._flights.do(key, lambda: self._send(method, url, kwargs))
+        finally:
+            self._invalidate_after(endpoint)
+        if cache_key is not None:
+            self.response_cache.put(endpoint, cache_key, resp, generation)
+        return resp
+
+    def _send(self, method: str, url: str, kwargs: Dict[str, Any]) -> httpx.Response:
+        if self.retrier is not None:
+            self.retrier.begin()
+        attempt = 1
+        while True:
+            try:
+                resp = self._attempt(method, url, dict(kwargs))
+            except httpx.TransportError as exc:
+                delay = self._retry_delay(method, url, kwargs, attempt, error=exc)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(method, url, kwargs, attempt, resp=resp)
+                if delay is None:
+                    resp.raise_for_status()
+                    return resp
+            time.sleep(delay)
+            attempt += 1
+
+    def _attempt(self, method: str, url: str, kwargs: Dict[str, Any]) -> httpx.Response:
+        endpoint = endpoint_key(url)
+        with self.governor.slot(endpoint_group(endpoint), self._lane(endpoint)):
+            started = self._begin(method, url, kwargs)
+            try:
+                resp = self._client.request(method, url, **kwargs)
+            except BaseException as exc:
+                self._finish(method, url, kwargs, None, started, exc)
+                raise
+        self._finish(method, url, kwargs, resp, started)
         return resp
 
     def close(self) -> None:
         self._client.close()
+        self._flush_logs()
+
+
+class AsyncCloudClient(_CloudClientBase):
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        cookies: Optional[httpx.Cookies] = None,
+        tokens: Optional[Dict[str, Any]] = None,
+        timeout: float = 30.0,
+        max_connections: int = 20,
+        coalesce: bool = True,
+        cache: bool = True,
+        trace_format: Optional[str] = None,
+        retry: bool = True,
+        governor: Optional[AsyncGovernor] = None,
+        retrier: Optional[Retrier] = None,
+    ):
+        super().__init__(
+            base_url=base_url,
+            cookies=cookies,
+            tokens=tokens,
+            timeout=timeout,
+            coalesce=coalesce,
+            cache=cache,
+            trace_format=trace_format,
+            retry=retry,
+            retrier=retrier,
+        )
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            cookies=self.cookies,
+            timeout=self.timeout,
+            limits=limits,
+        )
+        self._flights = AsyncSingleFlight()
+        self.governor: AsyncGovernor = governor or AsyncGovernor()
+
+    async def request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        url = self._resolve_url(path)
+        endpoint = endpoint_key(url)
+        cache_key = self._cache_key(endpoint, method, kwargs)
+        generation = 0
+        if cache_key is not None:
+            cached = self.response_cache.get(endpoint, cache_key)
+            if cached is not None:
+                return cached
+            generation = self.response_cache.generation(endpoint)
+        try:
+            key = self._coalesce_key(method, url, kwargs)
+            if key is None:
+                resp = await self._send(method, url, kwargs)
+            else:
+                resp = await self._flights.do(key, lambda: self._send(method, url, kwargs))
+        finally:
+            self._invalidate_after(endpoint)
+        if cache_key is not None:
+            self.response_cache.put(endpoint, cache_key, resp, generation)
+        return resp
+
+    async def _send(self, method: str, url: str, kwargs: Dict[str, Any]) -> httpx.Response:
+        if self.retrier is not None:
+            self.retrier.begin()
+        attempt = 1
+        while True:
+            try:
+                resp = await self._attempt(method, url, dict(kwargs))
+            except httpx.TransportError as exc:
+                delay = self._retry_delay(method, url, kwargs, attempt, error=exc)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(method, url, kwargs, attempt, resp=resp)
+                if delay is None:
+                    resp.raise_for_status()
+                    return resp
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _attempt(self, method: str, url: str, kwargs: Dict[str, Any]) -> httpx.Response:
+        endpoint = endpoint_key(url)
+        async with self.governor.slot(endpoint_group(endpoint), self._lane(endpoint)):
+            started = self._begin(method, url, kwargs)
+            try:
+                resp = await self._client.request(method, url, **kwargs)
+            except BaseException as exc:
+                self._finish(method, url, kwargs, None, started, exc)
+                raise
+        self._finish(method, url, kwargs, resp, started)
+        return resp
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+        self._flush_logs()
+
+    async def __aenter__(self) -> "AsyncCloudClient":
+        return self
+
+    async def __aexit__(self, *_exc: Any) -> None:
+        await self.aclose()
@@ -0,0 +1,168 @@
+import fnmatch
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: only needed for the columnar catalog
+    np = None
+
+from .api import iter_file_rows
+from .client import CloudClient
+from .models import FileItem
+from .utils import get_logger
+
+# file_type column value for rows without a type.
+NO_TYPE = -1
+_COLUMNS = ("ids", "sizes", "created", "file_types", "names")
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("ColumnarCatalog needs numpy (pip install numpy)")
+
+
+def _int(value, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _file_type(value) -> int:
+    return _int(value, NO_TYPE)
+
+
+class _Columns:
+    # Column lists filled row by row; rows whose id is not numeric (the API's
+    # idArr cannot address them) are skipped and counted.
+    def __init__(self) -> None:
+        self.ids: List[int] = []
+        self.sizes: List[int] = []
+        self.created: List[int] = []
+        self.file_types: List[int] = []
+        self.names: List[str] = []
+        self.skipped = 0
+
+    def add(self, file_id, size, created, file_type, name) -> None:
+        file_id = _int(file_id, -1)
+        if file_id < 0:
+            self.skipped += 1
+            return
+        self.ids.append(file_id)
+        self.sizes.append(_int(size, 0))
+        self.created.append(_int(created, 0))
+        self.file_types.append(_file_type(file_type))
+        self.names.append(sys.intern(name or ""))
+
+    def build(self) -> "ColumnarCatalog":
+        if self.skipped:
+            get_logger("accloud").warning("Catalog: skipped %d file(s) without a numeric id", self.skipped)
+        return ColumnarCatalog(self.ids, self.sizes, self.created, self.file_types, self.names)
+
+
+class ColumnarCatalog:
+    # Read-only, array-backed listing for large accounts: one NumPy column per
+    # field, so sorting, filtering and aggregates run without per-row objects.
+    # ids are int64 like the API's idArr; created is normalised to seconds.
+    def __init__(self, ids, sizes, created, file_types, names) -> None:
+        _require_numpy()
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.sizes = np.asarray(sizes, dtype=np.int64)
+        created = np.asarray(created, dtype=np.int64)
+        self.created = np.where(created > 10_000_000_000, created // 1000, created)
+        self.file_types = np.asarray(file_types, dtype=np.int32)
+        self.names = np.asarray(names, dtype=object)
+
+    @classmethod
+    def from_items(cls, items: Iterable[FileItem]) -> "ColumnarCatalog":
+        _require_numpy()
+        columns = _Columns()
+        for item in items:
+            columns.add(item.id, item.size_bytes, item.created_at, item.file_type, item.name)
+        return columns.build()
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "ColumnarCatalog":
+        # Raw listing rows go straight into the columns, with no FileItem per file.
+        _require_numpy()
+        columns = _Columns()
+        for row in rows:
+            columns.add(
+                row.get("id"),
+                row.get("size"),
+                row.get("time"),
+                row.get("file_type"),
+                row.get("old_filename") or row.get("filename"),
+            )
+        return columns.build()
+
+    @classmethod
+    def from_client(cls, client: CloudClient, limit: int = 50, prefetch: int = 4) -> "ColumnarCatalog":
+        return cls.from_rows(iter_file_rows(client, limit=limit, prefetch=prefetch))
+
+    def __len__(self) -> int:
+        return int(self.ids.shape[0])
+
+    def take(self, rows) -> "ColumnarCatalog":
+        # rows: boolean mask or index array.
+        return ColumnarCatalog(*(getattr(self, column)[rows] for column in _COLUMNS))
+
+    def sort_by(self, column: str = "created", descending: bool = False) -> "ColumnarCatalog":
+        if column not in _COLUMNS:
+            raise ValueError(f"Unknown column: {column}")
+        order = np.argsort(getattr(self, column), kind="stable")
+        return self.take(order[::-1] if descending else order)
+
+    def older_than(self, timestamp: float) -> "ColumnarCatalog":
+        return self.take(self.created < int(timestamp))
+
+    def created_between(self, start: float, end: float) -> "ColumnarCatalog":
+        return self.take((self.created >= int(start)) & (self.created <= int(end)))
+
+    def matching(self, pattern: str) -> "ColumnarCatalog":
+        # Case-insensitive glob on names.
+        pattern = pattern.lower()
+        return self.take(np.fromiter((fnmatch.fnmatch(n.lower(), pattern) for n in self.names), dtype=bool, count=len(self)))
+
+    def of_type(self, file_type: Optional[int]) -> "ColumnarCatalog":
+        return self.take(self.file_types == (NO_TYPE if file_type is None else int(file_type)))
+
+    def oldest(self, count: int) -> "ColumnarCatalog":
+        return self._extreme(self.created, count, largest=False)
+
+    def newest(self, count: int) -> "ColumnarCatalog":
+        return self._extreme(self.created, count, largest=True)
+
+    def largest(self, count: int) -> "ColumnarCatalog":
+        return self._extreme(self.sizes, count, largest=True)
+
+    def _extreme(self, values, count: int, largest: bool) -> "ColumnarCatalog":
+        count = max(0, min(int(count), len(self)))
+        if count == 0:
+            return self.take(np.zeros(0, dtype=np.int64))
+        keys = -values if largest else values
+        # argpartition is O(n); only the selected rows get sorted.
+        rows = np.argpartition(keys, count - 1)[:count] if count < len(self) else np.arange(len(self))
+        return self.take(rows[np.argsort(keys[rows], kind="stable")])
+
+    def total_size(self) -> int:
+        return int(self.sizes.sum())
+
+    def by_type(self) -> Dict[Optional[int], Tuple[int, int]]:
+        # {file_type: (count, total bytes)}; None for rows without a type.
+        types, inverse, counts = np.unique(self.file_types, return_inverse=True, return_counts=True)
+        totals = np.bincount(inverse, weights=self.sizes, minlength=len(types))
+        return {
+            (None if t == NO_TYPE else int(t)): (int(c), int(s))
+            for t, c, s in zip(types.tolist(), counts.tolist(), totals.tolist())
+        }
+
+    def file_ids(self) -> List[str]:
+        return [str(i) for i in self.ids.tolist()]
+
+    def rows(self) -> Iterator[Tuple[str, int, int, Optional[int], str]]:
+        for file_id, size, created, file_type, name in zip(
+            self.ids.tolist(), self.sizes.tolist(), self.created.tolist(), self.file_types.tolist(), self.names
+        ):
+            yield str(file_id), size, created, None if file_type == NO_TYPE else file_type, name
@@ -0,0 +1,206 @@
+import hashlib
+import itertools
+import mmap
+import os
+import queue
+import threading
+import time
+import weakref
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .api import iter_files
+from .client import CloudClient
+from .models import FileItem
+from .singleflight import SingleFlight
+
+HASH_WINDOW = 8 * 1024 * 1024
+_READ_AHEAD = 4
+_PAGE = mmap.PAGESIZE
+
+_LOCAL_HASHES: Dict[Tuple[str, int, int], str] = {}
+_LOCAL_LOCK = threading.Lock()
+
+
+def _hash_mapped(handle, size: int, window: int) -> str:
+    digest = hashlib.md5()
+    with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        ready: "queue.Queue[Optional[Tuple[int, int]]]" = queue.Queue(maxsize=_READ_AHEAD)
+        stop = threading.Event()
+
+        def read_ahead() -> None:
+            # Fault the next windows in from disk while the caller hashes the
+            # current one (hashlib releases the GIL on large buffers).
+            try:
+                for offset in range(0, size, window):
+                    if stop.is_set():
+                        return
+                    length = min(window, size - offset)
+                    if hasattr(mm, "madvise"):
+                        mm.madvise(mmap.MADV_WILLNEED, offset, length)
+                    mm[offset:offset + length:_PAGE]
+                    ready.put((offset, length))
+            finally:
+                ready.put(None)
+
+        reader = threading.Thread(target=read_ahead, name="accloud-md5-read", daemon=True)
+        reader.start()
+        view = memoryview(mm)
+        try:
+            while True:
+                item = ready.get()
+                if item is None:
+                    break
+                offset, length = item
+                digest.update(view[offset:offset + length])
+        finally:
+            stop.set()
+            while reader.is_alive():
+                try:
+                    ready.get_nowait()
+                except queue.Empty:
+                    reader.join(0.05)
+            view.release()
+    return digest.hexdigest()
+
+
+def file_md5(path: str, window: int = HASH_WINDOW) -> str:
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _LOCAL_LOCK:
+        cached = _LOCAL_HASHES.get(key)
+    if cached is not None:
+        return cached
+
+    with open(path, "rb") as handle:
+        if st.st_size == 0:
+            value = hashlib.md5().hexdigest()
+        else:
+            try:
+                value = _hash_mapped(handle, st.st_size, window)
+            except (OSError, ValueError):
+                # Not mappable (pipe, some network filesystems): plain reads.
+                handle.seek(0)
+                digest = hashlib.md5()
+                for chunk in iter(lambda: handle.read(window), b""):
+                    digest.update(chunk)
+                value = digest.hexdigest()
+
+    with _LOCAL_LOCK:
+        _LOCAL_HASHES[key] = value
+    return value
+
+
+class Md5Index:
+    # Remote md5 -> file. A full listing runs every full_ttl; in between, a
+    # stale index lists only the newest files, up to the first known id.
+    # Uploads and deletes patch it in place. The client is held weakly so
+    # the per-client registry below does not keep it alive.
+    def __init__(self, client: CloudClient, ttl: float = 120.0, full_ttl: float = 900.0) -> None:
+        self._client = weakref.ref(client)
+        self.ttl = ttl
+        self.full_ttl = full_ttl
+        self._lock = threading.Lock()
+        self._by_md5: Dict[str, FileItem] = {}
+        self._ids: Set[str] = set()
+        self._built_at = 0.0
+        self._full_at = 0.0
+        # Incremental refreshes rely on the listing being newest first.
+        self._newest_first = False
+        # Changes seen while a listing may be in flight; re-applied on swap.
+        self._added: Dict[str, FileItem] = {}
+        self._removed: Set[str] = set()
+        self._flights = SingleFlight()
+
+    @property
+    def client(self) -> CloudClient:
+        client = self._client()
+        if client is None:
+            raise RuntimeError("The client of this md5 index was closed")
+        return client
+
+    def _stale(self) -> bool:
+        with self._lock:
+            return time.monotonic() - self._built_at > self.ttl
+
+    def refresh(self, full: bool = False) -> None:
+        with self._lock:
+            full = full or not self._newest_first or time.monotonic() - self._full_at > self.full_ttl
+            known = set() if full else set(self._ids)
+        listed: List[FileItem] = []
+        newest_first = True
+        previous: Optional[int] = None
+        for item in iter_files(self.client, limit=50, prefetch=4 if full else 0):
+            if item.id in known:
+                break
+            if previous is not None and item.created_at > previous:
+                if not full:
+                    # Not listed newest first after all: list everything.
+                    return self.refresh(full=True)
+                newest_first = False
+            previous = item.created_at
+            listed.append(item)
+        with self._lock:
+            by_md5 = {} if full else dict(self._by_md5)
+            ids = set() if full else set(self._ids)
+            for item in itertools.chain(listed, self._added.values()):
+                ids.add(item.id)
+                if item.md5:
+                    by_md5.setdefault(item.md5.lower(), item)
+            self._added = {}
+            self._by_md5 = {md5: item for md5, item in by_md5.items() if item.id not in self._removed}
+            self._ids = ids - self._removed
+            self._built_at = time.monotonic()
+            if full:
+                self._full_at = self._built_at
+                self._newest_first = newest_first
+
+    def _ensure_fresh(self) -> None:
+        # Concurrent lookups share one listing.
+        if self._stale():
+            self._flights.do("refresh", lambda: self.refresh() if self._stale() else None)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built_at = 0.0
+            self._full_at = 0.0
+
+    def add(self, item: FileItem) -> None:
+        if not item.md5:
+            return
+        with self._lock:
+            self._added.setdefault(item.md5.lower(), item)
+            self._by_md5.setdefault(item.md5.lower(), item)
+            self._ids.add(item.id)
+
+    def discard(self, file_ids: Iterable[str]) -> None:
+        ids = {str(i) for i in file_ids}
+        with self._lock:
+            # File ids are never reused, so the removed set only grows.
+            self._removed |= ids
+            self._added = {md5: item for md5, item in self._added.items() if item.id not in ids}
+            self._by_md5 = {md5: item for md5, item in self._by_md5.items() if item.id not in ids}
+            self._ids -= ids
+
+    def lookup(self, md5: str, size: Optional[int] = None) -> Optional[FileItem]:
+        self._ensure_fresh()
+        with self._lock:
+            item = self._by_md5.get(md5.lower())
+        if item is not None and size is not None and item.size_bytes and item.size_bytes != size:
+            return None
+        return item
+
+
+_INDEXES: "weakref.WeakKeyDictionary[CloudClient, Md5Index]" = weakref.WeakKeyDictionary()
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_md5_index(client: CloudClient) -> Md5Index:
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(client)
+        if index is None:
+            index = _INDEXES[client] = Md5Index(client)
+        return index
+
+
+def find_remote_duplicate(client: CloudClient, path: str, md5: Optional[str] = None) -> Optional[FileItem]:
+    return get_md5_index(client).lookup(md5 or file_md5(path), size=os.path.getsize(path))
@@ -0,0 +1,357 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from .api import get_download_url
+from .client import CloudClient
+from .dedup import file_md5
+from .http_pool import get_http_pool
+from .retry import RetryPolicy
+from .utils import env_int, get_logger
+
+DEFAULT_SEGMENTS = 4
+# Below this a segment costs more in round trips than it gains in parallelism.
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+_CHUNK_SIZE = 1024 * 1024
+_CHECKPOINT_BYTES = 8 * 1024 * 1024
+# A fresh URL that is rejected again is not an expiry: stop refreshing.
+_MAX_REFRESHES = 2
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+ProgressCallback = Callable[[int, int], None]
+
+_SEEK_LOCK = threading.Lock()
+
+
+class RangeNotSupported(RuntimeError):
+    pass
+
+
+class _Progress:
+    def __init__(self, total: int, callback: Optional[ProgressCallback]) -> None:
+        self.total = total
+        self.done = 0
+        self._callback = callback
+        self._lock = threading.Lock()
+
+    def add(self, count: int) -> None:
+        with self._lock:
+            self.done += count
+            done = self.done
+        if self._callback is not None:
+            self._callback(done, self.total)
+
+
+def _write_at(fd: int, data: bytes, offset: int) -> None:
+    if hasattr(os, "pwrite"):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+        return
+    # No pwrite (Windows): the descriptor's offset is shared, so serialise seek+write.
+    with _SEEK_LOCK:
+        os.lseek(fd, offset, os.SEEK_SET)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+
+
+def _split(total: int, segments: int) -> List[List[int]]:
+    size = -(-total // segments)
+    # [start, end, next offset to fetch]
+    return [[start, min(start + size, total) - 1, start] for start in range(0, total, size)]
+
+
+def _is_expired(exc: BaseException) -> bool:
+    # S3 answers an expired signature with 403 (sometimes 400).
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code in (400, 403)
+
+
+class _Source:
+    def __init__(self, url: str, refresh: Optional[Callable[[], str]]) -> None:
+        self.url = url
+        self._refresh = refresh
+        self._lock = threading.Lock()
+
+    def refresh(self, stale: str) -> bool:
+        if self._refresh is None:
+            return False
+        with self._lock:
+            # Several segments may hit the expiry at once; refresh only once.
+            if self.url == stale:
+                self.url = self._refresh()
+        return bool(self.url) and self.url != stale
+
+
+class _State:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                state = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        return state if isinstance(state, dict) else None
+
+    def save(self, state: Dict[str, Any]) -> None:
+        tmp = f"{self.path}.tmp"
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as handle:
+                json.dump(state, handle)
+            os.replace(tmp, self.path)
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class Downloader:
+    def __init__(
+        self,
+        segments: Optional[int] = None,
+        http: Optional[httpx.Client] = None,
+        retry: Optional[RetryPolicy] = None,
+    ) -> None:
+        self.segments = max(1, int(segments or env_int("ACCLOUD_DOWNLOAD_SEGMENTS", DEFAULT_SEGMENTS)))
+        self.retry = retry or RetryPolicy(max_attempts=4, base_delay=0.5, max_delay=8.0)
+        self.logger = get_logger("accloud")
+        self._http = http
+
+    def download(
+        self,
+        url: str,
+        dest: str,
+        md5: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        resume: bool = False,
+        refresh_url: Optional[Callable[[], str]] = None,
+    ) -> str:
+        part = f"{dest}.part"
+        state = _State(f"{part}.json")
+        source = _Source(url, refresh_url)
+        http = self._http or get_http_pool()
+        try:
+            self._fetch(http, source, part, state if resume else None, progress)
+        except BaseException:
+            # With resume the .part file and its state stay for the next attempt.
+            if not resume:
+                for path in (part, state.path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            raise
+
+        if md5:
+            actual = file_md5(part)
+            if actual.lower() != md5.lower():
+                os.remove(part)
+                state.remove()
+                raise RuntimeError(f"Checksum mismatch for {dest}: expected {md5}, got {actual}")
+        os.replace(part, dest)
+        state.remove()
+        return dest
+
+    def _probe(self, http: httpx.Client, source: _Source) -> Optional[Tuple[int, str, Optional[httpx.Response]]]:
+        # Probe with a one-byte range: a 206 gives the total size and proves
+        # Range support; a 200 means the server ignored it, so just use that body.
+        refreshes = 0
+        while True:
+            url = source.url
+            resp = http.send(http.build_request("GET", url, headers={"Range": "bytes=0-0"}), stream=True)
+            try:
+                if resp.status_code == 416:
+                    # Nothing satisfies byte 0: the object is empty.
+                    return None
+                resp.raise_for_status()
+            except httpx.HTTPStatusError as exc:
+                resp.close()
+                if _is_expired(exc) and refreshes < _MAX_REFRESHES and source.refresh(url):
+                    refreshes += 1
+                    continue
+                raise
+            match = _CONTENT_RANGE.match(resp.headers.get("content-range", ""))
+            validator = resp.headers.get("etag") or resp.headers.get("last-modified") or ""
+            if resp.status_code != 206 or not match or match.group(3) == "*":
+                return int(resp.headers.get("content-length") or 0), validator, resp
+            resp.close()
+            return int(match.group(3)), validator, None
+
+    def _fetch(
+        self,
+        http: httpx.Client,
+        source: _Source,
+        part: str,
+        state: Optional[_State],
+        progress: Optional[ProgressCallback],
+    ) -> None:
+        probe = self._probe(http, source)
+        if probe is None:
+            open(part, "wb").close()
+            return
+        total, validator, whole = probe
+        if whole is not None:
+            with whole:
+                self._write_stream(whole, part, _Progress(total, progress))
+            return
+
+        try:
+            self._fetch_segments(http, source, part, total, validator, state, progress)
+        except RangeNotSupported as exc:
+            self.logger.info("Segmented download failed (%s), using a single stream", exc)
+            if state is not None:
+                state.remove()
+            with http.stream("GET", source.url) as resp:
+                resp.raise_for_status()
+                self._write_stream(resp, part, _Progress(total, progress))
+
+    def _fetch_segments(
+        self,
+        http: httpx.Client,
+        source: _Source,
+        part: str,
+        total: int,
+        validator: str,
+        state: Optional[_State],
+        progress: Optional[ProgressCallback],
+    ) -> None:
+        saved = state.load() if state is not None else None
+        resuming = (
+            saved is not None
+            and saved.get("total") == total
+            and saved.get("validator") == validator
+            and os.path.exists(part)
+            and os.path.getsize(part) == total
+        )
+        if resuming:
+            ranges = [list(r) for r in saved["ranges"]]
+            self.logger.info("Resuming download into %s", part)
+        else:
+            segments = min(self.segments, max(1, total // MIN_SEGMENT_SIZE))
+            ranges = _split(total, segments)
+        record = {"total": total, "validator": validator, "ranges": ranges}
+
+        tracker = _Progress(total, progress)
+        tracker.add(sum(r[2] - r[0] for r in ranges))
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        fd = os.open(part, flags if resuming else flags | os.O_TRUNC, 0o644)
+        try:
+            if not resuming:
+                # Preallocate so every segment can write at its own offset.
+                os.ftruncate(fd, total)
+            checkpoint = (lambda: self._checkpoint(fd, state, record)) if state is not None else None
+            pending = [r for r in ranges if r[2] <= r[1]]
+            try:
+                if len(pending) == 1:
+                    self._fetch_range(http, source, fd, pending[0], tracker, checkpoint)
+                elif pending:
+                    with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="accloud-download") as pool:
+                        futures = [
+                            pool.submit(self._fetch_range, http, source, fd, r, tracker, checkpoint)
+                            for r in pending
+                        ]
+                        for future in futures:
+                            future.result()
+            finally:
+                if checkpoint is not None:
+                    checkpoint()
+        finally:
+            os.close(fd)
+
+    def _checkpoint(self, fd: int, state: _State, record: Dict[str, Any]) -> None:
+        # Snapshot the offsets before syncing so a resume never trusts bytes
+        # that were still in flight.
+        snapshot = dict(record, ranges=[list(r) for r in record["ranges"]])
+        os.fsync(fd)
+        state.save(snapshot)
+
+    def _write_stream(self, resp: httpx.Response, part: str, tracker: _Progress) -> None:
+        with open(part, "wb") as handle:
+            for chunk in resp.iter_bytes(_CHUNK_SIZE):
+                handle.write(chunk)
+                tracker.add(len(chunk))
+
+    def _fetch_range(
+        self,
+        http: httpx.Client,
+        source: _Source,
+        fd: int,
+        segment: List[int],
+        tracker: _Progress,
+        checkpoint: Optional[Callable[[], None]] = None,
+    ) -> None:
+        start, end = segment[0], segment[1]
+        attempt = 1
+        refreshes = 0
+        since_checkpoint = 0
+        failed_at = segment[2]
+        while segment[2] <= end:
+            url = source.url
+            try:
+                with http.stream("GET", url, headers={"Range": f"bytes={segment[2]}-{end}"}) as resp:
+                    resp.raise_for_status()
+                    if resp.status_code != 206:
+                        raise RangeNotSupported(f"server ignored Range request (HTTP {resp.status_code})")
+                    for chunk in resp.iter_bytes(_CHUNK_SIZE):
+                        chunk = chunk[: end - segment[2] + 1]
+                        _write_at(fd, chunk, segment[2])
+                        segment[2] += len(chunk)
+                        # Data came through, so a later rejection is a new expiry.
+                        refreshes = 0
+                        tracker.add(len(chunk))
+                        since_checkpoint += len(chunk)
+                        if checkpoint is not None and since_checkpoint >= _CHECKPOINT_BYTES:
+                            since_checkpoint = 0
+                            checkpoint()
+                if segment[2] <= end:
+                    raise httpx.ReadError(f"Range {start}-{end} ended early at {segment[2]}")
+            except (httpx.TransportError, httpx.HTTPStatusError) as exc:
+                if _is_expired(exc) and refreshes < _MAX_REFRESHES and source.refresh(url):
+                    refreshes += 1
+                    self.logger.info("Download URL expired, refreshed it")
+                    continue
+                if segment[2] > failed_at:
+                    # Progress since the last failure: only consecutive failures count.
+                    attempt = 1
+                failed_at = segment[2]
+                retryable = not isinstance(exc, httpx.HTTPStatusError) or exc.response.status_code in self.retry.statuses
+                if not retryable or attempt >= self.retry.max_attempts:
+                    raise
+                # Resume this segment from the last byte written.
+                time.sleep(self.retry.backoff(attempt))
+                attempt += 1
+
+
+def download_file(
+    client: CloudClient,
+    file_id: str,
+    dest: str,
+    md5: Optional[str] = None,
+    segments: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    resume: bool = False,
+    http: Optional[httpx.Client] = None,
+) -> str:
+    def fresh_url() -> str:
+        url = get_download_url(client, file_id)
+        if not url:
+            raise RuntimeError("No download URL returned")
+        return url
+
+    return Downloader(segments=segments, http=http).download(
+        fresh_url(), dest, md5=md5, progress=progress, resume=resume, refresh_url=fresh_url
+    )
@@ -0,0 +1,33 @@
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from endpoints import GROUPS
+
+_BY_PATH: Dict[str, str] = {}
+_SPECS: Dict[str, Dict[str, Any]] = {}
+for _group, _table in GROUPS.items():
+    for _name, _spec in _table.items():
+        _key = f"{_group}.{_name}"
+        _SPECS[_key] = _spec
+        _BY_PATH[_spec["path"]] = _key
+
+
+def endpoint_key(url: str) -> Optional[str]:
+    path = urlsplit(url).path if "://" in url else url.split("?", 1)[0]
+    return _BY_PATH.get(path)
+
+
+def endpoint_spec(key: Optional[str]) -> Dict[str, Any]:
+    if not key:
+        return {}
+    return _SPECS.get(key, {})
+
+
+def endpoint_group(key: Optional[str]) -> Optional[str]:
+    if not key:
+        return None
+    return key.split(".", 1)[0]
+
+
+def all_endpoints() -> Dict[str, Dict[str, Any]]:
+    return dict(_SPECS)
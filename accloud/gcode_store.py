@@ -0,0 +1,146 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from .api import get_gcode_info
+from .client import CloudClient
+from .governor import priority
+from .utils import env_bool, get_logger
+
+DEFAULT_GCODE_STORE_PATH = ".accloud/gcode_info.sqlite3"
+
+_JSON_FIELDS = ("slice_param", "slice_result")
+
+
+def _normalize(info: Dict[str, Any]) -> Dict[str, Any]:
+    # The API returns slice_param/slice_result as JSON strings; keep them parsed.
+    out = dict(info)
+    for field in _JSON_FIELDS:
+        value = out.get(field)
+        if isinstance(value, str) and value.strip():
+            try:
+                parsed = json.loads(value)
+            except ValueError:
+                continue
+            if isinstance(parsed, dict):
+                out[field] = parsed
+    return out
+
+
+class GcodeInfoStore:
+    def __init__(self, path: str = DEFAULT_GCODE_STORE_PATH) -> None:
+        self.path = path
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS gcode_info ("
+                " gcode_id TEXT PRIMARY KEY,"
+                " payload TEXT NOT NULL,"
+                " fetched_at INTEGER NOT NULL)"
+            )
+
+    def get(self, gcode_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM gcode_info WHERE gcode_id = ?", (str(gcode_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def get_many(self, gcode_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        ids = [str(i) for i in gcode_ids if i]
+        found: Dict[str, Dict[str, Any]] = {}
+        # Stay well below SQLITE_MAX_VARIABLE_NUMBER.
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            marks = ",".join("?" for _ in chunk)
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT gcode_id, payload FROM gcode_info WHERE gcode_id IN ({marks})", chunk
+                ).fetchall()
+            for gcode_id, payload in rows:
+                try:
+                    found[gcode_id] = json.loads(payload)
+                except ValueError:
+                    continue
+        return found
+
+    def put(self, gcode_id: str, info: Dict[str, Any]) -> None:
+        payload = json.dumps(info, ensure_ascii=True, separators=(",", ":"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO gcode_info (gcode_id, payload, fetched_at) VALUES (?, ?, ?)",
+                (str(gcode_id), payload, int(time.time())),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_STORE: Optional[GcodeInfoStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_gcode_store() -> Optional[GcodeInfoStore]:
+    global _STORE
+    if not env_bool("ACCLOUD_GCODE_STORE", True):
+        return None
+    with _STORE_LOCK:
+        if _STORE is None:
+            path = os.getenv("ACCLOUD_GCODE_STORE_PATH", DEFAULT_GCODE_STORE_PATH)
+            try:
+                _STORE = GcodeInfoStore(path)
+            except (OSError, sqlite3.Error) as exc:
+                get_logger("accloud").info("gcode store unavailable (%s): %s", path, exc)
+                return None
+        return _STORE
+
+
+def load_gcode_info(client: CloudClient, gcode_id: str) -> Dict[str, Any]:
+    store = get_gcode_store()
+    if store is not None:
+        cached = store.get(gcode_id)
+        if cached is not None:
+            return cached
+    info = _normalize(get_gcode_info(client, gcode_id) or {})
+    if store is not None and info:
+        store.put(gcode_id, info)
+    return info
+
+
+def warm_gcode_info(client: CloudClient, gcode_ids: Iterable[Optional[str]], workers: int = 4) -> int:
+    store = get_gcode_store()
+    if store is None:
+        return 0
+    wanted = list(dict.fromkeys(str(i) for i in gcode_ids if i))
+    known = store.get_many(wanted)
+    missing: List[str] = [i for i in wanted if i not in known]
+    if not missing:
+        return 0
+
+    def fetch(gcode_id: str) -> bool:
+        try:
+            with priority("background"):
+                info = _normalize(get_gcode_info(client, gcode_id) or {})
+        except Exception:
+            return False
+        if not info:
+            return False
+        store.put(gcode_id, info)
+        return True
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="accloud-gcode") as pool:
+        return sum(1 for ok in pool.map(fetch, missing) if ok)
@@ -0,0 +1,335 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from endpoints import LIMITS
+from .utils import env_bool
+
+LANES = ("interactive", "normal", "background")
+_LANE_RANK = {lane: rank for rank, lane in enumerate(LANES)}
+
+_CURRENT_LANE: "contextvars.ContextVar[str]" = contextvars.ContextVar("accloud_lane", default="normal")
+
+
+def current_lane() -> str:
+    return _CURRENT_LANE.get()
+
+
+@contextmanager
+def priority(lane: str) -> Iterator[None]:
+    if lane not in _LANE_RANK:
+        raise ValueError(f"Unknown priority lane: {lane}")
+    token = _CURRENT_LANE.set(lane)
+    try:
+        yield
+    finally:
+        _CURRENT_LANE.reset(token)
+
+
+class _BucketBase:
+    # Callers waiting for a token queue by lane, so a token always goes to the
+    # most urgent waiter rather than to whoever asked first.
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+
+    def _refill(self) -> float:
+        # Seconds until a whole token is available (0 if one is).
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        return 0.0 if self._tokens >= 1.0 else (1.0 - self._tokens) / self.rate
+
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+
+class TokenBucket(_BucketBase):
+    def __init__(self, rate: float, burst: float) -> None:
+        super().__init__(rate, burst)
+        self._cond = threading.Condition()
+
+    def acquire(self, lane: str) -> None:
+        with self._cond:
+            if not self._waiters and self._refill() == 0:
+                self._tokens -= 1.0
+                return
+            ticket = (_LANE_RANK.get(lane, 1), next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if self._waiters[0] == ticket:
+                        wait = self._refill()
+                        if wait == 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiters)
+            self._tokens -= 1.0
+            self._cond.notify_all()
+
+
+class AsyncTokenBucket(_BucketBase):
+    def __init__(self, rate: float, burst: float) -> None:
+        super().__init__(rate, burst)
+        # Resolved whenever the head of the queue changes.
+        self._changed: Optional["asyncio.Future[None]"] = None
+
+    def _notify(self) -> None:
+        if self._changed is not None and not self._changed.done():
+            self._changed.set_result(None)
+        self._changed = None
+
+    async def acquire(self, lane: str) -> None:
+        if not self._waiters and self._refill() == 0:
+            self._tokens -= 1.0
+            return
+        ticket = (_LANE_RANK.get(lane, 1), next(self._seq))
+        heapq.heappush(self._waiters, ticket)
+        try:
+            while True:
+                if self._waiters[0] == ticket:
+                    wait = self._refill()
+                    if wait == 0:
+                        break
+                    await asyncio.sleep(wait)
+                else:
+                    if self._changed is None:
+                        self._changed = asyncio.get_running_loop().create_future()
+                    await asyncio.shield(self._changed)
+        except BaseException:
+            self._waiters.remove(ticket)
+            heapq.heapify(self._waiters)
+            self._notify()
+            raise
+        heapq.heappop(self._waiters)
+        self._tokens -= 1.0
+        self._notify()
+
+
+class PriorityGate:
+    def __init__(self, limit: int) -> None:
+        self.limit = max(1, int(limit))
+        self._active = 0
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+
+    def acquire(self, lane: str) -> None:
+        with self._cond:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return
+            ticket = (_LANE_RANK.get(lane, 1), next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while not (self._active < self.limit and self._waiters[0] == ticket):
+                    self._cond.wait()
+            except BaseException:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiters)
+            self._active += 1
+            if self._active < self.limit and self._waiters:
+                self._cond.notify_all()
+
+    def release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def waiting(self) -> int:
+        with self._cond:
+            return len(self._waiters)
+
+
+class AsyncPriorityGate:
+    def __init__(self, limit: int) -> None:
+        self.limit = max(1, int(limit))
+        self._active = 0
+        self._waiters: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, lane: str) -> None:
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (_LANE_RANK.get(lane, 1), next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # The slot was handed over just before the cancel landed.
+                self.release()
+            else:
+                self._waiters = [w for w in self._waiters if w[2] is not fut]
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _rank, _seq, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                # Hand the slot straight to the next waiter; _active is unchanged.
+                fut.set_result(None)
+                return
+        self._active -= 1
+
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+
+def _limits_from_endpoints() -> Dict[str, Dict[str, Any]]:
+    return {group: dict(values) for group, values in LIMITS.items()}
+
+
+class _GovernorBase:
+    _bucket_class: Any = TokenBucket
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        self.limits = _limits_from_endpoints() if limits is None else dict(limits)
+        self.enabled = env_bool("ACCLOUD_RATE_LIMIT", True)
+        self._buckets: Dict[str, Any] = {}
+        self._stats_lock = threading.Lock()
+        self._waits: Dict[str, List[float]] = {lane: [0, 0.0] for lane in LANES}
+        for group, values in self.limits.items():
+            if float(values.get("rate") or 0) > 0:
+                self._buckets[group] = self._bucket_class(values["rate"], values.get("burst", values["rate"]))
+
+    def _groups(self, group: Optional[str]) -> List[str]:
+        # Group-specific limits first so a request waiting on its own group
+        # does not hold a global slot meanwhile. Groups marked "global": False
+        # (CDN traffic) stay out of the API-wide "*" limit.
+        own = self.limits.get(group) if group and group != "*" else None
+        groups = [group] if own is not None else []
+        if "*" in self.limits and (own is None or own.get("global", True)):
+            groups.append("*")
+        return groups
+
+    def _record_wait(self, lane: str, waited: float) -> None:
+        with self._stats_lock:
+            entry = self._waits.setdefault(lane, [0, 0.0])
+            entry[0] += 1
+            entry[1] += waited
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            lanes = {
+                lane: {"requests": int(count), "wait_ms": round(total * 1000.0, 1)}
+                for lane, (count, total) in self._waits.items()
+            }
+        return {"enabled": self.enabled, "lanes": lanes, "queued": self._queued()}
+
+    def _queued(self) -> Dict[str, int]:
+        return {}
+
+
+class Governor(_GovernorBase):
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        super().__init__(limits)
+        self._gates: Dict[str, PriorityGate] = {
+            group: PriorityGate(values["concurrency"])
+            for group, values in self.limits.items()
+            if values.get("concurrency")
+        }
+
+    @contextmanager
+    def slot(self, group: Optional[str], lane: Optional[str] = None) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        lane = lane or current_lane()
+        started = time.monotonic()
+        acquired: List[PriorityGate] = []
+        try:
+            groups = self._groups(group)
+            # Tokens first, in lane order: a request waiting on the rate limit
+            # must not hold a concurrency slot it is not using.
+            for name in groups:
+                bucket = self._buckets.get(name)
+                if bucket is not None:
+                    bucket.acquire(lane)
+            for name in groups:
+                gate = self._gates.get(name)
+                if gate is not None:
+                    gate.acquire(lane)
+                    acquired.append(gate)
+            self._record_wait(lane, time.monotonic() - started)
+            yield
+        finally:
+            for gate in reversed(acquired):
+                gate.release()
+
+    def _queued(self) -> Dict[str, int]:
+        return {group: gate.waiting() for group, gate in self._gates.items()}
+
+
+class AsyncGovernor(_GovernorBase):
+    _bucket_class = AsyncTokenBucket
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        super().__init__(limits)
+        self._gates: Dict[str, AsyncPriorityGate] = {
+            group: AsyncPriorityGate(values["concurrency"])
+            for group, values in self.limits.items()
+            if values.get("concurrency")
+        }
+
+    @asynccontextmanager
+    async def slot(self, group: Optional[str], lane: Optional[str] = None) -> AsyncIterator[None]:
+        if not self.enabled:
+            yield
+            return
+        lane = lane or current_lane()
+        started = time.monotonic()
+        acquired: List[AsyncPriorityGate] = []
+        try:
+            groups = self._groups(group)
+            for name in groups:
+                bucket = self._buckets.get(name)
+                if bucket is not None:
+                    await bucket.acquire(lane)
+            for name in groups:
+                gate = self._gates.get(name)
+                if gate is not None:
+                    await gate.acquire(lane)
+                    acquired.append(gate)
+            self._record_wait(lane, time.monotonic() - started)
+            yield
+        finally:
+            for gate in reversed(acquired):
+                gate.release()
+
+    def _queued(self) -> Dict[str, int]:
+        return {group: gate.waiting() for group, gate in self._gates.items()}
+
+
+_GOVERNOR: Optional[Governor] = None
+_GOVERNOR_LOCK = threading.Lock()
+
+
+def get_governor() -> Governor:
+    # Shared by every sync client and the image fetcher so limits are global.
+    global _GOVERNOR
+    with _GOVERNOR_LOCK:
+        if _GOVERNOR is None:
+            _GOVERNOR = Governor()
+        return _GOVERNOR
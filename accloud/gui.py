@@ -3,18 +3,20 @@ import threading
 import tkinter as tk
 import webbrowser
 from datetime import datetime
-from io import BytesIO
 from tkinter import filedialog, messagebox, ttk
 from tkinter.scrolledtext import ScrolledText
 from typing import Optional
 
 import json
-import httpx
 from PIL import Image, ImageTk
 
-from .api import delete_files, get_download_url, get_gcode_info, get_quota, list_files, upload_file, list_printers, get_printer_info_v2, get_projects, send_print_order, send_video_order
+from .api import delete_files_batched, get_quota, iter_files, upload_file, list_printers, iter_printers, get_printer_info_v2, get_projects, send_print_order, send_video_order
+from .catalog import FileCatalog
 from .client import CloudClient
-from .image_cache import fetch_image_bytes
+from .download import download_file
+from .gcode_store import load_gcode_info, warm_gcode_info
+from .image_cache import fetch_thumbnail
+from .upload import release_orphaned_uploads
 from .session_store import (
     DEFAULT_SESSION_PATH,
     load_session,
@@ -109,6 +111,14 @@ def _format_minutes_hm(minutes_val) -> str:
     return f"{total}m"
 
 
+def _thumbnail_image(url: str, size: int) -> Image.Image:
+    # Decoded and sized by the shared thumbnail cache; frombuffer shares the bytes.
+    thumb = fetch_thumbnail(url, size, timeout=20.0)
+    if thumb is None:
+        raise RuntimeError("Unsupported image")
+    return Image.frombuffer("RGBA", (thumb.width, thumb.height), thumb.rgba, "raw", "RGBA", 0, 1)
+
+
 class App:
     def __init__(self, root: tk.Tk) -> None:
         self.root = root
@@ -118,6 +128,7 @@ class App:
         self.session_path: Optional[str] = None
         self.client: Optional[CloudClient] = None
         self.items_by_id = {}
+        self.file_catalog = FileCatalog()
         self._thumb_cache = {}
         self._tree_id_map = {}
         self._printers_cache = []
@@ -399,10 +410,7 @@ class App:
     def _load_thumbnail(self, item_id: str, url: str) -> None:
         def worker() -> None:
             try:
-                data = fetch_image_bytes(url, timeout=20.0)
-                img = Image.open(BytesIO(data)).convert("RGB")
-                img = img.resize((150, 150))
-                tk_img = ImageTk.PhotoImage(img)
+                tk_img = ImageTk.PhotoImage(_thumbnail_image(url, 150))
             except Exception as exc:
                 self.root.after(0, lambda exc=exc: self._log(f"Thumbnail load failed: {exc}"))
                 return
@@ -475,7 +483,7 @@ class App:
         def work():
             client = self._require_client()
             if item.gcode_id:
-                return get_gcode_info(client, item.gcode_id)
+                return load_gcode_info(client, item.gcode_id)
             return {}
 
         def done(info):
@@ -543,7 +551,7 @@ class App:
     def refresh_printers(self) -> None:
         def work():
             client = self._require_client()
-            return list_printers(client)
+            return list(iter_printers(client))
 
         def done(data):
             printers = data if isinstance(data, list) else data.get("data") or data.get("list") or data
@@ -1097,10 +1105,7 @@ class App:
     def _load_job_preview(self, url: str) -> None:
         def worker() -> None:
             try:
-                data = fetch_image_bytes(url, timeout=20.0)
-                img = Image.open(BytesIO(data)).convert("RGB")
-                img = img.resize((200, 200))
-                tk_img = ImageTk.PhotoImage(img)
+                tk_img = ImageTk.PhotoImage(_thumbnail_image(url, 200))
             except Exception as exc:
                 self.root.after(0, lambda exc=exc: self._log(f"Job preview failed: {exc}"))
                 return
@@ -1260,6 +1265,21 @@ class App:
         self.refresh_list()
         self.refresh_quota()
         self.refresh_printers()
+        self._sweep_uploads()
+
+    def _sweep_uploads(self) -> None:
+        client = self.client
+
+        def worker() -> None:
+            try:
+                pending = release_orphaned_uploads(client)
+            except Exception as exc:
+                self.root.after(0, lambda exc=exc: self._log(f"Upload journal sweep failed: {exc}"))
+                return
+            for entry in pending:
+                self.root.after(0, lambda e=entry: self._log(f"Interrupted upload pending (upload again to finish): {e['source']}"))
+
+        threading.Thread(target=worker, daemon=True).start()
 
     def show_help(self) -> None:
         message = (
@@ -1322,43 +1342,83 @@ class App:
     def refresh_list(self) -> None:
         def work():
             client = self._require_client()
-            return list_files(client, page=1, limit=50)
+            return list(iter_files(client, limit=50, prefetch=4))
 
         def done(items):
-            for row in self.tree.get_children():
-                self.tree.delete(row)
-            self.items_by_id = {item.id: item for item in items}
-            self._thumb_cache = {}
-            self._tree_id_map = {}
-            for item in items:
+            # Patch only the rows that changed since the last listing.
+            diff = self.file_catalog.apply(items)
+            self.items_by_id = self.file_catalog.as_dict()
+            for item in diff.removed:
+                self._drop_row(item.id)
+            changed = []
+            for old, item in diff.updated:
+                if self.tree.exists(item.id):
+                    self.tree.item(item.id, values=self._row_values(item))
+                    if item.thumbnail and item.thumbnail != old.thumbnail:
+                        self._load_thumbnail(item.id, item.thumbnail)
+                    changed.append(item)
+            for item in sorted(diff.added, key=lambda it: self.file_catalog.position(it.id)):
                 row_id = self.tree.insert(
                     "",
-                    "end",
+                    self.file_catalog.position(item.id),
                     iid=item.id,
                     text="",
-                    values=(
-                        item.name,
-                        f"Size: {_format_mb(item.size_bytes)}",
-                        f"Add time: {_format_ts(item.created_at)}",
-                        "Details",
-                        "Delete | Download",
-                    ),
+                    values=self._row_values(item),
                 )
                 self._tree_id_map[row_id] = item.id
                 if item.thumbnail:
                     self._load_thumbnail(row_id, item.thumbnail)
-            self._set_status(f"Loaded {len(items)} items")
+                changed.append(item)
+            self._set_status(f"Loaded {len(items)} items ({diff.summary()})")
+            self._warm_gcode_info(changed)
 
         self._run_task("List files", work, done)
 
+    def _row_values(self, item):
+        return (
+            item.name,
+            f"Size: {_format_mb(item.size_bytes)}",
+            f"Add time: {_format_ts(item.created_at)}",
+            "Details",
+            "Delete | Download",
+        )
+
+    def _drop_row(self, file_id: str) -> None:
+        self._thumb_cache.pop(file_id, None)
+        self._tree_id_map.pop(file_id, None)
+        if self.tree.exists(file_id):
+            self.tree.delete(file_id)
+
+    def _warm_gcode_info(self, items) -> None:
+        client = self.client
+        gcode_ids = [item.gcode_id for item in items if item.gcode_id]
+        if not client or not gcode_ids:
+            return
+
+        def worker() -> None:
+            try:
+                warm_gcode_info(client, gcode_ids)
+            except Exception as exc:
+                self.root.after(0, lambda exc=exc: self._log(f"GCode info warm-up failed: {exc}"))
+
+        threading.Thread(target=worker, daemon=True).start()
+
     def upload_dialog(self) -> None:
         path = filedialog.askopenfilename(title="Select file to upload")
         if not path:
             return
 
+        last = {"pct": -1}
+
+        def progress(sent: int, total: int) -> None:
+            pct = int(sent * 100 / total) if total else 100
+            if pct != last["pct"]:
+                last["pct"] = pct
+                self.root.after(0, lambda: self._set_status(f"Upload ... {pct}%"))
+
         def work():
             client = self._require_client()
-            return upload_file(client, path)
+            return upload_file(client, path, progress=progress)
 
         def done(file_id):
             self._set_status(f"Upload ok (id={file_id})")
@@ -1386,17 +1446,18 @@ class App:
         if not path:
             return
 
+        item = self.items_by_id.get(file_id)
+        last = {"pct": -1}
+
+        def progress(done: int, total: int) -> None:
+            pct = int(done * 100 / total) if total else 100
+            if pct != last["pct"]:
+                last["pct"] = pct
+                self.root.after(0, lambda: self._set_status(f"Download ... {pct}%"))
+
         def work():
             client = self._require_client()
-            url = get_download_url(client, file_id)
-            if not url:
-                raise RuntimeError("No download URL returned")
-            with httpx.stream("GET", url, timeout=60.0) as resp:
-                resp.raise_for_status()
-                with open(path, "wb") as f:
-                    for chunk in resp.iter_bytes():
-                        f.write(chunk)
-            return path
+            return download_file(client, file_id, path, md5=item.md5 if item else None, progress=progress, resume=True)
 
         def done(saved_path):
             self._set_status(f"Downloaded to {saved_path}")
@@ -1420,17 +1481,27 @@ class App:
         if not messagebox.askyesno("Delete", f"Delete {len(ids)} file(s)?"):
             return
 
+        def on_batch(batch, error) -> None:
+            if error is None:
+                self.root.after(0, lambda batch=batch: self._remove_rows(batch))
+
         def work():
             client = self._require_client()
-            delete_files(client, ids)
-            return True
+            return delete_files_batched(client, ids, on_batch=on_batch)
 
-        def done(_):
-            self._set_status("Deleted")
-            self.refresh_list()
+        def done(deleted):
+            self._set_status(f"Deleted {len(deleted)} file(s)")
+            self.refresh_quota()
 
         self._run_task("Delete", work, done)
 
+    def _remove_rows(self, file_ids) -> None:
+        # Rows go as each batch is confirmed instead of reloading the list.
+        self.file_catalog.remove(file_ids)
+        for file_id in file_ids:
+            self.items_by_id.pop(file_id, None)
+            self._drop_row(file_id)
+
     # Info is accessed via the table (double-click on Info column).
 
     def _show_details_window(self, base_info: dict, gcode_info: dict, note: str = "") -> None:
@@ -1558,10 +1629,7 @@ class App:
 
             def worker() -> None:
                 try:
-                    data = fetch_image_bytes(url, timeout=20.0)
-                    img = Image.open(BytesIO(data)).convert("RGB")
-                    img = img.resize((320, 320))
-                    tk_img = ImageTk.PhotoImage(img)
+                    tk_img = ImageTk.PhotoImage(_thumbnail_image(url, 320))
                 except Exception as exc:
                     self.root.after(0, lambda exc=exc: self._log(f"Preview load failed: {exc}"))
                     self.root.after(0, lambda: preview_label.configure(text="Image unavailable", fg=muted))
@@ -0,0 +1,57 @@
+import atexit
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .utils import env_bool, env_int, get_logger
+
+# Sized for many small concurrent GETs (thumbnails) on a handful of CDN/S3
+# hosts: plenty of idle connections kept warm, no wait limit on the pool.
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_MAX_KEEPALIVE = 32
+DEFAULT_KEEPALIVE_EXPIRY = 60
+
+_POOL: Optional[httpx.Client] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool_options() -> Dict[str, Any]:
+    max_connections = max(1, env_int("ACCLOUD_HTTP_POOL_MAX", DEFAULT_MAX_CONNECTIONS))
+    return {
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(max_connections, max(0, env_int("ACCLOUD_HTTP_POOL_KEEPALIVE", DEFAULT_MAX_KEEPALIVE))),
+            keepalive_expiry=float(env_int("ACCLOUD_HTTP_POOL_KEEPALIVE_SECONDS", DEFAULT_KEEPALIVE_EXPIRY)),
+        ),
+        "timeout": httpx.Timeout(30.0, read=60.0, write=120.0, pool=None),
+    }
+
+
+def _build_pool() -> httpx.Client:
+    options = _pool_options()
+    if env_bool("ACCLOUD_HTTP2", False):
+        try:
+            return httpx.Client(http2=True, **options)
+        except ImportError:
+            get_logger("accloud").info("ACCLOUD_HTTP2 needs the h2 package (pip install httpx[http2]); using HTTP/1.1")
+    return httpx.Client(**options)
+
+
+def get_http_pool() -> httpx.Client:
+    # Shared by image fetches, S3 uploads and downloads: signed URLs carry
+    # their own auth, so no cookies or API headers live on this client.
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None or _POOL.is_closed:
+            _POOL = _build_pool()
+        return _POOL
+
+
+@atexit.register
+def close_http_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.close()
@@ -0,0 +1,176 @@
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .utils import BackgroundLogWriter, get_log_writer
+
+DEFAULT_TRACE_BASE = "accloud_http"
+
+# Day files are multi-member gzip streams: each flushed batch writes one member
+# per endpoint, and the .idx sidecar records where each member starts. Reading
+# one endpoint back only decompresses its own members; zcat still reads the
+# whole file.
+
+
+def _day_paths(directory: str, base_name: str, day: date) -> Tuple[str, str]:
+    stem = os.path.join(directory, f"{base_name}.{day.strftime('%Y-%m-%d')}")
+    return f"{stem}.jsonl.gz", f"{stem}.idx"
+
+
+class TraceWriter(BackgroundLogWriter):
+    def __init__(
+        self,
+        directory: str = ".",
+        base_name: str = DEFAULT_TRACE_BASE,
+        keep_days: int = 7,
+        **options: Any,
+    ) -> None:
+        self.directory = directory
+        self.base_name = base_name
+        self._last_cleanup: Optional[date] = None
+        os.makedirs(directory or ".", exist_ok=True)
+        super().__init__(os.path.join(directory, base_name), keep_days=keep_days, **options)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        super().write(record)
+
+    def _write_batch(self, batch: List[Tuple[datetime, Any]]) -> None:
+        groups: Dict[Tuple[date, str], List[str]] = {}
+        for when, record in batch:
+            if not isinstance(record, dict):
+                record = {"ts": when.timestamp(), "endpoint": "-", "note": str(record)}
+            endpoint = str(record.get("endpoint") or "-")
+            line = json.dumps(record, ensure_ascii=True, separators=(",", ":"), default=str)
+            groups.setdefault((when.date(), endpoint), []).append(line)
+
+        by_day: Dict[date, List[Tuple[str, List[str]]]] = {}
+        for (day, endpoint), lines in groups.items():
+            by_day.setdefault(day, []).append((endpoint, lines))
+
+        for day, members in by_day.items():
+            data_path, idx_path = _day_paths(self.directory, self.base_name, day)
+            index_lines = []
+            with open(data_path, "ab") as handle:
+                for endpoint, lines in members:
+                    blob = gzip.compress(("\n".join(lines) + "\n").encode("utf-8"))
+                    offset = handle.tell()
+                    handle.write(blob)
+                    index_lines.append(json.dumps(
+                        {"endpoint": endpoint, "offset": offset, "length": len(blob), "count": len(lines)},
+                        separators=(",", ":"),
+                    ))
+            with open(idx_path, "a", encoding="utf-8") as handle:
+                handle.write("\n".join(index_lines) + "\n")
+
+        today = datetime.now().date()
+        if self._last_cleanup != today:
+            self._last_cleanup = today
+            cleanup_traces(self.directory, self.base_name, self.keep_days)
+
+
+def get_trace_writer(directory: str = ".", base_name: str = DEFAULT_TRACE_BASE, keep_days: int = 7) -> TraceWriter:
+    writer = get_log_writer(
+        os.path.join(directory, base_name),
+        factory=lambda: TraceWriter(directory, base_name, keep_days=keep_days),
+    )
+    if not isinstance(writer, TraceWriter):
+        raise RuntimeError(f"Log path already used by a text writer: {writer.path}")
+    return writer
+
+
+def _trace_days(directory: str, base_name: str) -> List[date]:
+    pattern = re.compile(rf"^{re.escape(base_name)}\.(\d{{4}}-\d{{2}}-\d{{2}})\.idx$")
+    days = []
+    try:
+        entries = list(os.scandir(directory or "."))
+    except OSError:
+        return []
+    for entry in entries:
+        match = pattern.match(entry.name)
+        if not match:
+            continue
+        try:
+            days.append(datetime.strptime(match.group(1), "%Y-%m-%d").date())
+        except ValueError:
+            continue
+    return sorted(days)
+
+
+def cleanup_traces(directory: str, base_name: str = DEFAULT_TRACE_BASE, keep_days: int = 7) -> None:
+    if keep_days <= 0:
+        return
+    cutoff = datetime.now().date() - timedelta(days=keep_days)
+    for day in _trace_days(directory, base_name):
+        if day > cutoff:
+            continue
+        for path in _day_paths(directory, base_name, day):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _read_index(idx_path: str) -> List[Dict[str, Any]]:
+    entries = []
+    try:
+        with open(idx_path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        return []
+    return entries
+
+
+def trace_summary(
+    directory: str = ".",
+    base_name: str = DEFAULT_TRACE_BASE,
+    days: int = 7,
+) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for day in _trace_days(directory, base_name)[-days:]:
+        _data_path, idx_path = _day_paths(directory, base_name, day)
+        for entry in _read_index(idx_path):
+            endpoint = str(entry.get("endpoint"))
+            counts[endpoint] = counts.get(endpoint, 0) + int(entry.get("count", 0))
+    return counts
+
+
+def read_trace(
+    endpoint: str,
+    directory: str = ".",
+    base_name: str = DEFAULT_TRACE_BASE,
+    days: int = 7,
+) -> Iterator[Dict[str, Any]]:
+    for day in _trace_days(directory, base_name)[-days:]:
+        data_path, idx_path = _day_paths(directory, base_name, day)
+        entries = [e for e in _read_index(idx_path) if e.get("endpoint") == endpoint]
+        if not entries:
+            continue
+        try:
+            handle = open(data_path, "rb")
+        except OSError:
+            continue
+        with handle:
+            for entry in entries:
+                handle.seek(int(entry["offset"]))
+                blob = handle.read(int(entry["length"]))
+                try:
+                    text = gzip.decompress(blob).decode("utf-8")
+                except (OSError, EOFError, UnicodeDecodeError):
+                    continue
+                for line in text.splitlines():
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
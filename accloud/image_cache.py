@@ -1,61 +1,192 @@
+import atexit
 import hashlib
 import os
+import sqlite3
 import tempfile
 import threading
+import time
 from collections import OrderedDict
-from typing import Optional
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple, Union
 
-import httpx
+from PIL import Image
 
+from .governor import get_governor
+from .http_pool import get_http_pool
+from .memcache import MemoryCache, cache_budget, policy_from_env
+from .singleflight import SingleFlight
+from .utils import env_bool, env_int, get_logger
 
-def _env_int(name: str, default: int) -> int:
-    value = os.getenv(name)
-    if not value:
-        return default
-    try:
-        return int(value)
-    except ValueError:
-        return default
+_INDEX_NAME = "index.sqlite3"
+# Access times are written back in batches; a lost batch only ages entries.
+_TOUCH_BATCH = 32
+
+
+class _DiskIndex:
+    # LRU order of the on-disk entries with running totals, so limits are
+    # checked in O(1) and each eviction pops the oldest key. SQLite keeps the
+    # order across restarts; without it the index lives in memory only.
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = cache_dir
+        self.count = 0
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._touched: List[Tuple[float, str]] = []
+        self._conn: Optional[sqlite3.Connection] = None
+        try:
+            self._conn = sqlite3.connect(os.path.join(cache_dir, _INDEX_NAME), check_same_thread=False)
+            # The index can be rebuilt from the files, so skip fsync on commit.
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    " key TEXT PRIMARY KEY,"
+                    " size INTEGER NOT NULL,"
+                    " last_access REAL NOT NULL)"
+                )
+            rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        except sqlite3.Error as exc:
+            get_logger("accloud").info("image cache index unavailable, using memory only: %s", exc)
+            self._conn = None
+            rows = []
+        for key, size in rows:
+            self._entries[key] = int(size)
+        self._reconcile()
+
+    def _reconcile(self) -> None:
+        # Once per start: adopt files the index does not know (older cache,
+        # crash before commit) and forget entries deleted behind our back.
+        try:
+            found = {
+                entry.name[:-len(".bin")]: entry.stat()
+                for entry in os.scandir(self.cache_dir)
+                if entry.is_file() and entry.name.endswith(".bin")
+            }
+        except OSError:
+            return
+        missing = [key for key in self._entries if key not in found]
+        for key in missing:
+            del self._entries[key]
+        added = sorted((st.st_mtime, key, st.st_size) for key, st in found.items() if key not in self._entries)
+        for _mtime, key, size in added:
+            self._entries[key] = size
+        self.count = len(self._entries)
+        self.total_bytes = sum(self._entries.values())
+        if self._conn is not None and (missing or added):
+            self._write(
+                "DELETE FROM entries WHERE key = ?", [(key,) for key in missing],
+                "INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)",
+                [(key, size, mtime) for mtime, key, size in added],
+            )
 
+    def _write(self, *statements) -> None:
+        try:
+            with self._conn:
+                for sql, rows in zip(statements[::2], statements[1::2]):
+                    if rows:
+                        self._conn.executemany(sql, rows)
+        except sqlite3.Error as exc:
+            get_logger("accloud").info("image cache index write failed: %s", exc)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def add(self, key: str, size: int) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.count -= 1
+            self.total_bytes -= old
+        self._entries[key] = size
+        self.count += 1
+        self.total_bytes += size
+        if self._conn is not None:
+            self._write(
+                "INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)",
+                [(key, size, time.time())],
+            )
+
+    def touch(self, key: str) -> None:
+        if key not in self._entries:
+            return
+        self._entries.move_to_end(key)
+        if self._conn is not None:
+            self._touched.append((time.time(), key))
+            if len(self._touched) >= _TOUCH_BATCH:
+                self.flush()
+
+    def discard(self, key: str) -> None:
+        size = self._entries.pop(key, None)
+        if size is None:
+            return
+        self.count -= 1
+        self.total_bytes -= size
+        if self._conn is not None:
+            self._write("DELETE FROM entries WHERE key = ?", [(key,)])
+
+    def pop_oldest(self) -> Optional[str]:
+        if not self._entries:
+            return None
+        key, size = self._entries.popitem(last=False)
+        self.count -= 1
+        self.total_bytes -= size
+        return key
 
-def _env_bool(name: str, default: bool = True) -> bool:
-    value = os.getenv(name)
-    if value is None:
-        return default
-    return value not in ("0", "false", "FALSE")
+    def forget(self, keys: List[str]) -> None:
+        if self._conn is not None and keys:
+            self._write("DELETE FROM entries WHERE key = ?", [(key,) for key in keys])
+
+    def flush(self) -> None:
+        touched, self._touched = self._touched, []
+        if self._conn is not None and touched:
+            self._write("UPDATE entries SET last_access = ? WHERE key = ?", touched)
 
 
 class ImageCache:
     def __init__(self) -> None:
-        self.enabled = _env_bool("ACCLOUD_IMAGE_CACHE", True)
+        self.enabled = env_bool("ACCLOUD_IMAGE_CACHE", True)
         self.cache_dir = os.getenv(
             "ACCLOUD_IMAGE_CACHE_DIR",
             os.path.join(tempfile.gettempdir(), "accloud_image_cache"),
         )
-        self.max_mem_items = _env_int("ACCLOUD_IMAGE_CACHE_MEM", 64)
-        self.max_disk_items = _env_int("ACCLOUD_IMAGE_CACHE_ITEMS", 256)
-        self.max_disk_mb = _env_int("ACCLOUD_IMAGE_CACHE_MB", 128)
-        self._lock = threading.Lock()
-        self._mem: "OrderedDict[str, bytes]" = OrderedDict()
+        # Raw image bytes; ACCLOUD_IMAGE_CACHE_MEM optionally caps the item count too.
+        self.memory = MemoryCache(
+            cache_budget("ACCLOUD_IMAGE_CACHE_MEM_MB", 32),
+            policy_from_env("ACCLOUD_IMAGE_CACHE_POLICY"),
+            max_items=env_int("ACCLOUD_IMAGE_CACHE_MEM", 0),
+        )
+        self.max_disk_items = env_int("ACCLOUD_IMAGE_CACHE_ITEMS", 256)
+        self.max_disk_mb = env_int("ACCLOUD_IMAGE_CACHE_MB", 128)
+        self._disk_lock = threading.Lock()
+        self._index: Optional[_DiskIndex] = None
 
         if self.enabled:
             os.makedirs(self.cache_dir, exist_ok=True)
 
-    def get(self, url: str) -> Optional[bytes]:
+    def _disk_index(self) -> _DiskIndex:
+        # Built on first use so importing the module never touches the disk.
+        if self._index is None:
+            self._index = _DiskIndex(self.cache_dir)
+        return self._index
+
+    def get(self, url: str, count_miss: bool = True) -> Optional[bytes]:
         if not self.enabled or not url:
             return None
 
-        with self._lock:
-            data = self._mem.get(url)
-            if data is not None:
-                self._mem.move_to_end(url)
-                return data
+        data = self.memory.get(url, count_miss=count_miss)
+        if data is not None:
+            return data
 
+        key = self._key_for(url)
         path = self._path_for(url)
         try:
             with open(path, "rb") as handle:
                 data = handle.read()
         except FileNotFoundError:
+            # Deleted outside the cache: drop it from the index.
+            with self._disk_lock:
+                self._disk_index().discard(key)
             return None
         except OSError:
             return None
@@ -63,15 +194,10 @@ class ImageCache:
         if not data:
             return None
 
-        try:
-            os.utime(path, None)
-        except OSError:
-            pass
-
-        with self._lock:
-            self._mem[url] = data
-            self._trim_mem_locked()
+        with self._disk_lock:
+            self._disk_index().touch(key)
 
+        self.memory.set(url, data)
         return data
 
     def set(self, url: str, data: bytes) -> None:
@@ -93,63 +219,172 @@ class ImageCache:
                 pass
             return
 
-        with self._lock:
-            self._mem[url] = data
-            self._trim_mem_locked()
-            self._enforce_disk_limits_locked()
+        self.memory.set(url, data)
 
-    def _path_for(self, url: str) -> str:
-        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
-        return os.path.join(self.cache_dir, f"{digest}.bin")
+        with self._disk_lock:
+            index = self._disk_index()
+            index.add(self._key_for(url), len(data))
+            victims = self._evict_locked(index)
+        for key in victims:
+            try:
+                os.remove(os.path.join(self.cache_dir, f"{key}.bin"))
+            except OSError:
+                pass
 
-    def _trim_mem_locked(self) -> None:
-        while len(self._mem) > self.max_mem_items:
-            self._mem.popitem(last=False)
+    def flush(self) -> None:
+        with self._disk_lock:
+            if self._index is not None:
+                self._index.flush()
 
-    def _enforce_disk_limits_locked(self) -> None:
-        if self.max_disk_items <= 0 and self.max_disk_mb <= 0:
-            return
+    def _key_for(self, url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
 
-        try:
-            entries = [
-                (entry.path, entry.stat().st_mtime, entry.stat().st_size)
-                for entry in os.scandir(self.cache_dir)
-                if entry.is_file() and entry.name.endswith(".bin")
-            ]
-        except OSError:
-            return
+    def _path_for(self, url: str) -> str:
+        return os.path.join(self.cache_dir, f"{self._key_for(url)}.bin")
 
-        total_size = sum(size for _path, _mtime, size in entries)
+    def _evict_locked(self, index: _DiskIndex) -> List[str]:
         max_bytes = self.max_disk_mb * 1024 * 1024
-
-        if len(entries) <= self.max_disk_items and (max_bytes <= 0 or total_size <= max_bytes):
-            return
-
-        entries.sort(key=lambda row: row[1])
-        while entries and (
-            len(entries) > self.max_disk_items or (max_bytes > 0 and total_size > max_bytes)
+        victims = []
+        while (self.max_disk_items > 0 and index.count > self.max_disk_items) or (
+            max_bytes > 0 and index.total_bytes > max_bytes
         ):
-            path, _mtime, size = entries.pop(0)
-            try:
-                os.remove(path)
-            except OSError:
-                pass
-            total_size -= size
+            # Never evict the entry just written (the newest).
+            if index.count <= 1:
+                break
+            key = index.pop_oldest()
+            if key is None:
+                break
+            victims.append(key)
+        index.forget(victims)
+        return victims
 
 
 _IMAGE_CACHE = ImageCache()
+atexit.register(_IMAGE_CACHE.flush)
 
 
-def fetch_image_bytes(url: str, timeout: float = 20.0) -> bytes:
+# Process-wide: every view fetching the same URL at once shares one download
+# and one disk write.
+_IMAGE_FLIGHTS = SingleFlight()
+_IMAGE_STATS = {"cache_hits": 0, "downloads": 0, "decoded": 0}
+_IMAGE_STATS_LOCK = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _IMAGE_STATS_LOCK:
+        _IMAGE_STATS[name] += 1
+
+
+def _download_image(url: str, timeout: float, lane: str) -> bytes:
+    # A flight that finished just before this one started has already stored it.
     if _IMAGE_CACHE.enabled:
-        cached = _IMAGE_CACHE.get(url)
+        cached = _IMAGE_CACHE.get(url, count_miss=False)
         if cached is not None:
+            _count("cache_hits")
             return cached
 
-    with httpx.stream("GET", url, timeout=timeout) as resp:
-        resp.raise_for_status()
-        data = resp.read()
+    with get_governor().slot("IMAGES", lane):
+        with get_http_pool().stream("GET", url, timeout=timeout) as resp:
+            resp.raise_for_status()
+            data = resp.read()
+    _count("downloads")
 
     if _IMAGE_CACHE.enabled and data:
         _IMAGE_CACHE.set(url, data)
     return data
+
+
+def fetch_image_bytes(url: str, timeout: float = 20.0, lane: str = "background") -> bytes:
+    if _IMAGE_CACHE.enabled:
+        cached = _IMAGE_CACHE.get(url)
+        if cached is not None:
+            _count("cache_hits")
+            return cached
+    return _IMAGE_FLIGHTS.do(url, lambda: _download_image(url, timeout, lane))
+
+
+def image_fetch_stats() -> Dict[str, int]:
+    flights = _IMAGE_FLIGHTS.stats()
+    with _IMAGE_STATS_LOCK:
+        stats = dict(_IMAGE_STATS)
+    stats["shared"] = flights["coalesced"] + _THUMB_FLIGHTS.stats()["coalesced"]
+    stats["inflight"] = flights["inflight"]
+    return stats
+
+
+def memory_cache_stats() -> Dict[str, Dict[str, int]]:
+    return {"images": _IMAGE_CACHE.memory.stats(), "thumbnails": _THUMB_CACHE.stats()}
+
+
+@dataclass(frozen=True, slots=True)
+class Thumbnail:
+    # Decoded RGBA8888 pixels, rows packed (stride = width * 4).
+    width: int
+    height: int
+    rgba: bytes
+
+
+ThumbSize = Union[int, Tuple[int, int]]
+
+
+# Decoded thumbnails keyed by (url, box). The views only wrap these buffers,
+# so scrolling never decodes on the UI thread.
+_THUMB_CACHE = MemoryCache(
+    cache_budget("ACCLOUD_THUMB_CACHE_MB", 32),
+    policy_from_env("ACCLOUD_THUMB_CACHE_POLICY"),
+    sizeof=lambda thumb: len(thumb.rgba),
+)
+_THUMB_FLIGHTS = SingleFlight()
+
+
+def _box(size: ThumbSize) -> Tuple[int, int]:
+    if isinstance(size, int):
+        return size, size
+    return int(size[0]), int(size[1])
+
+
+def decode_thumbnail(data: bytes, size: ThumbSize) -> Thumbnail:
+    # Fit inside the box keeping the aspect ratio, like Qt's KeepAspectRatio.
+    box = _box(size)
+    with Image.open(BytesIO(data)) as source:
+        # JPEG can decode straight at 1/2..1/8 scale when the box is small.
+        source.draft("RGB", box)
+        image = source.convert("RGBA")
+    scale = min(box[0] / image.width, box[1] / image.height)
+    target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    if target != image.size:
+        image = image.resize(target, Image.Resampling.LANCZOS)
+    return Thumbnail(image.width, image.height, image.tobytes())
+
+
+def _load_thumbnail(url: str, box: Tuple[int, int], timeout: float, lane: str) -> Optional[Thumbnail]:
+    thumb = _THUMB_CACHE.get((url, box), count_miss=False)
+    if thumb is not None:
+        return thumb
+    data = fetch_image_bytes(url, timeout=timeout, lane=lane)
+    if not data:
+        return None
+    try:
+        thumb = decode_thumbnail(data, box)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        get_logger("accloud").info("Cannot decode image %s: %s", url, exc)
+        return None
+    _count("decoded")
+    _THUMB_CACHE.set((url, box), thumb)
+    return thumb
+
+
+def cached_thumbnail(url: str, size: ThumbSize) -> Optional[Thumbnail]:
+    # Memory only, safe on the UI thread. A miss is counted by the
+    # fetch_thumbnail call that follows it.
+    return _THUMB_CACHE.get((url, _box(size)), count_miss=False)
+
+
+def fetch_thumbnail(url: str, size: ThumbSize, timeout: float = 20.0, lane: str = "background") -> Optional[Thumbnail]:
+    # Call from a worker thread: downloads, decodes and resizes as needed.
+    # None when the image cannot be decoded.
+    box = _box(size)
+    thumb = _THUMB_CACHE.get((url, box))
+    if thumb is not None:
+        return thumb
+    return _THUMB_FLIGHTS.do((url, box), lambda: _load_thumbnail(url, box, timeout, lane))
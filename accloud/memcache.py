@@ -0,0 +1,228 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .utils import env_int
+
+LRU = "lru"
+LFU = "lfu"
+TWO_QUEUE = "2q"
+POLICIES = (LRU, LFU, TWO_QUEUE)
+DEFAULT_POLICY = TWO_QUEUE
+
+
+class _LRUPolicy:
+    def __init__(self, max_bytes: int) -> None:
+        self._order: "OrderedDict[Hashable, int]" = OrderedDict()
+
+    def admit(self, key: Hashable, size: int) -> None:
+        self._order[key] = size
+
+    def access(self, key: Hashable) -> None:
+        self._order.move_to_end(key)
+
+    def discard(self, key: Hashable) -> None:
+        self._order.pop(key, None)
+
+    def victim(self) -> Optional[Hashable]:
+        if not self._order:
+            return None
+        return self._order.popitem(last=False)[0]
+
+
+class _LFUPolicy:
+    # Frequency buckets, oldest first within a bucket: O(1) access, and a
+    # victim is the least used key, the least recent among ties.
+    def __init__(self, max_bytes: int) -> None:
+        self._counts: Dict[Hashable, int] = {}
+        self._buckets: Dict[int, "OrderedDict[Hashable, None]"] = {}
+        self._min = 0
+
+    def _place(self, key: Hashable, count: int) -> None:
+        self._counts[key] = count
+        self._buckets.setdefault(count, OrderedDict())[key] = None
+
+    def _unplace(self, key: Hashable) -> int:
+        count = self._counts.pop(key)
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+        return count
+
+    def admit(self, key: Hashable, size: int) -> None:
+        self._place(key, 1)
+        self._min = 1
+
+    def access(self, key: Hashable) -> None:
+        count = self._unplace(key)
+        self._place(key, count + 1)
+        if self._min == count and count not in self._buckets:
+            self._min = count + 1
+
+    def discard(self, key: Hashable) -> None:
+        if key in self._counts:
+            self._unplace(key)
+
+    def victim(self) -> Optional[Hashable]:
+        if not self._counts:
+            return None
+        if self._min not in self._buckets:
+            # Only after a discard() emptied the lowest bucket.
+            self._min = min(self._buckets)
+        key = next(iter(self._buckets[self._min]))
+        self._unplace(key)
+        return key
+
+
+class _TwoQueuePolicy:
+    # 2Q: new keys enter a FIFO capped at a quarter of the budget and reach
+    # the main LRU only when used again (while queued, or soon after leaving
+    # it as a ghost key). One pass over many images only churns the FIFO.
+    def __init__(self, max_bytes: int) -> None:
+        self._in_budget = max_bytes // 4
+        self._in_bytes = 0
+        self._in: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._main: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._ghosts: "OrderedDict[Hashable, None]" = OrderedDict()
+
+    def admit(self, key: Hashable, size: int) -> None:
+        if key in self._ghosts:
+            del self._ghosts[key]
+            self._main[key] = size
+        else:
+            self._in[key] = size
+            self._in_bytes += size
+
+    def access(self, key: Hashable) -> None:
+        if key in self._main:
+            self._main.move_to_end(key)
+        elif key in self._in:
+            size = self._in.pop(key)
+            self._in_bytes -= size
+            self._main[key] = size
+
+    def discard(self, key: Hashable) -> None:
+        if key in self._in:
+            self._in_bytes -= self._in.pop(key)
+        elif self._main.pop(key, None) is not None:
+            # A replaced hot entry goes straight back to the main queue.
+            self._ghosts[key] = None
+
+    def victim(self) -> Optional[Hashable]:
+        # Called before the new key is admitted, so a full FIFO gives way first.
+        if self._in and (self._in_bytes >= self._in_budget or not self._main):
+            key, size = self._in.popitem(last=False)
+            self._in_bytes -= size
+            self._ghosts[key] = None
+            # Remember about as many evicted keys as there are live ones.
+            while len(self._ghosts) > max(32, len(self._in) + len(self._main)):
+                self._ghosts.popitem(last=False)
+            return key
+        if self._main:
+            return self._main.popitem(last=False)[0]
+        return None
+
+
+_POLICY_CLASSES = {LRU: _LRUPolicy, LFU: _LFUPolicy, TWO_QUEUE: _TwoQueuePolicy}
+
+
+def policy_from_env(name: str, default: str = DEFAULT_POLICY) -> str:
+    value = (os.getenv(name) or default).strip().lower()
+    return value if value in POLICIES else default
+
+
+class MemoryCache:
+    # Thread-safe in-memory cache bounded in bytes (and optionally in items),
+    # with LRU, LFU or 2Q eviction. sizeof gives each value's cost in bytes.
+    def __init__(
+        self,
+        max_bytes: int,
+        policy: str = DEFAULT_POLICY,
+        sizeof: Callable[[Any], int] = len,
+        max_items: int = 0,
+    ) -> None:
+        if policy not in _POLICY_CLASSES:
+            raise ValueError(f"Unknown cache policy: {policy} (expected one of {', '.join(POLICIES)})")
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_items = max(0, int(max_items))
+        self.policy = policy
+        self.total_bytes = 0
+        self._sizeof = sizeof
+        self._policy = _POLICY_CLASSES[policy](self.max_bytes)
+        self._values: Dict[Hashable, Tuple[Any, int]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable, count_miss: bool = True) -> Optional[Any]:
+        # count_miss=False for a cheap probe that a counted lookup will follow.
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                if count_miss:
+                    self._misses += 1
+                return None
+            self._hits += 1
+            self._policy.access(key)
+            return entry[0]
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._values
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = max(0, int(self._sizeof(value)))
+        with self._lock:
+            self._remove_locked(key)
+            if size > self.max_bytes:
+                return
+            # Make room first so the policy never picks the entry being added.
+            while self._values and (
+                self.total_bytes + size > self.max_bytes or (self.max_items and len(self._values) >= self.max_items)
+            ):
+                victim = self._policy.victim()
+                if victim is None:
+                    break
+                self.total_bytes -= self._values.pop(victim)[1]
+                self._evictions += 1
+            self._values[key] = (value, size)
+            self.total_bytes += size
+            self._policy.admit(key, size)
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._remove_locked(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values = {}
+            self.total_bytes = 0
+            self._policy = _POLICY_CLASSES[self.policy](self.max_bytes)
+
+    def _remove_locked(self, key: Hashable) -> None:
+        entry = self._values.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+            self._policy.discard(key)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._values)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": len(self._values),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def cache_budget(name: str, default_mb: int) -> int:
+    return max(0, env_int(name, default_mb)) * 1024 * 1024
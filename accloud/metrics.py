@@ -0,0 +1,179 @@
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Log-spaced latency buckets (seconds): 4 per doubling from 1 ms to ~65 s,
+# so a percentile read back from a bucket is within ~19% of the true value.
+_BUCKET_BOUNDS: List[float] = [0.001 * (2 ** (i / 4)) for i in range(65)]
+
+StartHook = Callable[[str, str, str], None]
+EndHook = Callable[[Dict[str, Any]], None]
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "total", "sum", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(_BUCKET_BOUNDS, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = max(1, int(round(q * self.total)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                if index >= len(_BUCKET_BOUNDS):
+                    return self.max
+                return min(_BUCKET_BOUNDS[index], self.max)
+        return self.max
+
+
+class _EndpointMetrics:
+    __slots__ = ("latency", "statuses", "errors", "req_bytes", "resp_bytes", "inflight")
+
+    def __init__(self) -> None:
+        self.latency = LatencyHistogram()
+        self.statuses: Dict[str, int] = {}
+        self.errors = 0
+        self.req_bytes = 0
+        self.resp_bytes = 0
+        self.inflight = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        hist = self.latency
+        return {
+            "count": hist.total,
+            "errors": self.errors,
+            "inflight": self.inflight,
+            "statuses": dict(self.statuses),
+            "req_bytes": self.req_bytes,
+            "resp_bytes": self.resp_bytes,
+            "mean_ms": round(hist.sum / hist.total * 1000.0, 2) if hist.total else 0.0,
+            "p50_ms": round(hist.percentile(0.50) * 1000.0, 2),
+            "p95_ms": round(hist.percentile(0.95) * 1000.0, 2),
+            "p99_ms": round(hist.percentile(0.99) * 1000.0, 2),
+            "max_ms": round(hist.max * 1000.0, 2),
+        }
+
+
+class RequestMetrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, _EndpointMetrics] = {}
+        self._start_hooks: List[StartHook] = []
+        self._end_hooks: List[EndHook] = []
+        self.started_at = time.time()
+
+    def add_hooks(self, on_start: Optional[StartHook] = None, on_end: Optional[EndHook] = None) -> None:
+        with self._lock:
+            if on_start is not None:
+                self._start_hooks.append(on_start)
+            if on_end is not None:
+                self._end_hooks.append(on_end)
+
+    def remove_hooks(self, on_start: Optional[StartHook] = None, on_end: Optional[EndHook] = None) -> None:
+        with self._lock:
+            if on_start in self._start_hooks:
+                self._start_hooks.remove(on_start)
+            if on_end in self._end_hooks:
+                self._end_hooks.remove(on_end)
+
+    def _get(self, endpoint: str) -> _EndpointMetrics:
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self._endpoints[endpoint] = _EndpointMetrics()
+        return metrics
+
+    def start(self, endpoint: str, method: str, url: str) -> None:
+        with self._lock:
+            self._get(endpoint).inflight += 1
+            hooks = list(self._start_hooks)
+        for hook in hooks:
+            try:
+                hook(endpoint, method, url)
+            except Exception:
+                pass
+
+    def end(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        status: Optional[int],
+        elapsed: float,
+        req_bytes: int = 0,
+        resp_bytes: int = 0,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        status_key = str(status) if status is not None else "error"
+        with self._lock:
+            metrics = self._get(endpoint)
+            metrics.inflight = max(0, metrics.inflight - 1)
+            metrics.latency.add(elapsed)
+            metrics.statuses[status_key] = metrics.statuses.get(status_key, 0) + 1
+            if error is not None or (status is not None and status >= 400):
+                metrics.errors += 1
+            metrics.req_bytes += req_bytes
+            metrics.resp_bytes += resp_bytes
+            hooks = list(self._end_hooks)
+        if not hooks:
+            return
+        event = {
+            "endpoint": endpoint,
+            "method": method,
+            "url": url,
+            "status": status,
+            "elapsed": elapsed,
+            "req_bytes": req_bytes,
+            "resp_bytes": resp_bytes,
+            "error": error,
+        }
+        for hook in hooks:
+            try:
+                hook(event)
+            except Exception:
+                pass
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {endpoint: metrics.snapshot() for endpoint, metrics in self._endpoints.items()}
+
+    def inflight(self) -> int:
+        with self._lock:
+            return sum(metrics.inflight for metrics in self._endpoints.values())
+
+    def reset(self) -> None:
+        with self._lock:
+            for endpoint, metrics in list(self._endpoints.items()):
+                if metrics.inflight:
+                    fresh = _EndpointMetrics()
+                    fresh.inflight = metrics.inflight
+                    self._endpoints[endpoint] = fresh
+                else:
+                    del self._endpoints[endpoint]
+            self.started_at = time.time()
+
+
+def format_stats_table(endpoints: Dict[str, Dict[str, Any]]) -> List[str]:
+    header = f"{'endpoint':<32} {'count':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'bytes in':>10}"
+    lines = [header]
+    ordered = sorted(endpoints.items(), key=lambda kv: kv[1].get("p95_ms", 0.0), reverse=True)
+    for endpoint, row in ordered:
+        lines.append(
+            f"{endpoint[:32]:<32} {row['count']:>6} {row['errors']:>4} "
+            f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['resp_bytes']:>10}"
+        )
+    return lines
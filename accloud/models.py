@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class FileItem:
     id: str
     name: str
@@ -15,7 +15,7 @@ class FileItem:
     gcode_id: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Quota:
     total_bytes: int
     used_bytes: int
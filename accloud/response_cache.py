@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+import httpx
+
+from .endpoint_map import all_endpoints
+
+
+def _policies_from_endpoints() -> Dict[str, Dict[str, Any]]:
+    policies: Dict[str, Dict[str, Any]] = {}
+    for key, spec in all_endpoints().items():
+        cache = spec.get("cache")
+        if cache and float(cache.get("ttl", 0)) > 0:
+            policies[key] = {
+                "ttl": float(cache["ttl"]),
+                "max_entries": int(cache.get("max_entries", 32)),
+            }
+    return policies
+
+
+def _canonical(value: Any) -> str:
+    try:
+        return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+def is_cacheable(resp: httpx.Response) -> bool:
+    if resp.status_code != 200:
+        return False
+    try:
+        payload = resp.json()
+    except Exception:
+        return False
+    if isinstance(payload, dict):
+        return payload.get("code") in (None, 1)
+    return True
+
+
+class ResponseCache:
+    def __init__(self, policies: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        self.policies = _policies_from_endpoints() if policies is None else dict(policies)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, "OrderedDict[Hashable, Tuple[float, httpx.Response]]"] = {}
+        self._generations: Dict[str, int] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def key_for(self, endpoint: Optional[str], method: str, kwargs: Dict[str, Any], token: str) -> Optional[Hashable]:
+        if not endpoint or endpoint not in self.policies:
+            return None
+        body = kwargs.get("json", kwargs.get("data"))
+        return (method.upper(), _canonical(kwargs.get("params")), _canonical(body), token)
+
+    def generation(self, endpoint: str) -> int:
+        with self._lock:
+            return self._generations.get(endpoint, 0)
+
+    def get(self, endpoint: str, key: Hashable) -> Optional[httpx.Response]:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._entries.get(endpoint)
+            entry = bucket.get(key) if bucket else None
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, resp = entry
+            if expires_at <= now:
+                del bucket[key]
+                self._misses += 1
+                return None
+            bucket.move_to_end(key)
+            self._hits += 1
+            return resp
+
+    def put(self, endpoint: str, key: Hashable, resp: httpx.Response, generation: int) -> None:
+        policy = self.policies.get(endpoint)
+        if not policy or not is_cacheable(resp):
+            return
+        with self._lock:
+            # A mutation ran while this response was in flight: it may be stale.
+            if self._generations.get(endpoint, 0) != generation:
+                return
+            bucket = self._entries.setdefault(endpoint, OrderedDict())
+            bucket[key] = (time.monotonic() + policy["ttl"], resp)
+            bucket.move_to_end(key)
+            while len(bucket) > policy["max_entries"]:
+                bucket.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, endpoints: Iterable[str]) -> None:
+        with self._lock:
+            for endpoint in endpoints:
+                self._generations[endpoint] = self._generations.get(endpoint, 0) + 1
+                self._entries.pop(endpoint, None)
+
+    def clear(self) -> None:
+        self.invalidate(list(self.policies))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": sum(len(bucket) for bucket in self._entries.values()),
+            }
@@ -0,0 +1,196 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, Optional
+
+import httpx
+
+from .endpoint_map import endpoint_spec
+from .utils import env_bool, env_int
+
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# The request never reached the server, so even a non-idempotent call is safe to resend.
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.25,
+        max_delay: float = 4.0,
+        max_retry_after: float = 30.0,
+        statuses: Iterable[int] = RETRY_STATUSES,
+    ) -> None:
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.max_retry_after = float(max_retry_after)
+        self.statuses = frozenset(int(s) for s in statuses)
+
+    def with_overrides(self, overrides: Dict[str, Any]) -> "RetryPolicy":
+        values = {
+            "max_attempts": self.max_attempts,
+            "base_delay": self.base_delay,
+            "max_delay": self.max_delay,
+            "max_retry_after": self.max_retry_after,
+            "statuses": self.statuses,
+        }
+        values.update({k: v for k, v in overrides.items() if k in values})
+        return RetryPolicy(**values)
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter: spreads retries from many callers instead of syncing them up.
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0.0, ceiling)
+
+    def delay(self, attempt: int, resp: Optional[httpx.Response]) -> Optional[float]:
+        if resp is not None:
+            retry_after = parse_retry_after(resp.headers.get("retry-after"))
+            if retry_after is not None:
+                if retry_after > self.max_retry_after:
+                    return None
+                return retry_after
+        return self.backoff(attempt)
+
+
+# Each request deposits `ratio` tokens and each retry costs one, so retries stay
+# a bounded fraction of traffic and cannot amplify an outage.
+class RetryBudget:
+    def __init__(self, ratio: float = 0.2, min_tokens: float = 10.0, max_tokens: float = 100.0) -> None:
+        self.ratio = float(ratio)
+        self.min_tokens = float(min_tokens)
+        self.max_tokens = float(max_tokens)
+        self._tokens = self.min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+    def available(self) -> float:
+        with self._lock:
+            return self._tokens
+
+
+def _replayable(kwargs: Dict[str, Any]) -> bool:
+    if "files" in kwargs:
+        return False
+    content = kwargs.get("content")
+    return content is None or isinstance(content, (bytes, str))
+
+
+class Retrier:
+    def __init__(self, policy: Optional[RetryPolicy] = None, budget: Optional[RetryBudget] = None) -> None:
+        self.policy = policy or RetryPolicy(max_attempts=env_int("ACCLOUD_RETRY_MAX_ATTEMPTS", 3))
+        self.budget = budget or RetryBudget()
+        self.enabled = env_bool("ACCLOUD_RETRY", True)
+        self._lock = threading.Lock()
+        self._policies: Dict[Optional[str], RetryPolicy] = {}
+        self._retries: Dict[str, int] = {}
+        self._gave_up = 0
+        self._budget_exhausted = 0
+
+    def policy_for(self, endpoint: Optional[str]) -> RetryPolicy:
+        policy = self._policies.get(endpoint)
+        if policy is None:
+            overrides = endpoint_spec(endpoint).get("retry") or {}
+            policy = self.policy.with_overrides(overrides) if overrides else self.policy
+            self._policies[endpoint] = policy
+        return policy
+
+    def is_idempotent(self, endpoint: Optional[str], method: str) -> bool:
+        spec = endpoint_spec(endpoint)
+        if "idempotent" in spec:
+            return bool(spec["idempotent"])
+        return method.upper() in IDEMPOTENT_METHODS
+
+    def begin(self) -> None:
+        self.budget.deposit()
+
+    def next_delay(
+        self,
+        endpoint: Optional[str],
+        method: str,
+        kwargs: Dict[str, Any],
+        attempt: int,
+        resp: Optional[httpx.Response] = None,
+        error: Optional[BaseException] = None,
+    ) -> Optional[float]:
+        if not self.enabled or not _replayable(kwargs):
+            return None
+        policy = self.policy_for(endpoint)
+        if resp is not None:
+            if resp.status_code not in policy.statuses:
+                return None
+            retryable = resp.status_code == 429 or self.is_idempotent(endpoint, method)
+        elif isinstance(error, _NOT_SENT_ERRORS):
+            retryable = True
+        elif isinstance(error, httpx.TransportError):
+            retryable = self.is_idempotent(endpoint, method)
+        else:
+            return None
+        if not retryable:
+            return None
+        delay = policy.delay(attempt, resp) if attempt < policy.max_attempts else None
+        if delay is None:
+            with self._lock:
+                self._gave_up += 1
+            return None
+        if not self.budget.withdraw():
+            with self._lock:
+                self._budget_exhausted += 1
+            return None
+        with self._lock:
+            label = endpoint or "-"
+            self._retries[label] = self._retries.get(label, 0) + 1
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "retries": sum(self._retries.values()),
+                "by_endpoint": dict(self._retries),
+                "gave_up": self._gave_up,
+                "budget_exhausted": self._budget_exhausted,
+                "budget": round(self.budget.available(), 2),
+            }
+
+
+_RETRIER: Optional[Retrier] = None
+_RETRIER_LOCK = threading.Lock()
+
+
+def get_retrier() -> Retrier:
+    # Shared by every client so the retry budget is process-wide: the GUI,
+    # CLI helpers and the sync engine together cannot exceed it.
+    global _RETRIER
+    with _RETRIER_LOCK:
+        if _RETRIER is None:
+            _RETRIER = Retrier()
+        return _RETRIER
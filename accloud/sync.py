@@ -0,0 +1,291 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+from .api import delete_files_batched, iter_files
+from .client import CloudClient
+from .dedup import file_md5
+from .download import download_file
+from .models import FileItem
+from .upload import Uploader
+from .utils import env_int, get_logger
+
+MANIFEST_NAME = ".accloud-sync.json"
+DEFAULT_SYNC_JOBS = 4
+
+UPLOAD = "upload"
+DOWNLOAD = "download"
+DELETE_LOCAL = "delete_local"
+DELETE_REMOTE = "delete_remote"
+ADOPT = "adopt"
+CONFLICT = "conflict"
+KEEP = "keep"
+
+# Actions that move or remove data; the rest only touch the manifest or report.
+TRANSFERS = (UPLOAD, DOWNLOAD, DELETE_LOCAL, DELETE_REMOTE)
+
+
+@dataclass(slots=True)
+class SyncAction:
+    kind: str
+    name: str
+    remote: Optional[FileItem] = None
+    size: int = 0
+    reason: str = ""
+
+
+def _local_name(remote_name: str) -> str:
+    return os.path.basename(remote_name.replace("\\", "/"))
+
+
+def _ignored(name: str) -> bool:
+    return name.startswith(".") or name.endswith(".part") or name.endswith(".part.json")
+
+
+class SyncManifest:
+    # {name: {"id", "md5", "size", "time", "mtime_ns"}} for every file known to
+    # be identical on both sides after the last run. md5 and time are the
+    # cloud's values; after an upload they are empty until the next scan.
+    def __init__(self, directory: str) -> None:
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return
+        files = data.get("files") if isinstance(data, dict) else None
+        if isinstance(files, dict):
+            self.files = files
+
+    def save(self) -> None:
+        tmp = f"{self.path}.tmp"
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as handle:
+                json.dump({"version": 1, "saved_at": int(time.time()), "files": self.files}, handle, ensure_ascii=True)
+            os.replace(tmp, self.path)
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.files.get(name)
+
+    def record(self, name: str, file_id: str, md5: str, st: os.stat_result, created_at: int = 0) -> None:
+        with self._lock:
+            self.files[name] = {
+                "id": str(file_id),
+                "md5": (md5 or "").lower(),
+                "size": st.st_size,
+                "time": created_at,
+                "mtime_ns": st.st_mtime_ns,
+            }
+
+    def touch(self, name: str, item: FileItem) -> None:
+        with self._lock:
+            entry = self.files.get(name)
+            if entry is not None and entry.get("id") == item.id:
+                entry["time"] = item.created_at
+                entry["md5"] = (item.md5 or "").lower()
+
+    def forget(self, name: str) -> None:
+        with self._lock:
+            self.files.pop(name, None)
+
+
+def _local_unchanged(entry: Dict[str, Any], st: os.stat_result) -> bool:
+    return entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns
+
+
+def _remote_unchanged(entry: Dict[str, Any], item: FileItem) -> bool:
+    # Cloud files are never overwritten in place, so a known id is the same
+    # content; md5 is checked once known (empty right after our own upload).
+    if entry.get("id") != item.id:
+        return False
+    md5 = entry.get("md5") or ""
+    return not md5 or md5 == (item.md5 or "").lower()
+
+
+class SyncEngine:
+    def __init__(
+        self,
+        client: CloudClient,
+        directory: str,
+        jobs: Optional[int] = None,
+        delete: bool = False,
+    ) -> None:
+        self.client = client
+        self.directory = os.path.abspath(directory)
+        self.jobs = max(1, int(jobs or env_int("ACCLOUD_SYNC_JOBS", DEFAULT_SYNC_JOBS)))
+        self.delete = delete
+        self.logger = get_logger("accloud")
+        os.makedirs(self.directory, exist_ok=True)
+        self.manifest = SyncManifest(self.directory)
+
+    def _scan_local(self) -> Dict[str, os.stat_result]:
+        found = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and not _ignored(entry.name):
+                    found[entry.name] = entry.stat()
+        return found
+
+    def _scan_remote(self) -> Tuple[Dict[str, FileItem], List[FileItem]]:
+        by_name: Dict[str, FileItem] = {}
+        shadowed = []
+        for item in iter_files(self.client, limit=50, prefetch=4):
+            name = _local_name(item.name)
+            if not name or _ignored(name):
+                continue
+            current = by_name.get(name)
+            # Several cloud files may share a name; the newest one is mirrored.
+            if current is None or item.created_at > current.created_at:
+                if current is not None:
+                    shadowed.append(current)
+                by_name[name] = item
+            else:
+                shadowed.append(item)
+        return by_name, shadowed
+
+    def plan(self) -> List[SyncAction]:
+        local = self._scan_local()
+        remote, shadowed = self._scan_remote()
+        for item in shadowed:
+            self.logger.info("Sync: ignoring older cloud copy %s of %s", item.id, item.name)
+        actions = []
+        for name in sorted(set(local) | set(remote)):
+            st = local.get(name)
+            item = remote.get(name)
+            entry = self.manifest.get(name)
+            if st is not None and item is not None:
+                actions.append(self._plan_both(name, st, item, entry))
+            elif st is not None:
+                if entry is None or not _local_unchanged(entry, st):
+                    actions.append(SyncAction(UPLOAD, name, size=st.st_size, reason="new local file" if entry is None else "changed locally"))
+                elif self.delete:
+                    actions.append(SyncAction(DELETE_LOCAL, name, size=st.st_size, reason="deleted in the cloud"))
+                else:
+                    actions.append(SyncAction(KEEP, name, reason="deleted in the cloud (use --delete)"))
+            else:
+                if entry is None or not _remote_unchanged(entry, item):
+                    actions.append(SyncAction(DOWNLOAD, name, item, item.size_bytes, "new cloud file" if entry is None else "changed in the cloud"))
+                elif self.delete:
+                    actions.append(SyncAction(DELETE_REMOTE, name, item, item.size_bytes, "deleted locally"))
+                else:
+                    actions.append(SyncAction(KEEP, name, item, reason="deleted locally (use --delete)"))
+        return actions
+
+    def _plan_both(self, name: str, st: os.stat_result, item: FileItem, entry: Optional[Dict[str, Any]]) -> SyncAction:
+        if entry is not None:
+            local_same = _local_unchanged(entry, st)
+            remote_same = _remote_unchanged(entry, item)
+            if local_same and remote_same:
+                return SyncAction(KEEP, name, item)
+            if local_same:
+                return SyncAction(DOWNLOAD, name, item, item.size_bytes, "changed in the cloud")
+            if remote_same:
+                return SyncAction(UPLOAD, name, item, st.st_size, "changed locally")
+        # No usable history: compare content, hashing only when the sizes match.
+        if item.md5 and st.st_size == item.size_bytes and file_md5(os.path.join(self.directory, name)).lower() == item.md5.lower():
+            return SyncAction(ADOPT, name, item)
+        return SyncAction(CONFLICT, name, item, reason="changed on both sides" if entry else "differs from the cloud copy")
+
+    def run(
+        self,
+        actions: List[SyncAction],
+        progress: Optional[Callable[[SyncAction, int, int], None]] = None,
+        on_done: Optional[Callable[[SyncAction, Optional[Exception]], None]] = None,
+    ) -> List[Tuple[SyncAction, Exception]]:
+        failures: List[Tuple[SyncAction, Exception]] = []
+        for action in actions:
+            if action.kind == ADOPT:
+                self._record(action.name, action.remote)
+            elif action.kind == KEEP and action.remote is not None:
+                self.manifest.touch(action.name, action.remote)
+
+        removals = [a for a in actions if a.kind == DELETE_REMOTE]
+        transfers = [a for a in actions if a.kind in (UPLOAD, DOWNLOAD, DELETE_LOCAL)]
+        try:
+            uploader = Uploader(self.client, dedup=False)
+            with ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="accloud-sync") as pool:
+                futures = {pool.submit(self._apply, action, uploader, progress): action for action in transfers}
+                for future in as_completed(futures):
+                    action = futures[future]
+                    error = future.exception()
+                    if error is not None:
+                        failures.append((action, error))
+                    if on_done is not None:
+                        on_done(action, error)
+            if removals:
+                failures.extend(self._delete_remote(removals, on_done))
+        finally:
+            self.manifest.save()
+        return failures
+
+    def _apply(
+        self,
+        action: SyncAction,
+        uploader: Uploader,
+        progress: Optional[Callable[[SyncAction, int, int], None]],
+    ) -> None:
+        path = os.path.join(self.directory, action.name)
+        report = (lambda done, total: progress(action, done, total)) if progress is not None else None
+        if action.kind == DOWNLOAD:
+            download_file(self.client, action.remote.id, path, md5=action.remote.md5, progress=report, resume=True)
+            self._record(action.name, action.remote)
+        elif action.kind == UPLOAD:
+            before = os.stat(path)
+            file_id = uploader.upload(path, name=action.name, progress=report)
+            st = os.stat(path)
+            if (st.st_size, st.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+                # Keep the stat of what was sent so the next run uploads the edit.
+                self.logger.info("Sync: %s changed during upload, it will be sent again", action.name)
+                st = before
+            # The cloud's md5 and time are filled in by the next scan.
+            self.manifest.record(action.name, file_id, "", st)
+            if action.remote is not None and action.remote.id != file_id:
+                # The cloud cannot overwrite: the new upload replaces the old copy.
+                try:
+                    delete_files_batched(self.client, [action.remote.id])
+                except RuntimeError as exc:
+                    self.logger.warning("Sync: could not remove old cloud copy of %s: %s", action.name, exc)
+        elif action.kind == DELETE_LOCAL:
+            os.remove(path)
+            self.manifest.forget(action.name)
+
+    def _delete_remote(
+        self,
+        actions: List[SyncAction],
+        on_done: Optional[Callable[[SyncAction, Optional[Exception]], None]],
+    ) -> List[Tuple[SyncAction, Exception]]:
+        by_id = {action.remote.id: action for action in actions}
+        failures: List[Tuple[SyncAction, Exception]] = []
+
+        def on_batch(ids: List[str], error: Optional[Exception]) -> None:
+            for file_id in ids:
+                action = by_id[file_id]
+                if error is None:
+                    self.manifest.forget(action.name)
+                else:
+                    failures.append((action, error))
+                if on_done is not None:
+                    on_done(action, error)
+
+        try:
+            delete_files_batched(self.client, list(by_id), workers=self.jobs, on_batch=on_batch)
+        except RuntimeError:
+            pass
+        return failures
+
+    def _record(self, name: str, item: FileItem) -> None:
+        # Record the cloud's md5 as listed, which may be empty; _remote_unchanged
+        # compares it with the next listing, not with the local file.
+        st = os.stat(os.path.join(self.directory, name))
+        self.manifest.record(name, item.id, item.md5 or "", st, item.created_at)
@@ -0,0 +1,10 @@
+from PySide6.QtGui import QImage, QPixmap
+
+from ..image_cache import Thumbnail
+
+
+def thumbnail_pixmap(thumb: Thumbnail) -> QPixmap:
+    # The pixels are already decoded and sized in the worker; this only wraps
+    # the buffer (fromImage copies it before the bytes can go away).
+    image = QImage(thumb.rgba, thumb.width, thumb.height, thumb.width * 4, QImage.Format_RGBA8888)
+    return QPixmap.fromImage(image)
@@ -6,7 +6,9 @@ from PySide6.QtWidgets import QFileDialog, QMainWindow, QMessageBox, QTabWidget,
 
 from ..client import CloudClient
 from ..session_store import DEFAULT_SESSION_PATH, load_session, load_session_from_har, save_session
+from ..upload import release_orphaned_uploads
 from .state import AppState
+from .threads import TaskRunner
 from .views.files_tab import FilesTab
 from .views.log_tab import LogTab
 from .views.printer_tab import PrinterTab
@@ -20,6 +22,7 @@ class MainWindow(QMainWindow):
         self.resize(1200, 800)
 
         self.state = AppState()
+        self._runner = TaskRunner()
 
         self.tabs = QTabWidget(self)
         self.setCentralWidget(self.tabs)
@@ -82,7 +85,14 @@ class MainWindow(QMainWindow):
         self.files_tab.set_client(client)
         self.printer_tab.set_client(client)
         self.task_history_tab.set_client(client)
+        self.log_tab.set_client(client)
         self._set_status(f"Session loaded: {path}")
+        self._runner.run(lambda: release_orphaned_uploads(client), on_result=self._on_pending_uploads)
+
+    def _on_pending_uploads(self, pending) -> None:
+        if pending:
+            names = ", ".join(os.path.basename(entry["source"]) for entry in pending)
+            self._set_status(f"Interrupted upload(s), upload again to finish: {names}")
 
     def _auto_load_session(self) -> None:
         if not os.path.exists(DEFAULT_SESSION_PATH):
@@ -3,7 +3,6 @@ from datetime import datetime
 from typing import Any, Dict, Optional
 
 from PySide6.QtCore import Qt
-from PySide6.QtGui import QImage, QPixmap
 from PySide6.QtWidgets import (
     QDialog,
     QFrame,
@@ -14,8 +13,9 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
+from ..images import thumbnail_pixmap
 from ..threads import TaskRunner
-from ...image_cache import fetch_image_bytes
+from ...image_cache import Thumbnail, fetch_thumbnail
 
 
 def _format_ts(ts: Optional[int]) -> str:
@@ -212,17 +212,11 @@ class FileDetailsWindow(QDialog):
 
     def _load_preview_from_url(self, url: str) -> None:
         def work():
-            return fetch_image_bytes(url, timeout=20.0)
-
-        def done(data: bytes):
-            if not data:
-                return
-            image = QImage()
-            image.loadFromData(data)
-            if image.isNull():
-                return
-            pix = QPixmap.fromImage(image)
-            self.preview.setPixmap(pix.scaled(240, 240, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            return fetch_thumbnail(url, 240, timeout=20.0)
+
+        def done(thumb: Optional[Thumbnail]):
+            if thumb is not None:
+                self.preview.setPixmap(thumbnail_pixmap(thumb))
 
         self._runner.run(work, on_result=done)
 
@@ -2,9 +2,8 @@ from datetime import datetime
 from typing import Callable, Optional
 
 import os
-import httpx
 from PySide6.QtCore import Qt, QSize
-from PySide6.QtGui import QIcon, QImage, QPixmap
+from PySide6.QtGui import QIcon, QPixmap
 from PySide6.QtWidgets import (
     QDialog,
     QFileDialog,
@@ -20,21 +19,27 @@ from PySide6.QtWidgets import (
 )
 
 from ...api import (
-    delete_files,
-    get_download_url,
-    get_gcode_info,
+    delete_files_batched,
     get_quota,
-    list_files,
+    iter_files,
 )
+from ...catalog import FileCatalog
 from ...client import CloudClient
+from ...download import download_file
+from ...gcode_store import load_gcode_info, warm_gcode_info
 from ...models import FileItem
-from ...image_cache import fetch_image_bytes
+from ...image_cache import Thumbnail, cached_thumbnail, fetch_thumbnail
+from ..images import thumbnail_pixmap
 from ..threads import TaskRunner
 from .file_details import FileDetailsWindow
 from .print_dialog import PrintDialog
 from .upload_dialog import UploadDialog
 
 
+# Card thumbnails are decoded at this size in the worker.
+THUMB_SIZE = 150
+
+
 def _format_ts(ts: int) -> str:
     if not ts:
         return "-"
@@ -86,7 +91,7 @@ class FileCard(QFrame):
         wrapper_layout.setSpacing(0)
 
         thumb = QFrame()
-        thumb.setFixedSize(150, 150)
+        thumb.setFixedSize(THUMB_SIZE, THUMB_SIZE)
         thumb.setStyleSheet("background: #1d4d8f; border-radius: 6px;")
         thumb_layout = QVBoxLayout(thumb)
         thumb_layout.setContentsMargins(6, 6, 6, 6)
@@ -171,7 +176,8 @@ class FileCard(QFrame):
         layout.addLayout(meta, 1)
 
     def set_thumbnail(self, pixmap: QPixmap) -> None:
-        self.thumb_label.setPixmap(pixmap.scaled(150, 150, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        # Already sized to THUMB_SIZE by fetch_thumbnail.
+        self.thumb_label.setPixmap(pixmap)
 
 
 class FilesTab(QWidget):
@@ -186,6 +192,7 @@ class FilesTab(QWidget):
         self._client: Optional[CloudClient] = None
         self._runner = TaskRunner()
         self._cards = {}
+        self._catalog = FileCatalog()
         self._detail_windows = []
         self._thumbs_enabled = os.getenv("ACCLOUD_DISABLE_THUMBS", "0") not in ("1", "true", "TRUE")
         self._on_print_started = on_print_started
@@ -227,6 +234,7 @@ class FilesTab(QWidget):
 
     def set_client(self, client: CloudClient) -> None:
         self._client = client
+        self._clear_cards()
         self.refresh()
 
     def refresh(self) -> None:
@@ -245,24 +253,58 @@ class FilesTab(QWidget):
         self._status("Quota updated.")
 
     def _load_files(self):
-        return list_files(self._client, page=1, limit=50)
+        return list(iter_files(self._client, limit=50, prefetch=4))
 
     def _apply_files(self, items):
-        self._clear_cards()
-        for item in items:
-            card = FileCard(
-                item,
-                on_details=self._open_details,
-                on_delete=self._delete_item,
-                on_rename=self._rename_item,
-                on_print=self._print_item,
-                on_download=self._download_item,
-            )
-            self._cards[item.id] = card
-            self.list_layout.insertWidget(self.list_layout.count() - 1, card)
-            if self._thumbs_enabled and item.thumbnail:
-                self._load_thumbnail(item, card)
-        self._status(f"{len(items)} file(s) loaded.")
+        # Patch only what changed since the last listing.
+        diff = self._catalog.apply(items)
+        for item in diff.removed:
+            self._drop_card(item.id)
+        changed = []
+        for old, item in diff.updated:
+            card = self._cards.get(item.id)
+            if card is None:
+                continue
+            index = self.list_layout.indexOf(card)
+            self._drop_card(item.id)
+            self._add_card(item, index, card if old.thumbnail == item.thumbnail else None)
+            changed.append(item)
+        # Ascending listing order, so each index counts the cards already placed.
+        for item in sorted(diff.added, key=lambda it: self._catalog.position(it.id)):
+            self._add_card(item, self._catalog.position(item.id))
+            changed.append(item)
+        self._status(f"{len(items)} file(s) loaded ({diff.summary()}).")
+        self._warm_gcode_info(changed)
+
+    def _add_card(self, item: FileItem, index: int, previous: Optional[FileCard] = None) -> None:
+        card = FileCard(
+            item,
+            on_details=self._open_details,
+            on_delete=self._delete_item,
+            on_rename=self._rename_item,
+            on_print=self._print_item,
+            on_download=self._download_item,
+        )
+        self._cards[item.id] = card
+        self.list_layout.insertWidget(min(max(index, 0), self.list_layout.count() - 1), card)
+        pixmap = previous.thumb_label.pixmap() if previous is not None else None
+        if pixmap is not None and not pixmap.isNull():
+            card.thumb_label.setPixmap(pixmap)
+        elif self._thumbs_enabled and item.thumbnail:
+            self._load_thumbnail(item, card)
+
+    def _drop_card(self, file_id: str) -> None:
+        card = self._cards.pop(file_id, None)
+        if card is not None:
+            self.list_layout.removeWidget(card)
+            card.deleteLater()
+
+    def _warm_gcode_info(self, items) -> None:
+        client = self._client
+        gcode_ids = [item.gcode_id for item in items if item.gcode_id]
+        if not client or not gcode_ids:
+            return
+        self._runner.run(lambda: warm_gcode_info(client, gcode_ids))
 
     def _clear_cards(self) -> None:
         while self.list_layout.count() > 1:
@@ -271,6 +313,14 @@ class FilesTab(QWidget):
             if widget:
                 widget.deleteLater()
         self._cards = {}
+        self._catalog.clear()
+
+    def _remove_cards(self, file_ids) -> None:
+        # Drop just the deleted cards; only the quota needs a reload.
+        self._catalog.remove(file_ids)
+        for file_id in file_ids:
+            self._drop_card(file_id)
+        self._runner.run(self._load_quota, on_result=self._apply_quota, on_error=self._on_error)
 
     def _upload_dialog(self) -> None:
         if not self._client:
@@ -313,12 +363,11 @@ class FilesTab(QWidget):
         self._pending_delete_printer_id = None
 
         def work():
-            delete_files(self._client, [file_id])
-            return True
+            return delete_files_batched(self._client, [file_id])
 
-        def done(_):
+        def done(deleted):
             self._status("Deleted after print")
-            self.refresh()
+            self._remove_cards(deleted)
 
         self._runner.run(work, on_result=done, on_error=self._on_error)
 
@@ -330,15 +379,7 @@ class FilesTab(QWidget):
             return
 
         def work():
-            url = get_download_url(self._client, item.id)
-            if not url:
-                raise RuntimeError("No download URL returned")
-            with httpx.stream("GET", url, timeout=60.0) as resp:
-                resp.raise_for_status()
-                with open(dest, "wb") as handle:
-                    for chunk in resp.iter_bytes():
-                        handle.write(chunk)
-            return dest
+            return download_file(self._client, item.id, dest, md5=item.md5, resume=True)
 
         def done(saved):
             self._status(f"Downloaded to {saved}")
@@ -353,12 +394,11 @@ class FilesTab(QWidget):
             return
 
         def work():
-            delete_files(self._client, [item.id])
-            return True
+            return delete_files_batched(self._client, [item.id])
 
-        def done(_):
+        def done(deleted):
             self._status("Deleted")
-            self.refresh()
+            self._remove_cards(deleted)
 
         self._runner.run(work, on_result=done, on_error=self._on_error)
 
@@ -387,7 +427,7 @@ class FilesTab(QWidget):
 
         if item.gcode_id:
             def work():
-                return get_gcode_info(self._client, item.gcode_id)
+                return load_gcode_info(self._client, item.gcode_id)
 
             def done(info):
                 self._show_details_window(base_info, info, note="")
@@ -410,16 +450,17 @@ class FilesTab(QWidget):
         win.show()
 
     def _load_thumbnail(self, item: FileItem, card: FileCard) -> None:
+        thumb = cached_thumbnail(item.thumbnail, THUMB_SIZE)
+        if thumb is not None:
+            card.set_thumbnail(thumbnail_pixmap(thumb))
+            return
+
         def work():
-            return fetch_image_bytes(item.thumbnail, timeout=20.0)
+            return fetch_thumbnail(item.thumbnail, THUMB_SIZE, timeout=20.0)
 
-        def done(data: bytes):
-            if not data:
-                return
-            image = QImage()
-            image.loadFromData(data)
-            if not image.isNull():
-                card.set_thumbnail(QPixmap.fromImage(image))
+        def done(thumb: Optional[Thumbnail]):
+            if thumb is not None:
+                card.set_thumbnail(thumbnail_pixmap(thumb))
 
         self._runner.run(work, on_result=done, on_error=self._on_error)
 
@@ -1,8 +1,23 @@
 import os
+from typing import Optional
 
-from PySide6.QtCore import QTimer
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QTextCursor
-from PySide6.QtWidgets import QLabel, QPlainTextEdit, QVBoxLayout, QWidget
+from PySide6.QtWidgets import (
+    QHBoxLayout,
+    QLabel,
+    QPlainTextEdit,
+    QPushButton,
+    QSplitter,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from ...client import CloudClient
+from ...image_cache import image_fetch_stats, memory_cache_stats
+from ...utils import format_bytes
 
 
 class LogTailWidget(QWidget):
@@ -50,9 +65,92 @@ class LogTailWidget(QWidget):
             self.status.setText(f"Log read error: {exc}")
 
 
+class RequestStatsWidget(QWidget):
+    COLUMNS = ["Endpoint", "Count", "Errors", "In flight", "p50 ms", "p95 ms", "p99 ms", "Received"]
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._client: Optional[CloudClient] = None
+
+        layout = QVBoxLayout(self)
+        top = QHBoxLayout()
+        self.summary = QLabel("No session loaded.")
+        top.addWidget(self.summary)
+        top.addStretch(1)
+        self.reset_btn = QPushButton("Reset")
+        self.reset_btn.setCursor(Qt.PointingHandCursor)
+        self.reset_btn.setToolTip("Reset request statistics")
+        self.reset_btn.clicked.connect(self._reset)
+        top.addWidget(self.reset_btn)
+        layout.addLayout(top)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table, 1)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(2000)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+
+    def set_client(self, client: CloudClient) -> None:
+        self._client = client
+        self.refresh()
+
+    def _reset(self) -> None:
+        if self._client:
+            self._client.metrics.reset()
+        self.refresh()
+
+    def refresh(self) -> None:
+        if not self._client or not self.isVisible():
+            return
+        stats = self._client.stats()
+        endpoints = stats.get("endpoints", {})
+        cache = stats.get("cache") or {}
+        coalesce = stats.get("coalesce") or {}
+        images = image_fetch_stats()
+        thumbs = memory_cache_stats()["thumbnails"]
+        self.summary.setText(
+            f"In flight: {stats.get('inflight', 0)}  "
+            f"Cache hits: {cache.get('hits', 0)}  "
+            f"Coalesced: {coalesce.get('coalesced', 0)}  "
+            f"Images: {images['downloads']} downloaded, {images['shared']} shared, {images['decoded']} decoded  "
+            f"Thumbnails: {thumbs['hits']} hits, {thumbs['misses']} misses, {thumbs['evictions']} evicted "
+            f"({format_bytes(thumbs['bytes'])}/{format_bytes(thumbs['max_bytes'])})"
+        )
+        ordered = sorted(endpoints.items(), key=lambda kv: kv[1].get("p95_ms", 0.0), reverse=True)
+        self.table.setRowCount(len(ordered))
+        for row, (endpoint, data) in enumerate(ordered):
+            values = [
+                endpoint,
+                data["count"],
+                data["errors"],
+                data["inflight"],
+                f"{data['p50_ms']:.1f}",
+                f"{data['p95_ms']:.1f}",
+                f"{data['p99_ms']:.1f}",
+                format_bytes(data["resp_bytes"]),
+            ]
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QTableWidgetItem(str(value)))
+
+
 class LogTab(QWidget):
     def __init__(self, parent=None) -> None:
         super().__init__(parent)
         layout = QVBoxLayout(self)
         log_path = os.path.join(os.getcwd(), "accloud_http.log")
-        layout.addWidget(LogTailWidget(log_path, self))
+        splitter = QSplitter(Qt.Vertical, self)
+        self.stats = RequestStatsWidget(splitter)
+        splitter.addWidget(self.stats)
+        splitter.addWidget(LogTailWidget(log_path, splitter))
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter)
+
+    def set_client(self, client: CloudClient) -> None:
+        self.stats.set_client(client)
@@ -3,7 +3,6 @@ from datetime import datetime
 from typing import Any, Callable, Dict, Optional
 
 from PySide6.QtCore import Qt, QSize
-from PySide6.QtGui import QImage, QPixmap
 from PySide6.QtWidgets import (
     QComboBox,
     QDialog,
@@ -15,10 +14,12 @@ from PySide6.QtWidgets import (
     QVBoxLayout,
 )
 
-from ...api import get_gcode_info, list_printers, send_print_order
+from ...api import iter_printers, send_print_order
 from ...client import CloudClient
+from ...gcode_store import load_gcode_info
 from ...models import FileItem
-from ...image_cache import fetch_image_bytes
+from ...image_cache import Thumbnail, fetch_thumbnail
+from ..images import thumbnail_pixmap
 from ..threads import TaskRunner
 
 
@@ -154,7 +155,7 @@ class PrintDialog(QDialog):
 
     def _load_printers(self) -> None:
         def work():
-            return list_printers(self._client, params={"page": 1, "limit": 50})
+            return list(iter_printers(self._client, limit=50))
 
         def done(data):
             items = data if isinstance(data, list) else data.get("list") or data.get("rows") or data.get("data") or []
@@ -186,7 +187,7 @@ class PrintDialog(QDialog):
             return
 
         def work():
-            return get_gcode_info(self._client, self._item.gcode_id)
+            return load_gcode_info(self._client, self._item.gcode_id)
 
         def done(info):
             slice_param = _parse_json(info.get("slice_param"))
@@ -202,17 +203,11 @@ class PrintDialog(QDialog):
             return
 
         def work():
-            return fetch_image_bytes(self._item.thumbnail, timeout=20.0)
-
-        def done(data: bytes):
-            if not data:
-                return
-            image = QImage()
-            image.loadFromData(data)
-            if image.isNull():
-                return
-            pix = QPixmap.fromImage(image)
-            self.preview.setPixmap(pix.scaled(420, 240, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            return fetch_thumbnail(self._item.thumbnail, (420, 240), timeout=20.0)
+
+        def done(thumb: Optional[Thumbnail]):
+            if thumb is not None:
+                self.preview.setPixmap(thumbnail_pixmap(thumb))
 
         self._runner.run(work, on_result=done)
 
@@ -1,11 +1,9 @@
 import json
 import os
-from collections import OrderedDict
 from datetime import datetime
 from typing import Any, Callable, Dict, Optional
 
 from PySide6.QtCore import Qt, QTimer
-from PySide6.QtGui import QImage, QPixmap
 from PySide6.QtWidgets import (
     QComboBox,
     QFrame,
@@ -21,9 +19,10 @@ from PySide6.QtWidgets import (
     QSizePolicy,
 )
 
-from ...api import get_printer_info_v2, get_projects, list_printers
+from ...api import get_printer_info_v2, get_projects, iter_printers
 from ...client import CloudClient
-from ...image_cache import fetch_image_bytes
+from ...image_cache import Thumbnail, cached_thumbnail, fetch_thumbnail
+from ..images import thumbnail_pixmap
 from ..threads import TaskRunner
 
 
@@ -108,9 +107,6 @@ class PrinterTab(QWidget):
         self._thumbs_enabled = os.getenv("ACCLOUD_DISABLE_THUMBS", "0") not in ("1", "true", "TRUE")
         self._on_printer_id_changed: Optional[Callable[[str], None]] = None
         self._on_print_completed: Optional[Callable[[str], None]] = None
-        self._image_cache: "OrderedDict[str, QPixmap]" = OrderedDict()
-        self._image_inflight = set()
-        self._image_cache_max = 64
         self._poll_interval_idle_ms = 15000
         self._poll_interval_active_ms = 5000
         self._has_active_print = False
@@ -197,7 +193,7 @@ class PrinterTab(QWidget):
         self._schedule_poll(2000)
 
     def _load_printers(self):
-        return list_printers(self._client, params={"page": 1, "limit": 50})
+        return list(iter_printers(self._client, limit=50))
 
     def _apply_printers(self, data: Dict[str, Any]) -> None:
         if isinstance(data, list):
@@ -611,36 +607,19 @@ class PrinterTab(QWidget):
         self._load_image(self.preview, url, 200)
 
     def _load_image(self, target: QLabel, url: str, size: int) -> None:
-        if url in self._image_cache:
-            pix = self._image_cache.pop(url)
-            self._image_cache[url] = pix
-            target.setPixmap(pix.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        thumb = cached_thumbnail(url, size)
+        if thumb is not None:
+            target.setPixmap(thumbnail_pixmap(thumb))
             return
-        if url in self._image_inflight:
-            return
-        self._image_inflight.add(url)
 
         def work():
-            return fetch_image_bytes(url, timeout=20.0)
+            return fetch_thumbnail(url, size, timeout=20.0)
 
-        def done(data: bytes):
-            self._image_inflight.discard(url)
-            if not data:
-                return
-            image = QImage()
-            image.loadFromData(data)
-            if not image.isNull():
-                pix = QPixmap.fromImage(image)
-                self._image_cache[url] = pix
-                while len(self._image_cache) > self._image_cache_max:
-                    self._image_cache.popitem(last=False)
-                target.setPixmap(pix.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-
-        def failed(exc: Exception):
-            self._image_inflight.discard(url)
-            self._on_error(exc)
-
-        self._runner.run(work, on_result=done, on_error=failed)
+        def done(thumb: Optional[Thumbnail]):
+            if thumb is not None:
+                target.setPixmap(thumbnail_pixmap(thumb))
+
+        self._runner.run(work, on_result=done, on_error=self._on_error)
 
     def _clear_job(self) -> None:
         self.job_name.setText("-")
@@ -13,7 +13,7 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
-from ...api import get_projects
+from ...api import iter_projects
 from ...client import CloudClient
 from ..threads import TaskRunner
 
@@ -94,7 +94,9 @@ class TaskHistoryTab(QWidget):
 
     def _load_tasks(self):
         # print_status=2 is assumed to be completed tasks (may vary by API).
-        return get_projects(self._client, self._printer_id, print_status=2, page=1, limit=50)
+        # History is never urgent: keep it behind printer polling and user actions.
+        with self._client.priority("background"):
+            return list(iter_projects(self._client, self._printer_id, print_status=2, limit=50, prefetch=2))
 
     def _apply_tasks(self, data: Dict[str, Any]) -> None:
         if isinstance(data, list):
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtWidgets import (
     QCheckBox,
     QDialog,
@@ -8,11 +8,12 @@ from PySide6.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QMessageBox,
+    QProgressBar,
     QPushButton,
     QVBoxLayout,
 )
 
-from ...api import list_files, upload_file
+from ...api import iter_files, upload_file
 from ...client import CloudClient
 from ...models import FileItem
 from ..threads import TaskRunner
@@ -27,6 +28,7 @@ class UploadDialog(QDialog):
         self._file_item: Optional[FileItem] = None
         self._print_after = False
         self._delete_after = False
+        self._sent = (0, 0)
 
         self.setWindowTitle("Upload")
         self.setModal(True)
@@ -54,6 +56,15 @@ class UploadDialog(QDialog):
         root.addWidget(self.print_check)
         root.addWidget(self.delete_check)
 
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 1000)
+        self.progress.setValue(0)
+        self.progress.setVisible(False)
+        root.addWidget(self.progress)
+        self._progress_timer = QTimer(self)
+        self._progress_timer.setInterval(200)
+        self._progress_timer.timeout.connect(self._update_progress)
+
         footer = QHBoxLayout()
         footer.addStretch(1)
         self.cancel_btn = QPushButton("Cancel")
@@ -83,6 +94,22 @@ class UploadDialog(QDialog):
         self.file_btn.setEnabled(not busy)
         self.print_check.setEnabled(not busy)
         self.delete_check.setEnabled(not busy and self.print_check.isChecked())
+        self.progress.setVisible(busy)
+        if busy:
+            self._sent = (0, 0)
+            self.progress.setValue(0)
+            self._progress_timer.start()
+        else:
+            self._progress_timer.stop()
+
+    def _on_progress(self, sent: int, total: int) -> None:
+        # Called from the upload threads; the timer picks it up on the UI thread.
+        self._sent = (sent, total)
+
+    def _update_progress(self) -> None:
+        sent, total = self._sent
+        if total > 0:
+            self.progress.setValue(int(sent * 1000 / total))
 
     def _start_upload(self) -> None:
         if not self._path:
@@ -91,8 +118,8 @@ class UploadDialog(QDialog):
         self._set_busy(True)
 
         def work():
-            file_id = upload_file(self._client, self._path)
-            items = list_files(self._client, page=1, limit=50)
+            file_id = upload_file(self._client, self._path, progress=self._on_progress)
+            items = iter_files(self._client, limit=50)
             match = next((item for item in items if str(item.id) == str(file_id)), None)
             return file_id, match
 
@@ -0,0 +1,361 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+import httpx
+
+from endpoints import UPLOAD
+from .api import _json_or_raise
+from .client import CloudClient
+from .dedup import file_md5, find_remote_duplicate, get_md5_index
+from .http_pool import get_http_pool
+from .models import FileItem
+from .retry import RetryPolicy
+from .upload_journal import STAGE_REGISTERED, STAGE_TRANSFER, STAGE_TRANSFERRED, get_upload_journal
+from .utils import env_bool, env_int, get_logger
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_WORKERS = 4
+
+# Speculative: lockStorageSpace has only ever been seen returning a single
+# preSignUrl (the known-good path, see _put_single). These part-URL keys,
+# completeUrl and partSize are guesses at a multipart variant and are only
+# used if the cloud ever sends them.
+_PART_URL_KEYS = ("preSignUrlArr", "preSignUrls", "partUrls")
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class _Progress:
+    def __init__(self, total: int, callback: Optional[ProgressCallback]) -> None:
+        self.total = total
+        self.sent = 0
+        self._callback = callback
+        self._lock = threading.Lock()
+
+    def add(self, count: int) -> None:
+        with self._lock:
+            self.sent += count
+            sent = self.sent
+        if self._callback is not None:
+            self._callback(sent, self.total)
+
+
+def _multipart_plan(lock_data: Dict[str, Any], size: int) -> Optional[Dict[str, Any]]:
+    urls: List[str] = []
+    for key in _PART_URL_KEYS:
+        value = lock_data.get(key)
+        if isinstance(value, list) and value:
+            urls = [str(u) for u in value]
+            break
+    complete_url = lock_data.get("completeUrl")
+    if len(urls) < 2 or not complete_url:
+        return None
+    part_size = int(lock_data.get("partSize") or math.ceil(size / len(urls)))
+    return {"urls": urls, "part_size": part_size, "complete_url": str(complete_url)}
+
+
+def restarts_transfer(entry: Dict[str, Any]) -> bool:
+    # True when finishing this journaled upload re-sends the whole file: a
+    # single pre-signed PUT cannot continue, only the lock is reused.
+    return entry.get("stage") == STAGE_TRANSFER and _multipart_plan(entry.get("lock") or {}, int(entry.get("size") or 0)) is None
+
+
+def lock_storage(client: CloudClient, filename: str, size: int) -> Dict[str, Any]:
+    payload = {"name": filename, "size": size, "is_temp_file": 0}
+    resp = client.request(UPLOAD["lock_storage_space"]["method"], UPLOAD["lock_storage_space"]["path"], json=payload)
+    lock_data = _json_or_raise(resp).get("data", {})
+    if not lock_data.get("preSignUrl") and not _multipart_plan(lock_data, size):
+        raise RuntimeError("Missing preSignUrl from lockStorageSpace")
+    return lock_data
+
+
+def register_upload(client: CloudClient, lock_id: Any) -> str:
+    payload = {"user_lock_space_id": lock_id}
+    resp = client.request(UPLOAD["new_upload_file"]["method"], UPLOAD["new_upload_file"]["path"], json=payload)
+    return str(_json_or_raise(resp).get("data", {}).get("id"))
+
+
+def unlock_storage(client: CloudClient, lock_id: Any, delete_cos: bool = False) -> None:
+    payload = {"id": lock_id, "is_delete_cos": 1 if delete_cos else 0}
+    resp = client.request(UPLOAD["unlock_storage_space"]["method"], UPLOAD["unlock_storage_space"]["path"], json=payload)
+    _json_or_raise(resp)
+
+
+class Uploader:
+    def __init__(
+        self,
+        client: CloudClient,
+        chunk_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        http: Optional[httpx.Client] = None,
+        retry: Optional[RetryPolicy] = None,
+        journal: bool = True,
+        dedup: Optional[bool] = None,
+    ) -> None:
+        self.client = client
+        self.chunk_size = max(64 * 1024, int(chunk_size or env_int("ACCLOUD_UPLOAD_CHUNK_MB", 8) * 1024 * 1024))
+        self.workers = max(1, int(workers or env_int("ACCLOUD_UPLOAD_WORKERS", DEFAULT_WORKERS)))
+        self.retry = retry or RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=8.0)
+        self.logger = get_logger("accloud")
+        self.journal = get_upload_journal() if journal else None
+        self.dedup = env_bool("ACCLOUD_UPLOAD_DEDUP", True) if dedup is None else dedup
+        self._http = http
+
+    def upload(
+        self,
+        path: str,
+        name: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        md5: Optional[str] = None,
+    ) -> str:
+        # md5: the file's hash when the caller already has it.
+        filename = name or os.path.basename(str(path))
+        st = os.stat(path)
+
+        entry = self._resumable_entry(path, st)
+        if entry is not None:
+            if restarts_transfer(entry):
+                self.logger.info("Sending %s again from the start under its existing lock %s", path, entry["lock_id"])
+            else:
+                self.logger.info("Resuming upload of %s (lock %s, %s)", path, entry["lock_id"], entry["stage"])
+            try:
+                return self._run(entry, path, progress)
+            except httpx.HTTPStatusError as exc:
+                # Most likely an expired pre-signed URL: start over with a fresh lock.
+                if entry["stage"] != STAGE_TRANSFER or exc.response.status_code not in (400, 403):
+                    raise
+        elif self.dedup:
+            md5, existing = self._find_duplicate(path, md5)
+            if existing is not None:
+                self.logger.info("Skipping upload of %s: same content as cloud file %s", path, existing.id)
+                if progress is not None:
+                    progress(st.st_size, st.st_size)
+                return str(existing.id)
+
+        # 1) lock storage
+        lock_data = lock_storage(self.client, filename, st.st_size)
+        entry = None
+        if self.journal is not None:
+            try:
+                entry = self.journal.start(path, filename, st, lock_data)
+            except OSError as exc:
+                # Unwritable journal directory: upload anyway, just not resumably.
+                self.logger.info("Upload journal unavailable (%s); %s cannot be resumed", exc, path)
+                self.journal = None
+        if entry is None:
+            entry = {
+                "source": path,
+                "name": filename,
+                "size": st.st_size,
+                "lock_id": lock_data.get("id"),
+                "lock": lock_data,
+                "stage": STAGE_TRANSFER,
+                "parts": {},
+                "file_id": None,
+            }
+        entry["md5"] = md5
+        return self._run(entry, path, progress)
+
+    def _run(self, entry: Dict[str, Any], path: str, progress: Optional[ProgressCallback]) -> str:
+        if entry["stage"] == STAGE_TRANSFER:
+            # 2) PUT to S3
+            try:
+                self.transfer(entry["lock"], path, entry["size"], progress, entry=entry)
+            except BaseException as exc:
+                # Keep the lock for a later resume unless the journal is off or
+                # S3 refused the request outright.
+                fatal = isinstance(exc, httpx.HTTPStatusError) and 400 <= exc.response.status_code < 500
+                if self.journal is None or fatal:
+                    self.release(entry)
+                raise
+            entry["stage"] = STAGE_TRANSFERRED
+            self._save(entry)
+
+        if entry["stage"] == STAGE_TRANSFERRED:
+            # 3) register upload
+            entry["file_id"] = register_upload(self.client, entry["lock_id"])
+            entry["stage"] = STAGE_REGISTERED
+            self._save(entry)
+
+        # 4) unlock storage
+        unlock_storage(self.client, entry["lock_id"])
+        if entry.get("md5"):
+            # Patch the dedup index rather than forcing a full re-listing.
+            get_md5_index(self.client).add(FileItem(
+                id=str(entry["file_id"]),
+                name=entry.get("name") or os.path.basename(entry["source"]),
+                size_bytes=int(entry["size"]),
+                created_at=int(time.time()),
+                md5=entry["md5"],
+            ))
+        if self.journal is not None:
+            self.journal.remove(entry["source"])
+        return str(entry["file_id"])
+
+    def _resumable_entry(self, path: str, st: os.stat_result) -> Optional[Dict[str, Any]]:
+        if self.journal is None:
+            return None
+        entry = self.journal.load(path)
+        if entry is None:
+            return None
+        if entry.get("stage") == STAGE_REGISTERED or self.journal.is_resumable(entry, st):
+            return entry
+        self.release(entry)
+        return None
+
+    def _find_duplicate(self, path: str, md5: Optional[str]) -> Tuple[Optional[str], Optional[FileItem]]:
+        try:
+            md5 = md5 or file_md5(path)
+            return md5, find_remote_duplicate(self.client, path, md5)
+        except Exception as exc:
+            # Dedup is an optimisation; never let it block the upload itself.
+            self.logger.info("Dedup check for %s failed: %s", path, exc)
+            return md5, None
+
+    def _save(self, entry: Dict[str, Any]) -> None:
+        if self.journal is not None:
+            self.journal.save(entry)
+
+    def release(self, entry: Dict[str, Any]) -> None:
+        # A registered file already owns its bytes; anything earlier is dropped from S3 too.
+        delete_cos = entry.get("stage") != STAGE_REGISTERED
+        try:
+            unlock_storage(self.client, entry["lock_id"], delete_cos=delete_cos)
+        except Exception as exc:
+            self.logger.info("Unlock of upload lock %s failed: %s", entry.get("lock_id"), exc)
+        if self.journal is not None:
+            self.journal.remove(entry["source"])
+
+    def transfer(
+        self,
+        lock_data: Dict[str, Any],
+        path: str,
+        size: int,
+        progress: Optional[ProgressCallback] = None,
+        entry: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        tracker = _Progress(size, progress)
+        http = self._http or get_http_pool()
+        plan = _multipart_plan(lock_data, size)
+        if plan is not None:
+            self._put_parts(http, plan, path, size, tracker, entry)
+        else:
+            self._put_single(http, str(lock_data["preSignUrl"]), path, size, tracker)
+
+    def _put_single(self, http: httpx.Client, url: str, path: str, size: int, tracker: _Progress) -> None:
+        # A single pre-signed PUT cannot be split or appended to; stream it so
+        # memory stays flat and progress is reported per chunk. A failed attempt
+        # (or a journaled upload taken up again) re-sends the whole object under
+        # the same lock.
+        attempt = 1
+        while True:
+            sent_before = tracker.sent
+            try:
+                resp = http.put(url, content=self._read_chunks(path, 0, size, tracker), headers={"Content-Length": str(size)})
+                resp.raise_for_status()
+                return
+            except (httpx.TransportError, httpx.HTTPStatusError) as exc:
+                if not self._should_retry(exc, attempt):
+                    raise
+                tracker.add(sent_before - tracker.sent)
+                time.sleep(self.retry.backoff(attempt))
+                attempt += 1
+
+    def _put_parts(
+        self,
+        http: httpx.Client,
+        plan: Dict[str, Any],
+        path: str,
+        size: int,
+        tracker: _Progress,
+        entry: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        part_size = plan["part_size"]
+        urls = plan["urls"]
+        done: Dict[str, str] = entry.setdefault("parts", {}) if entry is not None else {}
+        etags: Dict[int, str] = {int(n): etag for n, etag in done.items()}
+        done_lock = threading.Lock()
+        for number in etags:
+            tracker.add(max(0, min(part_size, size - (number - 1) * part_size)))
+
+        def put_part(index: int) -> None:
+            offset = index * part_size
+            length = max(0, min(part_size, size - offset))
+            attempt = 1
+            while True:
+                try:
+                    with open(path, "rb") as handle:
+                        handle.seek(offset)
+                        data = handle.read(length)
+                    resp = http.put(urls[index], content=data)
+                    resp.raise_for_status()
+                    etag = resp.headers.get("etag", "")
+                    with done_lock:
+                        etags[index + 1] = etag
+                        if entry is not None:
+                            done[str(index + 1)] = etag
+                            self._save(entry)
+                    tracker.add(len(data))
+                    return
+                except (httpx.TransportError, httpx.HTTPStatusError) as exc:
+                    if not self._should_retry(exc, attempt):
+                        raise
+                    time.sleep(self.retry.backoff(attempt))
+                    attempt += 1
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(urls)), thread_name_prefix="accloud-upload") as pool:
+            pending = [i for i in range(len(urls)) if i + 1 not in etags]
+            for future in [pool.submit(put_part, i) for i in pending]:
+                future.result()
+
+        body = "".join(
+            f"<Part><PartNumber>{n}</PartNumber><ETag>{escape(etags[n])}</ETag></Part>"
+            for n in sorted(etags)
+        )
+        resp = http.post(
+            plan["complete_url"],
+            content=f"<CompleteMultipartUpload>{body}</CompleteMultipartUpload>".encode("utf-8"),
+            headers={"Content-Type": "application/xml"},
+        )
+        resp.raise_for_status()
+
+    def _should_retry(self, exc: Exception, attempt: int) -> bool:
+        if attempt >= self.retry.max_attempts:
+            return False
+        if isinstance(exc, httpx.HTTPStatusError):
+            return exc.response.status_code in self.retry.statuses
+        return True
+
+    def _read_chunks(self, path: str, offset: int, length: int, tracker: _Progress) -> Iterator[bytes]:
+        with open(path, "rb") as handle:
+            handle.seek(offset)
+            remaining = length
+            while remaining > 0:
+                chunk = handle.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                tracker.add(len(chunk))
+                yield chunk
+
+
+def release_orphaned_uploads(client: CloudClient) -> List[Dict[str, Any]]:
+    # Startup sweep: unlock reservations whose upload can no longer be resumed
+    # (source gone or changed, pre-signed URL too old). Returns the resumable ones.
+    journal = get_upload_journal()
+    if journal is None:
+        return []
+    uploader = Uploader(client)
+    pending = []
+    for entry in journal.entries():
+        if entry.get("stage") != STAGE_REGISTERED and journal.is_resumable(entry):
+            pending.append(entry)
+        else:
+            # Unresumable: dropped from S3. Registered but never unlocked: just unlocked.
+            uploader.release(entry)
+    return pending
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .utils import env_bool, env_int
+
+DEFAULT_UPLOAD_JOURNAL_DIR = ".accloud/uploads"
+
+# Stages an upload goes through; a journal entry is removed once unlocked.
+STAGE_TRANSFER = "transfer"
+STAGE_TRANSFERRED = "transferred"
+STAGE_REGISTERED = "registered"
+
+
+def _source_stat(path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+class UploadJournal:
+    def __init__(self, directory: str = DEFAULT_UPLOAD_JOURNAL_DIR, max_age_hours: Optional[int] = None) -> None:
+        self.directory = directory
+        self.max_age = float(max_age_hours if max_age_hours is not None else env_int("ACCLOUD_UPLOAD_RESUME_HOURS", 12)) * 3600
+        self._lock = threading.Lock()
+
+    def _path_for(self, source: str) -> str:
+        digest = hashlib.sha256(os.path.abspath(source).encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def start(self, source: str, name: str, st: os.stat_result, lock_data: Dict[str, Any]) -> Dict[str, Any]:
+        entry = {
+            "source": os.path.abspath(source),
+            "name": name,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "lock_id": lock_data.get("id"),
+            "lock": lock_data,
+            "stage": STAGE_TRANSFER,
+            "parts": {},
+            "file_id": None,
+            "created_at": time.time(),
+        }
+        self.save(entry)
+        return entry
+
+    def load(self, source: str) -> Optional[Dict[str, Any]]:
+        return self._read(self._path_for(source))
+
+    def _read(self, journal_path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(journal_path, "r", encoding="utf-8") as handle:
+                entry = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        return entry if isinstance(entry, dict) and entry.get("lock_id") is not None else None
+
+    def save(self, entry: Dict[str, Any]) -> None:
+        path = self._path_for(entry["source"])
+        tmp = f"{path}.tmp"
+        with self._lock:
+            # Created on first use, so commands that upload nothing leave no trace.
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as handle:
+                json.dump(entry, handle, ensure_ascii=True)
+            os.replace(tmp, path)
+
+    def remove(self, source: str) -> None:
+        try:
+            os.remove(self._path_for(source))
+        except OSError:
+            pass
+
+    def entries(self) -> List[Dict[str, Any]]:
+        found = []
+        try:
+            names = sorted(os.listdir(self.directory))
+        except OSError:
+            return []
+        for name in names:
+            if name.endswith(".json"):
+                entry = self._read(os.path.join(self.directory, name))
+                if entry is not None:
+                    found.append(entry)
+        return found
+
+    def is_resumable(self, entry: Dict[str, Any], st: Optional[os.stat_result] = None) -> bool:
+        if st is None:
+            st = _source_stat(entry.get("source", ""))
+        if st is None:
+            return False
+        if st.st_size != entry.get("size") or st.st_mtime != entry.get("mtime"):
+            return False
+        if entry.get("stage") == STAGE_TRANSFER and time.time() - float(entry.get("created_at", 0)) > self.max_age:
+            # The pre-signed URL has most likely expired.
+            return False
+        return True
+
+
+_JOURNAL: Optional[UploadJournal] = None
+_JOURNAL_LOCK = threading.Lock()
+
+
+def get_upload_journal() -> Optional[UploadJournal]:
+    global _JOURNAL
+    if not env_bool("ACCLOUD_UPLOAD_JOURNAL", True):
+        return None
+    with _JOURNAL_LOCK:
+        if _JOURNAL is None:
+            _JOURNAL = UploadJournal(os.getenv("ACCLOUD_UPLOAD_JOURNAL_DIR", DEFAULT_UPLOAD_JOURNAL_DIR))
+        return _JOURNAL
@@ -1,9 +1,13 @@
+import atexit
 import logging
 import os
+import queue
 import re
 import tarfile
+import threading
+import time
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -17,6 +21,23 @@ def get_logger(name: str) -> logging.Logger:
     return logger
 
 
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def env_bool(name: str, default: bool = True) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value not in ("0", "false", "FALSE")
+
+
 def redacted_headers(headers: Dict[str, Any]) -> Dict[str, Any]:
     redacted = {}
     for k, v in headers.items():
@@ -98,7 +119,7 @@ def _rotate_log_if_needed(
         return
 
     if compress:
-        archive_name = rotated_name.replace(".log", ".tar.gz")
+        archive_name = f"{rotated_name[:-len('.log')]}.tar.gz"
         archive_path = os.path.join(base_dir, archive_name)
         try:
             with tarfile.open(archive_path, "w:gz") as tar:
@@ -154,6 +175,146 @@ def append_log_line(
     _LOG_ROTATION_CACHE[path] = now.date()
 
 
+class BackgroundLogWriter:
+    def __init__(
+        self,
+        path: str,
+        *,
+        rotate_daily: bool = False,
+        keep_days: int = 7,
+        compress: bool = False,
+        max_queue: int = 10000,
+        batch_size: int = 512,
+        flush_interval: float = 0.25,
+    ) -> None:
+        self.path = path
+        self.rotate_daily = rotate_daily
+        self.keep_days = keep_days
+        self.compress = compress
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._pending_drops = 0
+        self._drop_lock = threading.Lock()
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"accloud-log:{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+
+    def write(self, line: str) -> None:
+        # Never blocks the caller: when the queue is full the line is dropped and counted.
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait((datetime.now(), line))
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+                self._pending_drops += 1
+
+    def flush(self, timeout: Optional[float] = 5.0) -> None:
+        if self._closed or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            batch: List[Tuple[datetime, Any]] = []
+            waiters: List[threading.Event] = []
+            stop = False
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                remaining = 0.0 if waiters else deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=max(remaining, 0.0))
+                except queue.Empty:
+                    break
+            with self._drop_lock:
+                drops, self._pending_drops = self._pending_drops, 0
+            if drops:
+                batch.append((datetime.now(), f"[log writer dropped {drops} line(s): queue full]"))
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception:
+                    pass
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _write_batch(self, batch: List[Tuple[datetime, Any]]) -> None:
+        # Records are grouped per day so a batch spanning midnight rotates correctly.
+        start = 0
+        while start < len(batch):
+            day = batch[start][0].date()
+            end = start
+            while end < len(batch) and batch[end][0].date() == day:
+                end += 1
+            if self.rotate_daily:
+                _rotate_log_if_needed(self.path, day, self.keep_days, self.compress)
+            lines = []
+            for when, line in batch[start:end]:
+                timestamp = when.strftime("%Y-%m-%d %H:%M:%S")
+                safe_line = str(line).rstrip("\n")
+                lines.append(f"[{timestamp}] {safe_line}\n")
+            with open(self.path, "a", encoding="utf-8") as handle:
+                handle.write("".join(lines))
+            _LOG_ROTATION_CACHE[self.path] = day
+            start = end
+
+
+_LOG_WRITERS: Dict[str, BackgroundLogWriter] = {}
+_LOG_WRITERS_LOCK = threading.Lock()
+
+
+def get_log_writer(
+    path: str,
+    factory: Optional[Callable[[], BackgroundLogWriter]] = None,
+    **options: Any,
+) -> BackgroundLogWriter:
+    key = os.path.abspath(path)
+    with _LOG_WRITERS_LOCK:
+        writer = _LOG_WRITERS.get(key)
+        if writer is None or writer._closed:
+            writer = factory() if factory else BackgroundLogWriter(path, **options)
+            _LOG_WRITERS[key] = writer
+        return writer
+
+
+@atexit.register
+def _close_log_writers() -> None:
+    with _LOG_WRITERS_LOCK:
+        writers = list(_LOG_WRITERS.values())
+    for writer in writers:
+        writer.close(timeout=2.0)
+
+
 def truncate_text(text: str, limit: int = 2000) -> str:
     if text is None:
         return ""
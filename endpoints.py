@@ -17,6 +17,8 @@ QUOTA = {
     "get_user_store": {
         "method": "POST",
         "path": "/p/p/workbench/api/work/index/getUserStore",
+        "idempotent": True,
+        "cache": {"ttl": 60, "max_entries": 4},
     }
 }
 
@@ -24,22 +26,27 @@ FILES = {
     "list": {
         "method": "POST",
         "path": "/p/p/workbench/api/work/index/files",
+        "idempotent": True,
     },
     "download_url": {
         "method": "POST",
         "path": "/p/p/workbench/api/work/index/getDowdLoadUrl",
+        "idempotent": True,
     },
     "delete": {
         "method": "POST",
         "path": "/p/p/workbench/api/work/index/delFiles",
+        "invalidates": ["FILES.list", "QUOTA.get_user_store"],
     },
     "rename": {
         "method": "POST",
         "path": "/p/p/workbench/api/work/index/renameFile",
+        "invalidates": ["FILES.list"],
     },
     "upload_status": {
         "method": "POST",
         "path": "/p/p/workbench/api/work/index/getUploadStatus",
+        "idempotent": True,
     },
 }
 
@@ -47,6 +54,7 @@ INFO = {
     "gcode_info": {
         "method": "GET",
         "path": "/p/p/workbench/api/api/work/gcode/info",
+        "cache": {"ttl": 600, "max_entries": 256},
     }
 }
 
@@ -54,10 +62,13 @@ PRINTERS = {
     "list": {
         "method": "GET",
         "path": "/p/p/workbench/api/work/printer/getPrinters",
+        "retry": {"max_attempts": 2},
+        "cache": {"ttl": 30, "max_entries": 16},
     },
     "info": {
         "method": "POST",
         "path": "/p/p/workbench/api/work/printer/Info",
+        "idempotent": True,
     },
     "info_v2": {
         "method": "GET",
@@ -76,14 +87,17 @@ UPLOAD = {
     "lock_storage_space": {
         "method": "POST",
         "path": "/p/p/workbench/api/v2/cloud_storage/lockStorageSpace",
+        "invalidates": ["QUOTA.get_user_store"],
     },
     "new_upload_file": {
         "method": "POST",
         "path": "/p/p/workbench/api/v2/profile/newUploadFile",
+        "invalidates": ["FILES.list", "QUOTA.get_user_store"],
     },
     "unlock_storage_space": {
         "method": "POST",
         "path": "/p/p/workbench/api/v2/cloud_storage/unlockStorageSpace",
+        "invalidates": ["FILES.list", "QUOTA.get_user_store"],
     },
 }
 
@@ -91,5 +105,38 @@ PRINT = {
     "send_order": {
         "method": "POST",
         "path": "/p/p/workbench/api/work/operation/sendOrder",
+        "retry": {"max_attempts": 1},
+        "priority": "interactive",
+        "invalidates": ["PRINTERS.list", "PRINTERS.info", "PRINTERS.info_v2", "PROJECTS.list"],
     }
 }
+
+# Optional per-endpoint keys:
+#   "cache": {"ttl": seconds, "max_entries": n}  -> short-lived response cache
+#   "invalidates": ["GROUP.name", ...]           -> cache entries dropped after the call
+#   "idempotent": True                           -> POST that only reads, safe to retry
+#   "retry": {"max_attempts": n, "base_delay": s, "max_delay": s, "statuses": [...]}
+#   "priority": "interactive" | "normal" | "background" -> lane in the request governor
+GROUPS = {
+    "AUTH": AUTH,
+    "QUOTA": QUOTA,
+    "FILES": FILES,
+    "INFO": INFO,
+    "PRINTERS": PRINTERS,
+    "PROJECTS": PROJECTS,
+    "UPLOAD": UPLOAD,
+    "PRINT": PRINT,
+}
+
+# Client-side request governor: "rate" (req/s) and "burst" feed a token bucket,
+# "concurrency" caps requests in flight. "*" applies to every request on top of
+# its group, except groups marked "global": False.
+LIMITS = {
+    "*": {"rate": 8.0, "burst": 16, "concurrency": 8},
+    "FILES": {"rate": 4.0, "burst": 8, "concurrency": 4},
+    "PRINTERS": {"rate": 4.0, "burst": 8, "concurrency": 3},
+    "PROJECTS": {"rate": 2.0, "burst": 4, "concurrency": 2},
+    # Thumbnails come from the CDN, not the API: own bucket and gate, kept out
+    # of the "*" limit so a screen of images never delays API calls.
+    "IMAGES": {"rate": 16.0, "burst": 32, "concurrency": 4, "global": False},
+}
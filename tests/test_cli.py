@@ -0,0 +1,56 @@
+import io
+
+import httpx
+import pytest
+
+from accloud import cli
+
+
+class FakeAccount:
+    # Cloud API stand-in for the file listing and delFiles.
+    def __init__(self, count):
+        self.rows = [{"id": i, "filename": f"f{i}.pwmb", "size": 10, "time": 1_000_000} for i in range(1, count + 1)]
+        self.deleted = []
+
+    def request(self, method, path, **kwargs):
+        body = kwargs.get("json") or {}
+        data = None
+        if path.endswith("/files"):
+            start = (body["page"] - 1) * body["limit"]
+            data = self.rows[start:start + body["limit"]]
+        elif path.endswith("/delFiles"):
+            self.deleted.extend(body["idArr"])
+        return httpx.Response(200, json={"code": 1, "data": data}, request=httpx.Request(method, path))
+
+
+def _rm(account, *argv):
+    return cli._rm_many(account, cli.build_parser().parse_args(["rm", *argv]))
+
+
+class _Terminal(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_bulk_rm_needs_yes_without_a_terminal(monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO())
+    account = FakeAccount(3)
+    assert _rm(account, "--all") == 1
+    assert account.deleted == []
+    assert _rm(account, "--all", "--yes") == 0
+    assert sorted(account.deleted) == [1, 2, 3]
+
+
+@pytest.mark.parametrize("answer, deleted", [("y\n", [1, 2]), ("\n", []), ("no\n", [])])
+def test_bulk_rm_asks_on_a_terminal(monkeypatch, answer, deleted):
+    monkeypatch.setattr("sys.stdin", _Terminal(answer))
+    account = FakeAccount(2)
+    _rm(account, "--older-than", "1d")
+    assert sorted(account.deleted) == deleted
+
+
+def test_dry_run_never_deletes(monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO())
+    account = FakeAccount(2)
+    assert _rm(account, "--all", "--dry-run") == 0
+    assert account.deleted == []
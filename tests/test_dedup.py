@@ -0,0 +1,101 @@
+import gc
+
+import httpx
+import pytest
+
+from accloud import dedup
+from accloud.dedup import Md5Index, file_md5, find_remote_duplicate, get_md5_index
+from accloud.models import FileItem
+
+
+class FakeFiles:
+    # Cloud API stand-in for the paged file listing.
+    def __init__(self, rows):
+        self.rows = rows
+        self.pages = []
+
+    def request(self, method, path, **kwargs):
+        body = kwargs["json"]
+        page, limit = body["page"], body["limit"]
+        self.pages.append(page)
+        data = self.rows[(page - 1) * limit:page * limit]
+        return httpx.Response(200, json={"code": 1, "data": data}, request=httpx.Request(method, path))
+
+
+def _row(file_id, md5, size=100, time=None):
+    return {"id": file_id, "filename": f"f{file_id}.pwmb", "size": size, "time": time or 1_000_000 + file_id, "md5": md5}
+
+
+def _newest_first(count):
+    return [_row(i, f"{i:032x}") for i in range(count, 0, -1)]
+
+
+def test_lookup_hit_miss_and_size_mismatch():
+    client = FakeFiles(_newest_first(3))
+    index = Md5Index(client)
+    hit = index.lookup(f"{2:032X}", size=100)
+    assert hit is not None and hit.id == "2"
+    assert index.lookup("f" * 32, size=100) is None
+    assert index.lookup(f"{2:032x}", size=101) is None
+
+
+def test_find_remote_duplicate(tmp_path):
+    path = tmp_path / "a.pwmb"
+    path.write_bytes(b"x" * 100)
+    client = FakeFiles([_row(9, file_md5(str(path)))])
+    assert find_remote_duplicate(client, str(path)).id == "9"
+    path.write_bytes(b"y" * 100)
+    assert find_remote_duplicate(client, str(path)) is None
+
+
+def test_stale_index_lists_only_new_files():
+    rows = _newest_first(120)
+    client = FakeFiles(rows)
+    index = Md5Index(client, ttl=0)
+    index.refresh()
+    rows.insert(0, _row(500, "a" * 32, time=2_000_000))
+    client.pages = []
+    assert index.lookup("a" * 32).id == "500"
+    assert client.pages == [1]
+    assert index.lookup(f"{7:032x}").id == "7"
+
+
+def test_listing_out_of_order_falls_back_to_full():
+    rows = [_row(i, f"{i:032x}") for i in range(1, 61)]
+    client = FakeFiles(rows)
+    index = Md5Index(client, ttl=0)
+    index.refresh()
+    client.pages = []
+    index.refresh()
+    assert 2 in client.pages
+
+
+def test_add_and_discard_patch_the_index():
+    client = FakeFiles(_newest_first(2))
+    index = Md5Index(client)
+    index.refresh()
+    index.add(FileItem(id="77", name="new.pwmb", size_bytes=5, created_at=0, md5="B" * 32))
+    index.discard(["1"])
+    client.pages = []
+    assert index.lookup("b" * 32).id == "77"
+    assert index.lookup(f"{1:032x}") is None
+    assert client.pages == []
+
+
+def test_index_does_not_keep_its_client_alive():
+    client = FakeFiles([])
+    get_md5_index(client)
+    assert len(dedup._INDEXES) >= 1
+    before = len(dedup._INDEXES)
+    del client
+    gc.collect()
+    assert len(dedup._INDEXES) == before - 1
+
+
+def test_closed_client():
+    client = FakeFiles([])
+    index = Md5Index(client)
+    del client
+    gc.collect()
+    with pytest.raises(RuntimeError):
+        index.refresh()
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import re
+
+import httpx
+import pytest
+
+from accloud import download
+from accloud.download import Downloader
+from accloud.retry import RetryPolicy
+
+URL = "http://s3.local/object"
+_RANGE = re.compile(r"bytes=(\d+)-(\d+)")
+
+
+class FakeObject:
+    # S3 stand-in serving one object with Range support. fail() queues error
+    # statuses for the next ranged GETs starting at an offset; cut() makes the
+    # next one starting there stop after a few bytes.
+    def __init__(self, data):
+        self.data = data
+        self.ranges = []
+        self.failures = {}
+        self.cuts = {}
+
+    def fail(self, start, *statuses):
+        self.failures[start] = list(statuses)
+
+    def cut(self, start, count):
+        self.cuts[start] = count
+
+    def __call__(self, request):
+        start, end = (int(v) for v in _RANGE.match(request.headers["range"]).groups())
+        end = min(end, len(self.data) - 1)
+        body = self.data[start:end + 1]
+        # The one-byte probe is never failed or counted.
+        if (start, end) != (0, 0):
+            self.ranges.append((start, end))
+            pending = self.failures.get(start)
+            if pending:
+                return httpx.Response(pending.pop(0))
+            if start in self.cuts:
+                body = body[:self.cuts.pop(start)]
+        return httpx.Response(
+            206,
+            content=body,
+            headers={"Content-Range": f"bytes {start}-{end}/{len(self.data)}", "ETag": '"v1"'},
+        )
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    monkeypatch.setattr(download, "MIN_SEGMENT_SIZE", 1024)
+
+
+def _downloader(server, segments=4, attempts=3):
+    return Downloader(
+        segments=segments,
+        http=httpx.Client(transport=httpx.MockTransport(server)),
+        retry=RetryPolicy(max_attempts=attempts, base_delay=0.0, max_delay=0.0),
+    )
+
+
+def test_segments_are_fetched_in_parallel_ranges(tmp_path):
+    data = os.urandom(10 * 1024)
+    server = FakeObject(data)
+    dest = str(tmp_path / "model.pwmb")
+
+    _downloader(server).download(URL, dest, md5=hashlib.md5(data).hexdigest())
+
+    assert open(dest, "rb").read() == data
+    assert sorted(server.ranges) == [(0, 2559), (2560, 5119), (5120, 7679), (7680, 10239)]
+    assert not os.path.exists(dest + ".part")
+
+
+def test_resume_fetches_only_the_missing_range(tmp_path):
+    data = os.urandom(8 * 1024)
+    server = FakeObject(data)
+    server.fail(6144, 500)
+    dest = str(tmp_path / "model.pwmb")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        _downloader(server, attempts=1).download(URL, dest, resume=True)
+    assert os.path.exists(dest + ".part") and os.path.exists(dest + ".part.json")
+
+    server.ranges.clear()
+    _downloader(server).download(URL, dest, md5=hashlib.md5(data).hexdigest(), resume=True)
+
+    assert server.ranges == [(6144, 8191)]
+    assert open(dest, "rb").read() == data
+    assert not os.path.exists(dest + ".part.json")
+
+
+def test_checksum_mismatch_removes_the_partial_file(tmp_path):
+    server = FakeObject(os.urandom(4096))
+    dest = str(tmp_path / "model.pwmb")
+
+    with pytest.raises(RuntimeError, match="Checksum mismatch"):
+        _downloader(server).download(URL, dest, md5="0" * 32, resume=True)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_failures_after_progress_do_not_use_up_the_attempts(tmp_path):
+    data = os.urandom(4096)
+    server = FakeObject(data)
+    dest = str(tmp_path / "model.pwmb")
+    # Five cut-short responses in a row, each one making progress.
+    for start in range(0, 5 * 512, 512):
+        server.cut(start, 512)
+
+    _downloader(server, segments=1, attempts=2).download(URL, dest)
+
+    assert open(dest, "rb").read() == data
+
+
+def test_consecutive_failures_still_give_up(tmp_path):
+    server = FakeObject(os.urandom(4096))
+    server.fail(0, 503, 503)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        _downloader(server, segments=1, attempts=2).download(URL, str(tmp_path / "model.pwmb"))
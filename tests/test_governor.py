@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from accloud.governor import AsyncGovernor, AsyncTokenBucket, Governor, TokenBucket
+
+
+def _drain(bucket):
+    while bucket._tokens >= 1.0:
+        bucket.acquire("normal")
+
+
+def _wait_queued(bucket, count):
+    deadline = time.monotonic() + 2.0
+    while bucket.waiting() < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_burst_then_rate():
+    bucket = TokenBucket(rate=50.0, burst=5)
+    started = time.monotonic()
+    for _ in range(5):
+        bucket.acquire("normal")
+    assert time.monotonic() - started < 0.05
+    for _ in range(10):
+        bucket.acquire("normal")
+    # 10 tokens beyond the burst at 50/s.
+    assert time.monotonic() - started >= 0.19
+    assert bucket._tokens >= 0
+
+
+def test_interactive_overtakes_queued_background():
+    bucket = TokenBucket(rate=20.0, burst=1)
+    _drain(bucket)
+    order = []
+    lock = threading.Lock()
+
+    def take(lane, tag):
+        bucket.acquire(lane)
+        with lock:
+            order.append(tag)
+
+    threads = [threading.Thread(target=take, args=("background", f"bg{i}")) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    _wait_queued(bucket, 8)
+    urgent = threading.Thread(target=take, args=("interactive", "ui"))
+    urgent.start()
+    threads.append(urgent)
+    for thread in threads:
+        thread.join(5)
+    # Only the head already sleeping for the next token may still go first.
+    assert order.index("ui") <= 1
+    assert len(order) == 9
+
+
+def test_async_interactive_overtakes_queued_background():
+    async def main():
+        bucket = AsyncTokenBucket(rate=20.0, burst=1)
+        await bucket.acquire("normal")
+        order = []
+
+        async def take(lane, tag):
+            await bucket.acquire(lane)
+            order.append(tag)
+
+        tasks = [asyncio.create_task(take("background", f"bg{i}")) for i in range(8)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(take("interactive", "ui")))
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(main())
+    assert order.index("ui") <= 1
+    assert len(order) == 9
+
+
+def test_async_cancelled_waiter_leaves_the_queue():
+    async def main():
+        bucket = AsyncTokenBucket(rate=20.0, burst=1)
+        await bucket.acquire("normal")
+        head = asyncio.create_task(bucket.acquire("normal"))
+        behind = asyncio.create_task(bucket.acquire("normal"))
+        await asyncio.sleep(0)
+        head.cancel()
+        await asyncio.wait_for(behind, 1.0)
+        return bucket.waiting()
+
+    assert asyncio.run(main()) == 0
+
+
+LIMITS = {
+    "*": {"rate": 1000.0, "burst": 1000, "concurrency": 3},
+    "FILES": {"rate": 1000.0, "burst": 1000, "concurrency": 2},
+    "IMAGES": {"rate": 1000.0, "burst": 1000, "concurrency": 1, "global": False},
+}
+
+
+def test_groups_and_global_opt_out():
+    governor = Governor(LIMITS)
+    assert governor._groups("FILES") == ["FILES", "*"]
+    assert governor._groups("IMAGES") == ["IMAGES"]
+    assert governor._groups(None) == ["*"]
+    assert governor._groups("UNKNOWN") == ["*"]
+
+
+@pytest.mark.parametrize("group, limit", [("FILES", 2), ("IMAGES", 1), (None, 3)])
+def test_concurrency_limit_holds(group, limit):
+    governor = Governor(LIMITS)
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def work():
+        nonlocal active, peak
+        with governor.slot(group):
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.01)
+            with lock:
+                active -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert peak == limit
+
+
+def test_images_do_not_take_global_slots():
+    governor = Governor(LIMITS)
+    release = threading.Event()
+
+    def hold_image():
+        with governor.slot("IMAGES"):
+            release.wait(2)
+
+    holder = threading.Thread(target=hold_image)
+    holder.start()
+    time.sleep(0.01)
+    try:
+        for _ in range(3):
+            with governor.slot("FILES"):
+                pass
+    finally:
+        release.set()
+        holder.join(2)
+
+
+def test_group_rate_limits_async_slots():
+    limits = {"FILES": {"rate": 50.0, "burst": 2, "concurrency": 4}}
+
+    async def main():
+        governor = AsyncGovernor(limits)
+        started = time.monotonic()
+        for _ in range(7):
+            async with governor.slot("FILES"):
+                pass
+        return time.monotonic() - started
+
+    # Five tokens beyond the burst at 50/s.
+    assert asyncio.run(main()) >= 0.09
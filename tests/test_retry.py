@@ -0,0 +1,132 @@
+import httpx
+import pytest
+
+from accloud.client import CloudClient
+from accloud.governor import Governor
+from accloud.retry import Retrier, RetryBudget, RetryPolicy, get_retrier
+from endpoints import FILES
+
+LIST = FILES["list"]["path"]
+DELETE = FILES["delete"]["path"]
+
+
+class Script:
+    # Transport answering each request with the next scripted reply: an
+    # HTTP status or an exception instance; 200 once the script runs out.
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def __call__(self, request):
+        self.calls += 1
+        reply = self.replies.pop(0) if self.replies else 200
+        if isinstance(reply, Exception):
+            raise reply
+        return httpx.Response(reply, json={"code": 1, "data": []})
+
+
+def _retrier(attempts=3, budget=None):
+    return Retrier(RetryPolicy(max_attempts=attempts, base_delay=0.0, max_delay=0.0), budget or RetryBudget())
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(script, retrier):
+        client = CloudClient(cache=False, coalesce=False, trace_format="off", governor=Governor({}), retrier=retrier)
+        client._client.close()
+        client._client = httpx.Client(base_url=client.base_url, transport=httpx.MockTransport(script))
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+@pytest.mark.parametrize("attempt", range(1, 8))
+def test_backoff_stays_within_the_jittered_ceiling(attempt):
+    policy = RetryPolicy(base_delay=0.25, max_delay=4.0)
+    ceiling = min(4.0, 0.25 * 2 ** (attempt - 1))
+    delays = [policy.backoff(attempt) for _ in range(200)]
+    assert all(0.0 <= d <= ceiling for d in delays)
+    # Full jitter: spread over the range, not pinned to the ceiling.
+    assert min(delays) < ceiling / 2 < max(delays)
+
+
+def test_retry_after_is_honoured_up_to_a_cap():
+    policy = RetryPolicy(max_retry_after=30.0)
+    assert policy.delay(1, httpx.Response(503, headers={"Retry-After": "7"})) == 7.0
+    assert policy.delay(1, httpx.Response(503, headers={"Retry-After": "120"})) is None
+
+
+def test_idempotent_endpoint_is_retried(make_client):
+    script = Script(503, httpx.ReadError("reset"))
+    retrier = _retrier()
+    client = make_client(script, retrier)
+    assert client.request("POST", LIST, json={"page": 1, "limit": 10}).status_code == 200
+    assert script.calls == 3
+    assert retrier.stats()["by_endpoint"] == {"FILES.list": 2}
+
+
+@pytest.mark.parametrize("reply", [503, httpx.ReadError("reset")])
+def test_non_idempotent_endpoint_is_not_retried(reply, make_client):
+    script = Script(reply)
+    client = make_client(script, _retrier())
+    with pytest.raises((httpx.HTTPStatusError, httpx.ReadError)):
+        client.request("POST", DELETE, json={"idArr": [1]})
+    assert script.calls == 1
+
+
+@pytest.mark.parametrize("reply", [429, httpx.ConnectError("refused")])
+def test_non_idempotent_endpoint_is_retried_when_not_processed(reply, make_client):
+    # 429 and connection failures mean the server never acted on the call.
+    script = Script(reply)
+    client = make_client(script, _retrier())
+    assert client.request("POST", DELETE, json={"idArr": [1]}).status_code == 200
+    assert script.calls == 2
+
+
+def test_gives_up_after_max_attempts(make_client):
+    script = Script(503, 503, 503, 503)
+    retrier = _retrier(attempts=3)
+    client = make_client(script, retrier)
+    with pytest.raises(httpx.HTTPStatusError):
+        client.request("POST", LIST, json={"page": 1, "limit": 10})
+    assert script.calls == 3
+    assert retrier.stats()["gave_up"] == 1
+
+
+def test_budget_exhaustion_stops_retries(make_client):
+    retrier = _retrier(attempts=5, budget=RetryBudget(ratio=0.0, min_tokens=2.0, max_tokens=2.0))
+    script = Script(*[503] * 10)
+    client = make_client(script, retrier)
+    with pytest.raises(httpx.HTTPStatusError):
+        client.request("POST", LIST, json={"page": 1, "limit": 10})
+    # Two retries spent the budget; the next failure is not retried at all.
+    assert script.calls == 3
+    with pytest.raises(httpx.HTTPStatusError):
+        client.request("POST", LIST, json={"page": 2, "limit": 10})
+    assert script.calls == 4
+    assert retrier.stats()["budget_exhausted"] == 2
+
+
+def test_budget_refills_with_traffic():
+    budget = RetryBudget(ratio=0.5, min_tokens=0.0, max_tokens=1.0)
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    budget.deposit()
+    assert budget.available() == 1.0
+    assert budget.withdraw()
+
+
+def test_clients_share_one_retrier():
+    clients = [CloudClient(trace_format="off") for _ in range(2)] + [CloudClient(trace_format="off", retry=False)]
+    try:
+        assert clients[0].retrier is clients[1].retrier is get_retrier()
+        assert clients[2].retrier is None
+    finally:
+        for client in clients:
+            client.close()
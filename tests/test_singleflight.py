@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from accloud.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def fetch():
+        runs.append(1)
+        started.set()
+        release.wait(2)
+        return "listing"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("k", fetch)))
+    leader.start()
+    started.wait(2)
+    followers = [threading.Thread(target=lambda: results.append(flights.do("k", fetch))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    deadline = time.monotonic() + 2
+    while flights.stats()["coalesced"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(2)
+    assert results == ["listing"] * 4
+    assert len(runs) == 1
+    assert flights.inflight() == 0
+
+
+def test_failure_reaches_every_caller():
+    flights = SingleFlight()
+    with pytest.raises(ValueError):
+        flights.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert flights.do("k", lambda: 1) == 1
+
+
+def test_async_followers_survive_a_cancelled_leader():
+    async def main():
+        flights = AsyncSingleFlight()
+        release = asyncio.Event()
+        runs = []
+
+        async def fetch():
+            runs.append(1)
+            await release.wait()
+            return "listing"
+
+        leader = asyncio.create_task(flights.do("k", fetch))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flights.do("k", fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*followers)
+        assert leader.cancelled()
+        return results, len(runs)
+
+    assert asyncio.run(main()) == (["listing", "listing"], 1)
+
+
+def test_async_caller_after_an_abandoned_flight_starts_a_new_one():
+    async def main():
+        flights = AsyncSingleFlight()
+        runs = []
+
+        async def fetch():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return len(runs)
+
+        leader = asyncio.create_task(flights.do("k", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # The abandoned task may not have finished cancelling yet; joining
+        # it would hand this caller a CancelledError it did not cause.
+        result = await flights.do("k", fetch)
+        return result, flights.stats()
+
+    result, stats = asyncio.run(main())
+    assert result == 2
+    assert stats == {"calls": 2, "executed": 2, "coalesced": 0, "inflight": 0}
@@ -0,0 +1,93 @@
+import hashlib
+import os
+
+import pytest
+
+from accloud import sync
+from accloud.models import FileItem
+from accloud.sync import ADOPT, CONFLICT, DELETE_LOCAL, DELETE_REMOTE, DOWNLOAD, KEEP, UPLOAD, SyncEngine
+
+CONTENT = b"model data"
+MD5 = hashlib.md5(CONTENT).hexdigest()
+OTHER_MD5 = "f" * 32
+
+
+def _remote(file_id="1", md5=MD5, size=len(CONTENT)):
+    return FileItem(id=file_id, name="a.pwmb", size_bytes=size, created_at=1_000, md5=md5)
+
+
+# Manifest entries: (id, md5, whether the local file still matches the recorded stat).
+SYNCED = ("1", MD5, True)
+EDITED_LOCALLY = ("1", MD5, False)
+JUST_UPLOADED = ("1", "", True)
+
+CASES = [
+    # name, local content, remote item, manifest entry, --delete, expected action
+    ("new local file", CONTENT, None, None, False, UPLOAD),
+    ("new cloud file", None, _remote(), None, False, DOWNLOAD),
+    ("unchanged", CONTENT, _remote(), SYNCED, False, KEEP),
+    ("changed locally", CONTENT, _remote(), EDITED_LOCALLY, False, UPLOAD),
+    ("changed in the cloud", CONTENT, _remote("2"), SYNCED, False, DOWNLOAD),
+    ("changed on both sides", CONTENT, _remote("2", md5=OTHER_MD5), EDITED_LOCALLY, False, CONFLICT),
+    ("changed on both sides to the same content", CONTENT, _remote("2"), EDITED_LOCALLY, False, ADOPT),
+    ("cloud md5 changed", CONTENT, _remote(md5=OTHER_MD5), SYNCED, False, DOWNLOAD),
+    ("deleted in the cloud", CONTENT, None, SYNCED, False, KEEP),
+    ("deleted in the cloud, --delete", CONTENT, None, SYNCED, True, DELETE_LOCAL),
+    ("deleted in the cloud, edited here", CONTENT, None, EDITED_LOCALLY, True, UPLOAD),
+    ("deleted locally", None, _remote(), SYNCED, False, KEEP),
+    ("deleted locally, --delete", None, _remote(), SYNCED, True, DELETE_REMOTE),
+    ("deleted locally, changed in the cloud", None, _remote("2"), SYNCED, True, DOWNLOAD),
+    ("same content, no history", CONTENT, _remote("9"), None, False, ADOPT),
+    ("other content, no history", CONTENT, _remote("9", md5=OTHER_MD5), None, False, CONFLICT),
+    ("same size, no cloud md5", CONTENT, _remote("9", md5=None), None, False, CONFLICT),
+    ("just uploaded, cloud md5 now listed", CONTENT, _remote(), JUST_UPLOADED, False, KEEP),
+    ("just uploaded, no cloud md5", CONTENT, _remote(md5=None), JUST_UPLOADED, False, KEEP),
+    ("just uploaded, replaced in the cloud", CONTENT, _remote("2"), JUST_UPLOADED, False, DOWNLOAD),
+]
+
+
+@pytest.mark.parametrize("label, local, remote, entry, delete, expected", CASES, ids=[c[0] for c in CASES])
+def test_plan(tmp_path, monkeypatch, label, local, remote, entry, delete, expected):
+    monkeypatch.setattr(sync, "iter_files", lambda *args, **kwargs: iter([remote] if remote else []))
+    path = tmp_path / "a.pwmb"
+    if local is not None:
+        path.write_bytes(local)
+    engine = SyncEngine(None, str(tmp_path), delete=delete)
+    if entry is not None:
+        file_id, md5, local_same = entry
+        st = os.stat(path) if local is not None else os.stat_result((0o100644, 0, 0, 1, 0, 0, len(CONTENT), 0, 0, 0))
+        engine.manifest.record("a.pwmb", file_id, md5, st, 1_000)
+        if not local_same:
+            engine.manifest.files["a.pwmb"]["mtime_ns"] -= 1
+
+    actions = engine.plan()
+
+    assert [(a.name, a.kind) for a in actions] == [("a.pwmb", expected)]
+
+
+def test_upload_leaves_md5_for_the_next_scan(tmp_path, monkeypatch):
+    listing = []
+
+    class FakeUploader:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def upload(self, path, name=None, progress=None, md5=None):
+            listing.append(_remote("5", md5=None))
+            return "5"
+
+    monkeypatch.setattr(sync, "Uploader", FakeUploader)
+    monkeypatch.setattr(sync, "iter_files", lambda *args, **kwargs: iter(list(listing)))
+    (tmp_path / "a.pwmb").write_bytes(CONTENT)
+    engine = SyncEngine(None, str(tmp_path))
+
+    assert engine.run(engine.plan()) == []
+    assert engine.manifest.get("a.pwmb")["md5"] == ""
+
+    # The cloud reports no md5: still in sync.
+    assert [a.kind for a in engine.plan()] == [KEEP]
+    listing[0] = _remote("5")
+    actions = engine.plan()
+    assert [a.kind for a in actions] == [KEEP]
+    engine.run(actions)
+    assert engine.manifest.get("a.pwmb")["md5"] == MD5
@@ -0,0 +1,194 @@
+import asyncio
+import gc
+import os
+import weakref
+
+import httpx
+import pytest
+
+from accloud import async_api
+from accloud.retry import RetryPolicy
+from accloud.upload import Uploader, restarts_transfer
+from accloud.upload_journal import UploadJournal
+
+PART_SIZE = 64 * 1024
+
+
+class FakeCloud:
+    # Cloud API stand-in: answers the lock -> register -> unlock calls.
+    def __init__(self, lock_data):
+        self.lock_data = lock_data
+        self.calls = []
+
+    def request(self, method, path, **kwargs):
+        name = path.rsplit("/", 1)[-1]
+        self.calls.append((name, kwargs.get("json")))
+        data = {}
+        if name == "lockStorageSpace":
+            data = dict(self.lock_data, id=7)
+        elif name == "newUploadFile":
+            data = {"id": 42}
+        return httpx.Response(200, json={"code": 1, "data": data}, request=httpx.Request(method, path))
+
+    def names(self):
+        return [name for name, _ in self.calls]
+
+
+class FakeS3:
+    # Local S3 stand-in: single PUT objects, multipart parts and completion.
+    def __init__(self):
+        self.objects = {}
+        self.parts = {}
+        self.completed = None
+        self.failures = {}
+        self.requests = []
+
+    def fail(self, path, *errors):
+        self.failures[path] = list(errors)
+
+    def __call__(self, request):
+        body = request.read()
+        self.requests.append((request.method, request.url.path))
+        pending = self.failures.get(request.url.path)
+        if pending:
+            error = pending.pop(0)
+            if isinstance(error, int):
+                return httpx.Response(error)
+            raise error
+        if request.url.path == "/complete":
+            self.completed = body.decode("utf-8")
+            return httpx.Response(200)
+        if request.url.path.startswith("/part/"):
+            number = int(request.url.path.rsplit("/", 1)[-1])
+            self.parts[number] = body
+            return httpx.Response(200, headers={"ETag": f'"etag-{number}"'})
+        self.objects[request.url.path] = body
+        return httpx.Response(200)
+
+
+def _multipart_lock(count):
+    return {
+        "preSignUrlArr": [f"http://s3.local/part/{n}" for n in range(1, count + 1)],
+        "completeUrl": "http://s3.local/complete",
+        "partSize": PART_SIZE,
+    }
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "model.pwmb"
+    path.write_bytes(os.urandom(PART_SIZE * 2 + 1000))
+    return str(path)
+
+
+def _uploader(cloud, s3, journal=None, attempts=3):
+    uploader = Uploader(
+        cloud,
+        chunk_size=PART_SIZE,
+        workers=1,
+        http=httpx.Client(transport=httpx.MockTransport(s3)),
+        retry=RetryPolicy(max_attempts=attempts, base_delay=0.0, max_delay=0.0),
+        journal=False,
+        dedup=False,
+    )
+    uploader.journal = journal
+    return uploader
+
+
+def test_single_put(source):
+    cloud = FakeCloud({"preSignUrl": "http://s3.local/object"})
+    s3 = FakeS3()
+    seen = []
+
+    file_id = _uploader(cloud, s3).upload(source, progress=lambda sent, total: seen.append((sent, total)))
+
+    assert file_id == "42"
+    assert s3.objects["/object"] == open(source, "rb").read()
+    assert cloud.names() == ["lockStorageSpace", "newUploadFile", "unlockStorageSpace"]
+    assert seen[-1] == (os.path.getsize(source), os.path.getsize(source))
+
+
+def test_single_put_failure_releases_lock(source):
+    cloud = FakeCloud({"preSignUrl": "http://s3.local/object"})
+    s3 = FakeS3()
+    s3.fail("/object", 403)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        _uploader(cloud, s3).upload(source)
+
+    assert cloud.calls[-1] == ("unlockStorageSpace", {"id": 7, "is_delete_cos": 1})
+
+
+def test_multipart_retries_a_failed_part(source):
+    cloud = FakeCloud(_multipart_lock(3))
+    s3 = FakeS3()
+    s3.fail("/part/2", 503)
+
+    assert _uploader(cloud, s3).upload(source) == "42"
+
+    data = open(source, "rb").read()
+    assert b"".join(s3.parts[n] for n in (1, 2, 3)) == data
+    assert s3.requests.count(("PUT", "/part/2")) == 2
+    assert s3.completed.count("<Part>") == 3
+    assert '<PartNumber>3</PartNumber><ETag>"etag-3"</ETag>' in s3.completed
+
+
+def test_only_multipart_uploads_resume_mid_transfer():
+    single = {"stage": "transfer", "size": 10, "lock": {"preSignUrl": "http://s3.local/object"}}
+    assert restarts_transfer(single)
+    assert not restarts_transfer(dict(single, stage="transferred"))
+    assert not restarts_transfer({"stage": "transfer", "size": PART_SIZE * 3, "lock": _multipart_lock(3)})
+
+
+def test_journal_directory_is_created_on_first_save(source, tmp_path):
+    journal = UploadJournal(str(tmp_path / "journal"))
+    assert journal.entries() == []
+    assert not (tmp_path / "journal").exists()
+    journal.start(source, "model.pwmb", os.stat(source), {"id": 7})
+    assert [entry["lock_id"] for entry in journal.entries()] == [7]
+
+
+def test_journal_resumes_remaining_parts(source, tmp_path):
+    journal = UploadJournal(str(tmp_path / "journal"))
+    cloud = FakeCloud(_multipart_lock(3))
+    s3 = FakeS3()
+    s3.fail("/part/3", httpx.ConnectError("connection reset"))
+
+    with pytest.raises(httpx.ConnectError):
+        _uploader(cloud, s3, journal=journal, attempts=1).upload(source)
+
+    entry = journal.load(source)
+    assert entry["stage"] == "transfer"
+    assert sorted(entry["parts"]) == ["1", "2"]
+    assert "unlockStorageSpace" not in cloud.names()
+
+    s3.requests.clear()
+    assert _uploader(cloud, s3, journal=journal).upload(source) == "42"
+
+    # Same lock, only the missing part is sent again.
+    assert cloud.names().count("lockStorageSpace") == 1
+    assert s3.requests == [("PUT", "/part/3"), ("POST", "/complete")]
+    assert b"".join(s3.parts[n] for n in (1, 2, 3)) == open(source, "rb").read()
+    assert journal.load(source) is None
+    assert cloud.names()[-1] == "unlockStorageSpace"
+
+
+class FakeAsyncCloud:
+    def __init__(self, cloud):
+        self.cloud = cloud
+
+    async def request(self, method, path, **kwargs):
+        return self.cloud.request(method, path, **kwargs)
+
+
+def test_async_view_does_not_keep_the_client_alive():
+    async def main():
+        client = FakeAsyncCloud(FakeCloud({}))
+        blocking = async_api._blocking_client(client)
+        response = await asyncio.to_thread(blocking.request, "POST", "/x/newUploadFile")
+        assert response.json()["data"] == {"id": 42}
+        return weakref.ref(client)
+
+    ref = asyncio.run(main())
+    gc.collect()
+    assert ref() is None